@@ -0,0 +1,116 @@
+"""
+Каталог сессий на синтетической папке результатов: files файлов по rows строк
+(формат как у сшитых файлов, у половины — описание -meta.json). Замеряется полное
+построение каталога в 1 и в workers процессах, повторный проход без изменений
+(инкрементальный), досканирование после изменения части файлов и время запросов.
+
+    python -m bench.catalog --files 2000 --rows 2000 > catalog.json
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+from bench.common import prepare_workdir, git_revision
+
+
+def make_tree(base, files, rows, seed=0):
+    from src.Channels import ChannelRegistry
+    from src.DataSaver import format_rows
+    from src.Catalog import write_meta
+
+    registry = ChannelRegistry.from_config()
+    titles = registry.titles()
+    columns = registry.columns
+    decimals = [registry.decimals()[c] for c in columns]
+    header = '\t'.join(titles[c] for c in columns) + '\n'
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(files):
+        day = f'{1 + i % 28:02d}.{1 + i // 28 % 12:02d}.2025'
+        folder = base / day
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f'{i // 3600 % 24:02d}.{i // 60 % 60:02d}.{i % 60:02d}-stop.csv'
+        t = np.arange(rows) * 0.02
+        load = float(rng.choice([5.0, 10.0, 15.0]))
+        block = np.column_stack([t if c == 'time' else
+                                 np.floor(t * 5) if c == 'N' else
+                                 load + rng.normal(0, 1, rows) if c == 'P' else
+                                 rng.normal(20 + i % 50, 2, rows) for c in columns])
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(header)
+            f.write(format_rows(block, decimals))
+        if i % 2 == 0:
+            write_meta(path, {'rig': 'bench', 'reason': 'оператор', 'params': {'P_tar': load, 'f_tar': 5},
+                              'offsets': {'P': 0.1}, 'pid': {'P_': 1.0}})
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = prepare_workdir(5023)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from src.Catalog import Catalog
+        base = workdir / 'results'
+        start = time.perf_counter()
+        paths = make_tree(base, args.files, args.rows)
+        generate = time.perf_counter() - start
+        size_mb = sum(p.stat().st_size for p in paths) / 2 ** 20
+
+        timings = {}
+        for workers in sorted({1, args.workers}):
+            catalog = Catalog(base / f'catalog-{workers}.sqlite', base)
+            start = time.perf_counter()
+            summary = catalog.rebuild(workers=workers)
+            timings[f'full_{workers}'] = {'seconds': time.perf_counter() - start, 'scanned': summary['scanned'],
+                                          'errors': len(summary['errors'])}
+
+        catalog = Catalog(base / f'catalog-{args.workers}.sqlite', base)
+        start = time.perf_counter()
+        summary = catalog.rebuild(workers=args.workers)
+        timings['unchanged'] = {'seconds': time.perf_counter() - start, 'scanned': summary['scanned'],
+                                'skipped': summary['skipped']}
+
+        changed = paths[::50]
+        for path in changed:
+            os.utime(path, (time.time(), time.time() + 1))
+        shutil.rmtree(paths[-1].parent)
+        start = time.perf_counter()
+        summary = catalog.rebuild(workers=args.workers)
+        timings['incremental'] = {'seconds': time.perf_counter() - start, 'scanned': summary['scanned'],
+                                  'removed': summary['removed']}
+
+        queries = {'by_param': dict(params={'P_tar': 15}),
+                   'by_param_and_date': dict(since='2025-03-01', until='2025-06-30', params={'P_tar': (14, 16)}),
+                   'by_channel_max': dict(channel_max={'T': (None, 40)}),
+                   'latest': dict(limit=100)}
+        query_ms = {}
+        for name, query in queries.items():
+            found, times = 0, []
+            for _ in range(args.queries):
+                start = time.perf_counter()
+                found = len(catalog.find(**query))
+                times.append((time.perf_counter() - start) * 1000.0)
+            query_ms[name] = {'found': found, 'p50': float(np.percentile(times, 50)),
+                              'p95': float(np.percentile(times, 95))}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({'revision': git_revision(), 'files': args.files, 'rows': args.rows, 'size_mb': size_mb,
+                      'workers': args.workers, 'generate_s': generate, 'rebuild': timings, 'query_ms': query_ms},
+                     indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Стоимость отсчёта от числа каналов: разбор ответа ПЛК (PLCDecoder) и приём отсчёта
+потоком записи (DataSaverWorker.add_data, с записью чанков) для 6 стандартных
+каналов и реестров, дополненных channels.json до --channels каналов.
+
+    python -m bench.channels --channels 6,16,32,64 --samples 20000 > channels.json
+
+Результат — JSON: на каждое число каналов — мкс на отсчёт (среднее, p95) для разбора
+и для приёма.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+from bench.common import prepare_workdir, git_revision
+
+
+def measure(n_channels, samples):
+    from src.Channels import ChannelRegistry, PLCDecoder, DEFAULT_CHANNELS
+    from src.DataSaver import DataSaverWorker
+    from src.ModbusClient import encode_ieee_754
+    from bench.fake_plc import regs_to_coils
+
+    base = len(DEFAULT_CHANNELS)
+    extra = {f'T{i}': {'title': f'Температура {i}, °С', 'units': '°С', 'adr': 60 + 2 * i, 'dtype': 'float',
+                       'decimals': 2} for i in range(max(n_channels - base, 0))}
+    with open('channels.json', 'w', encoding='utf-8') as f:
+        json.dump(extra, f, ensure_ascii=False)
+    registry = ChannelRegistry.from_config()
+    decoder = PLCDecoder(registry)
+
+    rng = np.random.default_rng(0)
+    coils = [False] * (decoder.span * 16)
+    for ch in registry.acquired:
+        value = int(rng.integers(0, 1000)) if ch.dtype == 'int' else float(rng.normal(10.0, 3.0))
+        coils[ch.adr * 16: ch.adr * 16 + 32] = regs_to_coils(encode_ieee_754(value, ch.dtype))
+
+    saver = DataSaverWorker({'P': 0.0, 'M': 0.0, 'L': 0.0}, registry, max_points_ram=5000, chunk_size=1000)
+    decode, append = [], []
+    for i in range(samples):
+        start = time.perf_counter()
+        data = decoder(coils)
+        mid = time.perf_counter()
+        data['seq'] = i + 1
+        saver.add_data(data, i * 20.0)
+        end = time.perf_counter()
+        decode.append(mid - start)
+        append.append(end - mid)
+    saver.finalize_to(os.path.abspath('out.csv'))
+
+    def stats(values):
+        arr = np.asarray(values[samples // 10:]) * 1e6
+        return {'mean': float(arr.mean()), 'p50': float(np.percentile(arr, 50)), 'p95': float(np.percentile(arr, 95))}
+
+    return {'channels': len(registry), 'span_registers': decoder.span,
+            'decode_us': stats(decode), 'add_data_us': stats(append)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', default='6,16,32,64')
+    parser.add_argument('--samples', type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = prepare_workdir(5020)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = [measure(int(n), args.samples) for n in args.channels.split(',')]
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps({'revision': git_revision(), 'samples': args.samples, 'results': results},
+                     indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
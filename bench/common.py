@@ -0,0 +1,66 @@
+"""Общие части бенчмарков: рабочая папка с копией конфигурации, статистика, ресурсы процесса."""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CONFIG_FILES = ['app.cfg', 'axis.json', 'multiplier.json', 'modbus_adr.cfg',
+                'offsets.param', 'test_parameters.param']
+
+
+def prepare_workdir(port, **overrides):
+    """Временная папка с конфигурацией, где ПЛК — локальный сервер на `port`."""
+    workdir = Path(tempfile.mkdtemp(prefix='bearing-bench-'))
+    for name in CONFIG_FILES + ['channels.json']:
+        if (ROOT / name).exists():
+            shutil.copy(ROOT / name, workdir / name)
+    from src.utils import read_conf, write_conf
+    config = read_conf(workdir / 'app.cfg')
+    config['host'] = '127.0.0.1'
+    config['port'] = port
+    config.update(overrides)
+    write_conf(workdir / 'app.cfg', config)
+    return workdir
+
+
+def child_env():
+    env = dict(os.environ, PYTHONPATH=str(ROOT) + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+def describe(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {'mean': sum(values) / len(values), 'min': min(values), 'max': max(values)}
+
+
+def thread_cpu_seconds(native_id):
+    """Процессорное время потока (user+sys) по /proc; None, где /proc нет."""
+    try:
+        with open(f'/proc/self/task/{native_id}/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except Exception:
+        return None
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024.0 if sys.platform != 'darwin' else rss / 1024.0 / 1024.0
+    except Exception:
+        return None
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
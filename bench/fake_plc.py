@@ -0,0 +1,65 @@
+"""Локальная замена ПЛК для бенчмарков: Modbus TCP сервер с синтетическим сигналом."""
+import math
+import threading
+import time
+from pyModbusTCP.server import ModbusServer
+from src.ModbusClient import read_TCP_conf, encode_ieee_754
+
+
+def regs_to_coils(regs):
+    """Обратное к coils_to_registers: 16-битные регистры -> список битов."""
+    coils = []
+    for reg in regs:
+        coils.extend(bool(reg >> i & 1) for i in range(16))
+    return coils
+
+
+class FakePLC:
+    """
+    Modbus-сервер, отдающий в coils те же поля, что читает ask_plc:
+    нагрузка и момент — синусоиды с частотой freq, N растёт с той же частотой.
+    """
+    def __init__(self, host='127.0.0.1', port=5020, cfg_path='modbus_adr.cfg', freq=5.0, update_ms=5):
+        self.config = read_TCP_conf(cfg_path)
+        self.server = ModbusServer(host=host, port=port, no_block=True)
+        self.freq = freq
+        self.update_ms = update_ms
+        self._running = False
+        self._thread = None
+        self.t0 = time.perf_counter()
+
+    def _set(self, name, value):
+        dtype, adr, _ = self.config[name]
+        self.server.data_bank.set_coils(adr * 16, regs_to_coils(encode_ieee_754(value, dtype)))
+
+    def set_stat(self, bits):
+        _, adr, _ = self.config['Stat']
+        self.server.data_bank.set_coils(adr * 16, [bool(b) for b in bits])
+
+    def update(self):
+        t = time.perf_counter() - self.t0
+        phase = 2 * math.pi * self.freq * t
+        self._set('P', 10.0 + 5.0 * math.sin(phase))
+        self._set('M', 2.0 * math.sin(phase + 0.3))
+        self._set('N', int(self.freq * t))
+        self._set('T', 25.0 + 0.001 * t)
+        self._set('L', 0.1 + 1e-6 * t)
+
+    def _loop(self):
+        while self._running:
+            self.update()
+            time.sleep(self.update_ms / 1000.0)
+
+    def start(self):
+        self.server.start()
+        self.set_stat([True] + [False] * 7)
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        self.server.stop()
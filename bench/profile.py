@@ -0,0 +1,127 @@
+"""
+Точность переходов программы нагружения: приложение (MainWindow, offscreen) в отдельном
+процессе исполняет программу из steps шагов по cycles циклов с чередованием P_tar, его
+GUI-поток занят (каждые period мс — busy мс счёта). Локальный ПЛК отдаёт N с частотой
+freq; замеряется, насколько позже плановой границы (момента, когда N её достиг) уставка
+P_tar изменилась в регистрах ПЛК.
+
+    python -m bench.profile --steps 20 --cycles 5 --busy 200 --period 250 > profile.json
+
+Результат — JSON: опоздание перехода, мс (p50/p95/max) и в циклах, пропущенные
+переходы, запросы и записанные уставки (метрики profile_* из приложения).
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+from bench.common import prepare_workdir, child_env
+
+
+def child(duration, busy_ms, period_ms, program):
+    from PySide6.QtCore import QTimer
+    from src.MainWindow import MainWindow, MainApp
+    from src.Metrics import METRICS
+    from src.Profile import Program
+
+    app = MainApp()
+    window = MainWindow('bench')
+    window.show()
+
+    def burn():
+        end = time.perf_counter() + busy_ms / 1000.0
+        x = 0
+        while time.perf_counter() < end:
+            x += 1
+
+    def finish():
+        snapshot = METRICS.snapshot()
+        print(json.dumps({name: {k: snapshot[name][k] for k in ('count', 'total', 'mean', 'p95', 'max')}
+                          for name in ('profile', 'profile_requests', 'profile_writes', 'profile_overshoot',
+                                       'signal_lag') if name in snapshot}), flush=True)
+        window.worker.stop()
+        window.thread.quit()
+        window.thread.wait()
+        app.exit(0)
+
+    if busy_ms > 0:
+        timer = QTimer()
+        timer.timeout.connect(burn)
+        timer.start(int(period_ms))
+    QTimer.singleShot(1500, lambda: window.worker.enqueue_cmd('profile_start', Program.from_dict(program)))
+    QTimer.singleShot(int(duration * 1000), finish)
+    app.exec()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--cycles', type=int, default=5, help='циклов в шаге')
+    parser.add_argument('--freq', type=float, default=5.0, help='частота счёта N в ПЛК, Гц')
+    parser.add_argument('--busy', type=float, default=200.0, help='занятость GUI-потока за период, мс')
+    parser.add_argument('--period', type=float, default=250.0, help='период нагрузки GUI-потока, мс')
+    parser.add_argument('--interval', type=int, default=20, help='период опроса ask_int, мс')
+    parser.add_argument('--port', type=int, default=5022)
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        cfg = json.loads(args.child)
+        child(cfg['duration'], cfg['busy'], cfg['period'], cfg['program'])
+        return
+
+    from bench.fake_plc import FakePLC
+    workdir = prepare_workdir(args.port, ask_int=args.interval, metrics_interval=0)
+    plc = FakePLC(port=args.port, cfg_path=workdir / 'modbus_adr.cfg', freq=args.freq).start()
+    bank = plc.server.data_bank
+    _, p_adr, p_regs = plc.config['P_tar']
+
+    steps = [{'P_tar': 4.0, 'f_tar': args.freq, 'cycles': args.cycles}]
+    steps += [{'P_tar': 6.0 if k % 2 else 4.0, 'cycles': args.cycles} for k in range(1, args.steps)]
+    program = {'name': 'bench', 'steps': steps}
+    duration = 2.5 + args.steps * args.cycles / args.freq
+    params = {'duration': duration, 'busy': args.busy, 'period': args.period, 'program': program}
+    proc = subprocess.Popen([sys.executable, '-m', 'bench.profile', '--child', json.dumps(params)],
+                            cwd=workdir, env=child_env(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    changes = []
+    try:
+        last = bank.get_holding_registers(p_adr, p_regs)
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end and proc.poll() is None:
+            regs = bank.get_holding_registers(p_adr, p_regs)
+            if regs != last:
+                changes.append(time.perf_counter())
+                last = regs
+            time.sleep(0.0002)
+        out, err = proc.communicate(timeout=60)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        plc.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    late_ms, late_cycles = [], []
+    if changes:
+        # Первая запись — вход в шаг 1 на первом отсчёте программы; N на нём — начало отсчёта
+        n0 = int(args.freq * (changes[0] - 0.002 - plc.t0))
+        for k, t in enumerate(changes[1:], 1):
+            boundary = plc.t0 + (n0 + k * args.cycles) / args.freq
+            late_ms.append((t - boundary) * 1000.0)
+            late_cycles.append(int(args.freq * (t - plc.t0)) - (n0 + k * args.cycles))
+    arr = np.asarray(late_ms) if late_ms else np.array([np.nan])
+    lines = [line for line in out.splitlines() if line.startswith('{')]
+    print(json.dumps({
+        'params': {'steps': args.steps, 'cycles': args.cycles, 'freq': args.freq, 'busy_ms': args.busy,
+                   'period_ms': args.period, 'interval_ms': args.interval},
+        'transition_late_ms': {'p50': float(np.percentile(arr, 50)), 'p95': float(np.percentile(arr, 95)),
+                               'max': float(np.max(arr)), 'n': len(late_ms),
+                               'missed': args.steps - 1 - len(late_ms)},
+        'transition_late_cycles': {'max': max(late_cycles, default=None)},
+        'metrics': json.loads(lines[-1]) if lines else {'error': err[-2000:]},
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Проверка поточного rainflow на записанной сессии: отсчёты по одному идут через
+RainflowCounter (как в потоке записи), результат сравнивается с эталоном
+count_offline по всей записи. Печатает JSON: совпадение, число циклов, максимальный
+остаток, время на отсчёт.
+
+    python -m bench.rainflow results/19.10.2026/12.00.00-stop.csv --width P=0.1 --width M=0.1
+
+Запускать из папки стенда (нужен axis.json).
+"""
+import argparse
+import json
+import time
+import numpy as np
+from src.Replay import iter_rows
+from src.Rainflow import RainflowCounter, count_offline
+
+
+def check(path, widths):
+    counters = {ch: RainflowCounter(w) for ch, w in widths.items()}
+    values = {ch: [] for ch in widths}
+    max_residue = {ch: 0 for ch in widths}
+    elapsed = 0.0
+    rows = 0
+    for row in iter_rows(path):
+        rows += 1
+        start = time.perf_counter()
+        for ch, counter in counters.items():
+            counter.update(row.get(ch, np.nan))
+        elapsed += time.perf_counter() - start
+        for ch in widths:
+            values[ch].append(row.get(ch, np.nan))
+            max_residue[ch] = max(max_residue[ch], len(counters[ch].residue))
+
+    result = {'rows': rows, 'us_per_sample': elapsed / max(rows, 1) * 1e6, 'channels': {}}
+    for ch, counter in counters.items():
+        online = counter.matrix()
+        offline = count_offline(np.asarray(values[ch]), widths[ch])
+        diff = max((abs(online.get(k, 0.0) - offline.get(k, 0.0)) for k in set(online) | set(offline)),
+                   default=0.0)
+        result['channels'][ch] = {'match': diff < 1e-9, 'max_diff': diff, 'bins': len(online),
+                                  'cycles': sum(online.values()), 'max_residue': max_residue[ch]}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='сшитый файл сессии или папка чанков')
+    parser.add_argument('--width', action='append', default=[], help='канал=ширина бина, например P=0.1')
+    args = parser.parse_args()
+    widths = {'P': 0.1, 'M': 0.1}
+    for item in args.width:
+        ch, w = item.split('=')
+        widths[ch] = float(w)
+    print(json.dumps(check(args.path, widths), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Отчёт по сессии на синтетических файлах разной длины: для каждого размера (строк)
+SessionReport в отдельном процессе — время, пиковая память процесса (и процессов
+пула). Для сравнения тот же файл читается целиком в pandas (время, пиковая память),
+по нему проверяются итоги отчёта: min/max, среднее, СКО, квантили.
+
+    python -m bench.report --rows 200000 2000000 --workers 4 > report.json
+"""
+import argparse
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+from bench.common import prepare_workdir, child_env, git_revision
+
+
+def make_file(path, rows, seed=0, block=100000):
+    """Файл сессии как у ChunkedLogger: время, наработка 5 Гц, P — синус с шумом, T — с ростом."""
+    from src.Channels import ChannelRegistry
+    from src.DataSaver import format_rows
+
+    registry = ChannelRegistry.from_config()
+    columns = registry.columns
+    decimals = registry.decimals()
+    titles = registry.titles()
+    rng = np.random.default_rng(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\t'.join(titles[c] for c in columns) + '\n')
+        for start in range(0, rows, block):
+            n = min(block, rows - start)
+            t = (start + np.arange(n)) * 0.02
+            data = {'time': t, 'N': np.floor(t * 5), 'P': 4 + 2 * np.sin(2 * np.pi * 5 * t) + rng.normal(0, .1, n),
+                    'M': rng.normal(5, 1, n), 'T': 20 + 20 * (start + np.arange(n)) / rows + rng.normal(0, 1, n),
+                    'L': rng.normal(3, .5, n)}
+            f.write(format_rows(np.column_stack([data.get(c, np.full(n, 5.0)) for c in columns]),
+                                [decimals[c] for c in columns]))
+
+
+def child(mode, path, workers):
+    from src.SessionFile import read_header, parse_rows
+    start = time.perf_counter()
+    if mode == 'report':
+        from src.Report import SessionReport
+        report = SessionReport(workers=workers)
+        plan, stats, chunks, used = report.scan(path)
+        out = {'rows': stats.rows, 'chunks': chunks, 'workers': used, 'scan_s': time.perf_counter() - start,
+               'channels': {c: stats.channel(i) for i, c in enumerate(plan['columns'])}}
+        out['run_s'] = report.run(path)['seconds']   # разбор ещё раз + HTML
+    else:
+        columns, offset = read_header(path)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            arrays = parse_rows(f.read(), columns)
+        out = {'rows': len(arrays['time']), 'channels': {}}
+        for c, a in arrays.items():
+            q = np.quantile(a, (0.01, 0.05, 0.5, 0.95, 0.99), method='lower')
+            out['channels'][c] = {'min': float(a.min()), 'max': float(a.max()), 'mean': float(a.mean()),
+                                  'std': float(a.std()), 'quantiles': q.tolist()}
+    out['seconds'] = time.perf_counter() - start
+    rss = [resource.getrusage(who).ru_maxrss / 1024.0 for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    out['peak_rss_mb'], out['pool_peak_rss_mb'] = rss
+    print(json.dumps(out))
+
+
+def run_child(mode, path, workers, workdir):
+    proc = subprocess.run([sys.executable, '-m', 'bench.report', '--child', mode, str(path), str(workers or 0)],
+                          cwd=workdir, env=child_env(), capture_output=True, text=True)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith('{')]
+    if not lines:
+        return {'error': proc.stderr[-2000:]}
+    return json.loads(lines[-1])
+
+
+def compare(report, exact):
+    """Наибольшие расхождения отчёта с расчётом по всему файлу."""
+    worst = {'min_max': 0.0, 'mean_rel': 0.0, 'std_rel': 0.0, 'quantile_rel': 0.0}
+    for c, ref in exact['channels'].items():
+        got = report['channels'][c]
+        scale = max(abs(ref['mean']), ref['std'], 1e-9)
+        worst['min_max'] = max(worst['min_max'], abs(got['min'] - ref['min']), abs(got['max'] - ref['max']))
+        worst['mean_rel'] = max(worst['mean_rel'], abs(got['mean'] - ref['mean']) / scale)
+        worst['std_rel'] = max(worst['std_rel'], abs(got['std'] - ref['std']) / max(ref['std'], 1e-9))
+        for a, b in zip(got['quantiles'], ref['quantiles']):
+            worst['quantile_rel'] = max(worst['quantile_rel'], abs(a - b) / max(abs(b), 1e-9))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[200000, 2000000])
+    parser.add_argument('--workers', type=int, default=0, help='процессов (0 — по числу ядер)')
+    parser.add_argument('--no-pandas', action='store_true', help='без сравнения с чтением целиком')
+    parser.add_argument('--child', nargs=3, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, path, workers = args.child
+        child(mode, path, int(workers) or None)
+        return
+
+    workdir = prepare_workdir(5024)
+    results = []
+    try:
+        for rows in args.rows:
+            path = workdir / 'results' / '01.01.2026' / f'{rows}-stop.csv'
+            make_file(path, rows)
+            item = {'rows': rows, 'size_mb': path.stat().st_size / 2 ** 20,
+                    'report': run_child('report', path, args.workers, workdir)}
+            if not args.no_pandas:
+                item['pandas'] = run_child('pandas', path, 0, workdir)
+                if 'error' not in item['report'] and 'error' not in item['pandas']:
+                    item['deviation'] = compare(item['report'], item['pandas'])
+                item['pandas'].pop('channels', None)
+            item['report'].pop('channels', None)
+            results.append(item)
+            path.unlink()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps({'revision': git_revision(), 'workers': args.workers, 'results': results},
+                     indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Бенчмарк запуска: время до первого кадра главного окна и до первого отсчёта с ПЛК.
+
+    python -m bench.startup --runs 5 > startup.json
+
+Каждый запуск — отдельный процесс во временной папке с копией конфигурации,
+ПЛК заменён локальным Modbus-сервером. Первый запуск идёт без кэша отпечатка.
+"""
+import time
+T_START = time.perf_counter()
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+from bench.common import prepare_workdir, child_env, describe
+
+
+def child(timeout_s):
+    """Один запуск приложения; печатает JSON с отметками времени (мс от старта процесса)."""
+    marks = {}
+
+    def mark(name):
+        if name not in marks:
+            marks[name] = (time.perf_counter() - T_START) * 1000.0
+
+    from concurrent.futures import ThreadPoolExecutor
+    from src.hw import check_lic
+
+    def licence():
+        start = time.perf_counter()
+        lic = check_lic()
+        marks['licence_ms'] = (time.perf_counter() - start) * 1000.0
+        return lic or 'bench'
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    lic = executor.submit(licence)
+
+    from PySide6.QtCore import QObject, QEvent, QTimer
+    from src.MainWindow import MainWindow, MainApp
+    mark('imports')
+    app = MainApp()
+
+    class Probe(QObject):
+        """Живёт в GUI-потоке: первый кадр — по событию Paint, первый отсчёт — по доставке сигнала."""
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint:
+                mark('first_frame')
+                self.check_done()
+            return False
+
+        def on_sample(self, *_):
+            mark('first_sample')
+            self.check_done()
+
+        def check_done(self):
+            if 'first_frame' in marks and 'first_sample' in marks:
+                QTimer.singleShot(0, app.quit)
+
+    window = MainWindow(lic)
+    mark('window_built')
+    probe = Probe()
+    window.worker.data_ready.connect(probe.on_sample)
+    window.installEventFilter(probe)
+    window.show()
+    QTimer.singleShot(int(timeout_s * 1000), app.quit)
+    app.exec()
+    window.close()
+    print(json.dumps(marks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=5020)
+    parser.add_argument('--timeout', type=float, default=20.0)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.timeout)
+        return
+
+    from bench.fake_plc import FakePLC
+    workdir = prepare_workdir(args.port)
+    plc = FakePLC(port=args.port, cfg_path=workdir / 'modbus_adr.cfg').start()
+    env = child_env()
+
+    runs = []
+    try:
+        for i in range(args.runs):
+            cached = (workdir / 'hw.cache').exists()
+            proc = subprocess.run([sys.executable, '-m', 'bench.startup', '--child',
+                                   '--timeout', str(args.timeout)],
+                                  cwd=workdir, env=env, capture_output=True, text=True)
+            lines = [line for line in proc.stdout.splitlines() if line.startswith('{')]
+            marks = json.loads(lines[-1]) if lines else {}
+            marks['fingerprint_cached'] = cached
+            runs.append(marks)
+    finally:
+        plc.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'runs': runs,
+        'time_to_first_frame_ms': describe([r.get('first_frame') for r in runs]),
+        'time_to_first_sample_ms': describe([r.get('first_sample') for r in runs]),
+        'imports_ms': describe([r.get('imports') for r in runs]),
+        'licence_cold_ms': describe([r.get('licence_ms') for r in runs if not r['fingerprint_cached']]),
+        'licence_cached_ms': describe([r.get('licence_ms') for r in runs if r['fingerprint_cached']]),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
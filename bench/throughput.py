@@ -0,0 +1,188 @@
+"""
+Сквозной бенчмарк конвейера сбора: Client/Worker -> MainWindow.on_data_ready ->
+DataSaver -> ChunkedLogger -> итоговый файл, без экрана (offscreen Qt),
+ПЛК заменён локальным Modbus-сервером.
+
+    python -m bench.throughput --intervals 20,10,5 --views 1000,5000 \\
+        --chunks 1000,5000 --windows 0,2 --duration 10 > throughput.json
+
+Каждая комбинация параметров — отдельный процесс. Результат — JSON:
+отсчётов в секунду, задержка доставки (p50/p95/p99/max) до GUI и до потока записи,
+пропущенные и опоздавшие опросы, процессорное время по потокам, пиковый RSS,
+записанные байты.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from bench.common import prepare_workdir, child_env, thread_cpu_seconds, peak_rss_mb, git_revision
+
+
+def child(duration, windows, interval_ms):
+    import threading
+    import numpy as np
+    from PySide6.QtCore import QObject, QTimer, Qt
+    from src.MainWindow import MainWindow, MainApp
+
+    app = MainApp()
+    window = MainWindow('bench')
+    worker = window.worker
+    threads = {'gui': threading.get_native_id()}
+    gui_lat, saver_lat, rel_times = [], [], []
+
+    def now_ms():
+        return (time.perf_counter() - worker.init_time) * 1000.0
+
+    def on_poll(data, rel_time):
+        # прямое соединение: выполняется в потоке опроса
+        threads.setdefault('acquisition', threading.get_native_id())
+
+    class GuiProbe(QObject):
+        def on_sample(self, data, rel_time):
+            gui_lat.append(now_ms() - rel_time)
+            rel_times.append(rel_time)
+
+    class SaverProbe(QObject):
+        def on_sample(self, data, rel_time):
+            threads.setdefault('saver', threading.get_native_id())
+            saver_lat.append(now_ms() - rel_time)
+
+    gui_probe = GuiProbe()
+    saver_probe = SaverProbe()
+    saver_probe.moveToThread(window.datasaver.thread)
+    worker.data_ready.connect(on_poll, Qt.DirectConnection)
+    worker.data_ready.connect(gui_probe.on_sample)
+    window.datasaver.data_in.connect(saver_probe.on_sample)
+
+    graphs = [window.graph_bar]
+    for _ in range(windows):
+        window.graph_bar.add_graph_window()
+        graphs.append(window.graph_bar.windows[-1])
+    window.show()
+
+    cpu_start = {}
+    report = {}
+
+    def begin():
+        for name, tid in threads.items():
+            cpu_start[name] = thread_cpu_seconds(tid)
+        cpu_start['process'] = time.process_time()
+        gui_lat.clear()
+        saver_lat.clear()
+        rel_times.clear()
+        QTimer.singleShot(int(duration * 1000), finish)
+
+    def finish():
+        cpu = {'process': time.process_time() - cpu_start['process']}
+        for name, tid in threads.items():
+            end = thread_cpu_seconds(tid)
+            if end is not None and cpu_start.get(name) is not None:
+                cpu[name] = end - cpu_start[name]
+        report['cpu_s'] = cpu
+        report['frame_ms'] = [g.stats.summary()['frame_ms'] for g in graphs]
+        from src.Metrics import METRICS
+        report['metrics'] = {name: {k: m[k] for k in ('count', 'mean', 'p95', 'max')}
+                             for name, m in METRICS.snapshot().items()}
+
+        worker.stop()
+        window.thread.quit()
+        window.thread.wait()
+        start = time.perf_counter()
+        out_path = window.datasaver.save_data('bench-final.csv').result()
+        report['finalize_ms'] = (time.perf_counter() - start) * 1000.0
+        report['bytes_written'] = out_path.stat().st_size
+        report['rows_saved'] = window.datasaver.count
+        report['sequence'] = window.datasaver.sequence_counters()
+        gaps_path = out_path.with_name(out_path.stem + '-gaps.tsv')
+        report['sequence_events'] = max(len(gaps_path.read_text(encoding='utf-8').splitlines()) - 5, 0)
+        # exit, а не quit: quit закрыл бы окна и запустил closeEvent с его паузой и записью
+        app.exit(0)
+
+    # секунда на прогрев, затем измерение
+    QTimer.singleShot(1000, begin)
+    app.exec()
+
+    def pct(values):
+        if not values:
+            return None
+        arr = np.asarray(values)
+        return {'p50': float(np.percentile(arr, 50)), 'p95': float(np.percentile(arr, 95)),
+                'p99': float(np.percentile(arr, 99)), 'max': float(arr.max())}
+
+    n = len(rel_times)
+    gaps = np.diff(np.asarray(rel_times)) if n > 1 else np.array([])
+    late = gaps > 1.5 * interval_ms
+    dropped = int(np.sum(np.floor(gaps[late] / interval_ms) - 1)) if late.any() else 0
+    cpu = report.pop('cpu_s')
+
+    print(json.dumps(dict({
+        'samples': n,
+        'samples_per_s': n / duration,
+        'latency_gui_ms': pct(gui_lat),
+        'latency_saver_ms': pct(saver_lat),
+        'poll_gap_ms': pct(gaps.tolist()),
+        'late_polls': int(late.sum()),
+        'dropped_polls': dropped,
+        'cpu_s': cpu,
+        'cpu_per_sample_us': {k: v / max(n, 1) * 1e6 for k, v in cpu.items()},
+        'peak_rss_mb': peak_rss_mb(),
+    }, **report)))
+    os._exit(0)
+
+
+def parse_list(text, cast=int):
+    return [cast(x) for x in str(text).split(',') if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--intervals', default='20,5', help='период опроса ask_int, мс')
+    parser.add_argument('--views', default='5000', help='values_to_view')
+    parser.add_argument('--chunks', default='1000,5000', help='размер чанка, строк')
+    parser.add_argument('--windows', default='0,2', help='число дополнительных окон графиков')
+    parser.add_argument('--duration', type=float, default=10.0, help='длительность замера, с')
+    parser.add_argument('--port', type=int, default=5020)
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        cfg = json.loads(args.child)
+        child(cfg['duration'], cfg['windows'], cfg['interval'])
+        return
+
+    from bench.fake_plc import FakePLC
+    results = []
+    combos = itertools.product(parse_list(args.intervals), parse_list(args.views),
+                               parse_list(args.chunks), parse_list(args.windows))
+    plc = None
+    try:
+        for interval, view, chunk, windows in combos:
+            workdir = prepare_workdir(args.port, ask_int=interval, values_to_view=view, chunk_size=chunk)
+            if plc is None:
+                plc = FakePLC(port=args.port, cfg_path=workdir / 'modbus_adr.cfg').start()
+            params = {'interval': interval, 'values_to_view': view, 'chunk_size': chunk,
+                      'windows': windows, 'duration': args.duration}
+            proc = subprocess.run([sys.executable, '-m', 'bench.throughput', '--child', json.dumps(params)],
+                                  cwd=workdir, env=child_env(), capture_output=True, text=True)
+            lines = [line for line in proc.stdout.splitlines() if line.startswith('{')]
+            result = json.loads(lines[-1]) if lines else {'error': proc.stderr[-2000:]}
+            results.append({'params': params, 'result': result})
+            shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        if plc is not None:
+            plc.stop()
+
+    print(json.dumps({
+        'meta': {'revision': git_revision(), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
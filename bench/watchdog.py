@@ -0,0 +1,119 @@
+"""
+Время реакции защиты: бит предела ставится в локальном ПЛК, замеряется время до того,
+как стенд снимет нагрузку (катушка Cmd[0] сброшена). Приложение (MainWindow, offscreen)
+работает в отдельном процессе, его GUI-поток занят: каждые period мс — busy мс счёта.
+
+    python -m bench.watchdog --trials 50 --busy 200 --period 250 > watchdog.json
+
+Результат — JSON: задержка от установки бита до разгрузки (p50/p95/max), период опроса,
+метрики watchdog/watchdog_reaction из приложения.
+"""
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+from bench.common import prepare_workdir, child_env
+
+
+def child(duration, busy_ms, period_ms):
+    from PySide6.QtCore import QTimer
+    from src.MainWindow import MainWindow, MainApp
+    from src.Metrics import METRICS
+
+    app = MainApp()
+    window = MainWindow('bench')
+    window.show()
+
+    def burn():
+        end = time.perf_counter() + busy_ms / 1000.0
+        x = 0
+        while time.perf_counter() < end:
+            x += 1
+
+    def finish():
+        snapshot = METRICS.snapshot()
+        print(json.dumps({name: {k: snapshot[name][k] for k in ('count', 'mean', 'p95', 'max')}
+                          for name in ('watchdog', 'watchdog_reaction', 'watchdog_trips', 'signal_lag')
+                          if name in snapshot}), flush=True)
+        window.worker.stop()
+        window.thread.quit()
+        window.thread.wait()
+        app.exit(0)
+
+    if busy_ms > 0:
+        timer = QTimer()
+        timer.timeout.connect(burn)
+        timer.start(int(period_ms))
+    QTimer.singleShot(int(duration * 1000), finish)
+    app.exec()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trials', type=int, default=30)
+    parser.add_argument('--busy', type=float, default=200.0, help='занятость GUI-потока за период, мс')
+    parser.add_argument('--period', type=float, default=250.0, help='период нагрузки GUI-потока, мс')
+    parser.add_argument('--interval', type=int, default=20, help='период опроса ask_int, мс')
+    parser.add_argument('--port', type=int, default=5021)
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        cfg = json.loads(args.child)
+        child(cfg['duration'], cfg['busy'], cfg['period'])
+        return
+
+    from bench.fake_plc import FakePLC
+    workdir = prepare_workdir(args.port, ask_int=args.interval, metrics_interval=0)
+    plc = FakePLC(port=args.port, cfg_path=workdir / 'modbus_adr.cfg').start()
+    bank = plc.server.data_bank
+    load_coil = plc.config['Cmd'][1] * 16
+    stat_idle = [True] + [False] * 7
+    stat_limit = [True, False, True] + [False] * 5
+
+    duration = 3.0 + args.trials * 0.6
+    params = {'duration': duration, 'busy': args.busy, 'period': args.period}
+    proc = subprocess.Popen([sys.executable, '-m', 'bench.watchdog', '--child', json.dumps(params)],
+                            cwd=workdir, env=child_env(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    latencies, missed = [], 0
+    try:
+        time.sleep(2.0)   # запуск приложения
+        for _ in range(args.trials):
+            bank.set_coils(load_coil, [True])
+            time.sleep(0.1 + 0.2 * random.random())
+            t0 = time.perf_counter()
+            plc.set_stat(stat_limit)
+            while bank.get_coils(load_coil, 1)[0]:
+                if time.perf_counter() - t0 > 2.0:
+                    missed += 1
+                    break
+                time.sleep(0.0002)
+            else:
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+            time.sleep(0.1)
+            plc.set_stat(stat_idle)
+            time.sleep(0.1)
+        out, err = proc.communicate(timeout=duration + 30)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        plc.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    lines = [line for line in out.splitlines() if line.startswith('{')]
+    arr = np.asarray(latencies) if latencies else np.array([np.nan])
+    print(json.dumps({
+        'params': {'trials': args.trials, 'busy_ms': args.busy, 'period_ms': args.period,
+                   'interval_ms': args.interval},
+        'unload_latency_ms': {'p50': float(np.percentile(arr, 50)), 'p95': float(np.percentile(arr, 95)),
+                              'max': float(np.max(arr)), 'n': len(latencies), 'missed': missed},
+        'metrics': json.loads(lines[-1]) if lines else {'error': err[-2000:]},
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,93 @@
-from src.MainWindow import MainWindow, MainApp
-from src.hw import check_lic
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import importlib
+import multiprocessing
 import sys
 
 
 if __name__ == '__main__':
-    lic = check_lic()
+    multiprocessing.freeze_support()
+    if '--supervisor' in sys.argv:
+        # main.py --supervisor [rigs.cfg]: по процессу сбора на стенд и общая панель
+        from src.Supervisor import run_supervisor
+        args = sys.argv[sys.argv.index('--supervisor') + 1:]
+        sys.exit(run_supervisor(*args[:1]))
+
+    if '--headless' in sys.argv:
+        # main.py --headless [папка стенда]: сбор и запись без GUI, управление через сокет
+        from src.Rig import run_headless
+        args = sys.argv[sys.argv.index('--headless') + 1:]
+        sys.exit(run_headless(*args[:1]))
+
+    if '--attach' in sys.argv:
+        # main.py --attach [папки стендов...]: панель для запущенных --headless процессов
+        from src.Supervisor import run_attach
+        sys.exit(run_attach(*sys.argv[sys.argv.index('--attach') + 1:]))
+
+    if '--control' in sys.argv:
+        # main.py --control <команда> [ключ=значение ...] [--port N]: команда фоновому процессу
+        import json
+        from src.Control import send_command
+        args = sys.argv[sys.argv.index('--control') + 1:]
+        port = 5100
+        if '--port' in args:
+            i = args.index('--port')
+            port = int(args[i + 1])
+            del args[i:i + 2]
+        params = dict(arg.split('=', 1) for arg in args[1:])
+        print(json.dumps(send_command(args[0], port=port, **({'params': params} if params else {})),
+                         ensure_ascii=False, indent=1))
+        sys.exit(0)
+
+    if '--catalog' in sys.argv:
+        # main.py --catalog [full]: досканировать папку результатов в каталог сессий (full — с нуля)
+        import json
+        from src.Catalog import Catalog
+        from src.utils import read_conf
+        args = sys.argv[sys.argv.index('--catalog') + 1:]
+        summary = Catalog.from_config(read_conf('app.cfg')).rebuild(full='full' in args)
+        print(json.dumps(summary, ensure_ascii=False, indent=1))
+        sys.exit(0)
+
+    if '--report' in sys.argv:
+        # main.py --report <файл сессии> [--workers N] [--pdf]: отчёт рядом с файлом (см. SessionReport)
+        import json
+        from src.Report import SessionReport
+        from src.utils import read_conf
+        args = sys.argv[sys.argv.index('--report') + 1:]
+        report = SessionReport.from_config(read_conf('app.cfg'))
+        if '--workers' in args:
+            report.workers = int(args[args.index('--workers') + 1])
+        if '--pdf' in args:
+            from PySide6.QtGui import QGuiApplication
+            app = QGuiApplication(sys.argv[:1])   # шрифты и отрисовка графиков для PDF
+            report.formats = ('html', 'pdf')
+        print(json.dumps(report.run(args[0]), ensure_ascii=False, indent=1))
+        sys.exit(0)
+
+    if '--viewer' in sys.argv:
+        from src.Viewer import run_viewer
+        args = sys.argv[sys.argv.index('--viewer') + 1:]
+        sys.exit(run_viewer(*args[:3]))
+
+    # Проверка лицензии идёт параллельно с импортом Qt и построением окна
+    from src.hw import check_lic
+    executor = ThreadPoolExecutor(max_workers=1)
+    lic = executor.submit(check_lic)
+
+    plc = None
+    if '--replay' in sys.argv:
+        # main.py --replay <файл сессии или папка чанков> [--speed N], N=0 — как можно быстрее
+        from src.Replay import ReplayClient
+        speed = float(sys.argv[sys.argv.index('--speed') + 1]) if '--speed' in sys.argv else 1.0
+        plc = ReplayClient(sys.argv[sys.argv.index('--replay') + 1], speed)
+
+    from src.MainWindow import MainWindow, MainApp
     app = MainApp()
-    window = MainWindow(lic)
+    window = MainWindow(lic, plc)
     window.show()
+    # pandas разбирает блоки файлов сессии (SessionFile.parse_rows: плитки истории, воспроизведение,
+    # отчёт после стопа) — подгружаем в фоне после показа окна, чтобы первый такой запрос не ждал импорта
+    threading.Thread(target=importlib.import_module, args=('pandas',), daemon=True).start()
 
     sys.exit(app.exec())
@@ -0,0 +1,312 @@
+import re
+import time
+import itertools
+import threading
+from pathlib import Path
+from src.Metrics import METRICS
+from src.SessionFile import header_map, EXTRA_AXES
+
+NAN = float('nan')
+INDEX_FILE = 'events.tsv'
+INDEX_HEADER = 'Дата\tВремя\tСобытие\tЗначение\tНомер отсчёта\tДо\tПосле\tФайл\n'
+
+
+class Trigger:
+    """Триггер захвата: срабатывает при входе в условие и взводится заново, когда оно пропало."""
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.armed = True
+
+    def value(self, row):
+        """Нефильтрованное значение канала, если пишется, иначе отфильтрованное."""
+        v = row.get(self.raw)
+        return row.get(self.channel, NAN) if v is None else v
+
+    def describe(self):
+        raise NotImplementedError
+
+    def check(self, row, stat, t):
+        """Значение, вызвавшее срабатывание, или None."""
+        raise NotImplementedError
+
+
+class LevelTrigger(Trigger):
+    """Канал выше (above) / ниже (below) level; взводится, когда вернулся за level ∓ hysteresis."""
+    def __init__(self, name, channel, above, level, hysteresis=0.0):
+        self.channel, self.above = channel, above
+        self.raw = channel + '_raw'
+        self.level, self.hysteresis = float(level), float(hysteresis)
+        super().__init__(name)
+
+    def describe(self):
+        return f'{self.channel}{">" if self.above else "<"}{self.level:g}'
+
+    def check(self, row, stat, t):
+        v = self.value(row)
+        if v != v:
+            return None
+        beyond = v > self.level if self.above else v < self.level
+        if beyond and self.armed:
+            self.armed = False
+            return v
+        if not self.armed:
+            back = self.level - self.hysteresis if self.above else self.level + self.hysteresis
+            if (v <= back) if self.above else (v >= back):
+                self.armed = True
+        return None
+
+
+class EdgeTrigger(Trigger):
+    """Канал пересёк level между соседними отсчётами: вверх (rise) или вниз (fall)."""
+    def __init__(self, name, channel, rising, level):
+        self.channel, self.rising, self.level = channel, rising, float(level)
+        self.raw = channel + '_raw'
+        super().__init__(name)
+
+    def reset(self):
+        super().reset()
+        self.prev = NAN
+
+    def describe(self):
+        return f'{self.channel} {"вверх" if self.rising else "вниз"} через {self.level:g}'
+
+    def check(self, row, stat, t):
+        v = self.value(row)
+        prev, self.prev = self.prev, v
+        if v != v or prev != prev:
+            return None
+        if self.rising and prev < self.level <= v or not self.rising and prev > self.level >= v:
+            return v
+        return None
+
+
+class RateTrigger(Trigger):
+    """|dX/dt| (ед./с) по соседним отсчётам выше limit."""
+    def __init__(self, name, channel, limit):
+        self.channel, self.limit = channel, float(limit)
+        self.raw = channel + '_raw'
+        super().__init__(name)
+
+    def reset(self):
+        super().reset()
+        self.prev = None
+
+    def describe(self):
+        return f'|d{self.channel}/dt|>{self.limit:g}'
+
+    def check(self, row, stat, t):
+        v = self.value(row)
+        prev, self.prev = self.prev, (None if v != v else (v, t))
+        if v != v or prev is None or t <= prev[1]:
+            return None
+        rate = abs(v - prev[0]) / (t - prev[1])
+        if rate <= self.limit:
+            self.armed = True
+            return None
+        if self.armed:
+            self.armed = False
+            return rate
+        return None
+
+
+class BitTrigger(Trigger):
+    """Бит Stat[bit] установился (set) или сбросился (clear)."""
+    def __init__(self, name, bit, set_=True):
+        self.bit, self.set = int(bit), set_
+        super().__init__(name)
+
+    def reset(self):
+        super().reset()
+        self.prev = None
+
+    def describe(self):
+        return f'Stat[{self.bit}] {"=1" if self.set else "=0"}'
+
+    def check(self, row, stat, t):
+        bit = bool(stat >> self.bit & 1) if stat is not None else None
+        prev, self.prev = self.prev, bit
+        if prev is not None and bit is not None and prev != bit and bit == self.set:
+            return float(bit)
+        return None
+
+
+def parse_trigger(name, spec):
+    """
+    Триггер из строки конфигурации trigger_<имя>:
+        above:КАНАЛ:УРОВЕНЬ[:ГИСТЕРЕЗИС]  below:КАНАЛ:УРОВЕНЬ[:ГИСТЕРЕЗИС]
+        rise:КАНАЛ:УРОВЕНЬ  fall:КАНАЛ:УРОВЕНЬ  rate:КАНАЛ:ЕД_В_СЕКУНДУ
+        stat:БИТ[:clear]
+    например `above:M:8:0.5` — всплеск момента выше 8 Н∙м.
+    """
+    kind, *args = str(spec).split(':')
+    args = [a.replace(',', '.') for a in args]
+    if kind in ('above', 'below'):
+        return LevelTrigger(name, args[0], kind == 'above', *args[1:3])
+    if kind in ('rise', 'fall'):
+        return EdgeTrigger(name, args[0], kind == 'rise', args[1])
+    if kind == 'rate':
+        return RateTrigger(name, args[0], args[1])
+    if kind == 'stat':
+        return BitTrigger(name, args[0], not (len(args) > 1 and args[1] == 'clear'))
+    raise ValueError(f'неизвестный триггер {name}: {spec}')
+
+
+class EventCapture:
+    """
+    Захват событий на полной частоте: кольцо последних pre отсчётов всех колонок
+    (список строк фиксированной длины) и после срабатывания — ещё post отсчётов. Готовое
+    событие пишется отдельным файлом results/<дата>/events/<время>-<имя>.tsv
+    (описание в строках '#', затем таблица как у файла сессии, плюс номер отсчёта
+    и биты состояния) и строкой в индекс results/events.tsv.
+
+    Триггеры проверяются на каждом отсчёте (значения за вычетом смещений,
+    нефильтрованные, если пишутся); request() — внешний запрос (кнопка, защита):
+    с номером seq он срабатывает, когда дойдёт отсчёт с этим номером. Срабатывания
+    во время уже идущего захвата отмечаются в его описании. Память — кольцо и
+    один захват: не больше 2·pre + post строк. reset()/flush() можно звать из
+    другого потока (смена сессии из GUI).
+    """
+    def __init__(self, triggers, columns, pre=500, post=500, base_dir='results'):
+        self.triggers = list(triggers)
+        self.columns = list(columns) + list(EXTRA_AXES)
+        self.pre = max(int(pre), 1)
+        self.post = max(int(post), 0)
+        self.base_dir = Path(base_dir)
+        self.axis_rename = {key: name for name, key in header_map().items()}
+        self._channels = self.columns[:-len(EXTRA_AXES)]
+        self.ring = [None] * self.pre
+        self.events = 0
+        self.last_path = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self.active = None
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config, columns):
+        """trigger_<имя> <триггер> (см. parse_trigger); capture_pre/capture_post — отсчётов до/после."""
+        triggers = [parse_trigger(key[len('trigger_'):], value) for key, value in config.items()
+                    if key.startswith('trigger_') and value not in ('0', 'none')]
+        return cls(triggers, columns, int(config.get('capture_pre', 500)), int(config.get('capture_post', 500)),
+                   config.get('result_path', 'results'))
+
+    def reset(self):
+        """Новая сессия: кольцо пусто, идущий захват записывается как есть."""
+        with self._lock:
+            self._flush()
+            self.pos = 0
+            self.filled = 0
+            self._pending.clear()
+            for trigger in self.triggers:
+                trigger.reset()
+
+    def request(self, name, text=None, value=None, seq=None):
+        """Внешний запрос захвата (ручной, от защиты); seq — номер отсчёта, к которому он относится."""
+        self._pending.append((seq, name, text or name, value))
+
+    def update(self, row: dict, seq, stat):
+        with self._lock:
+            self._update(row, seq, stat)
+
+    def _update(self, row, seq, stat):
+        values = tuple([row.get(c, NAN) for c in self._channels]) + (seq, stat)
+        pos = self.pos
+        self.ring[pos] = values
+        self.pos = pos + 1 if pos + 1 < self.pre else 0
+        if self.filled < self.pre:
+            self.filled += 1
+
+        active = self.active
+        if active is not None:
+            active['post'].append(values)
+
+        t = row['time']
+        fired = []
+        for trigger in self.triggers:
+            value = trigger.check(row, stat, t)
+            if value is not None:
+                fired.append((seq, trigger.name, f'{trigger.name}: {trigger.describe()}', value))
+        if self._pending:
+            ready = [p for p in self._pending if p[0] is None or seq is None or p[0] <= seq]
+            if ready:
+                self._pending = [p for p in self._pending if p not in ready]
+                fired.extend((seq if s is None else s, name, text, value) for s, name, text, value in ready)
+        for event in fired:
+            self._fire(event, row)
+
+        if self.active is not None and len(self.active['post']) >= self.post:
+            self._flush()
+
+    def _fire(self, event, row):
+        METRICS.count('capture_triggers')
+        if self.active is not None:
+            self.active['marks'].append(event + (row['time'],))
+            return
+        start = self.pos - self.filled
+        pre = self.ring[start:self.pos] if start >= 0 else self.ring[start:] + self.ring[:self.pos]
+        self.active = {'event': event, 'time': row['time'], 'wall': time.time(),
+                       'pre': pre, 'post': [], 'marks': []}
+
+    def flush(self):
+        """Записать идущий захват (при закрытии и смене сессии — с тем, что успело накопиться)."""
+        with self._lock:
+            return self._flush()
+
+    def _flush(self):
+        active, self.active = self.active, None
+        if active is None:
+            return None
+        start = time.perf_counter()
+        self.last_path = self._write(active)
+        self.events += 1
+        METRICS.since('capture_write', start)
+        return self.last_path
+
+    def _write(self, active):
+        seq, name, text, value = active['event']
+        wall = time.localtime(active['wall'])
+        folder = self.base_dir / time.strftime('%d.%m.%Y', wall) / 'events'
+        folder.mkdir(parents=True, exist_ok=True)
+        safe = re.sub(r'[^\w.-]+', '_', str(name))[:40]
+        path = folder / f'{time.strftime("%H.%M.%S", wall)}-{"" if seq is None else f"{seq}-"}{safe}.tsv'
+        value_text = '' if value is None else f'{value:g}'.replace('.', ',')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'# Событие: {text}\n')
+            f.write(f'# Время: {time.strftime("%d.%m.%Y %H:%M:%S", wall)} ({active["time"]:.3f} с от начала)\n')
+            f.write(f'# Значение: {value_text}\n')
+            f.write(f'# Номер отсчёта: {"" if seq is None else seq}\n')
+            f.write(f'# Отсчётов до/после: {len(active["pre"])}/{len(active["post"])}\n')
+            for m_seq, _, m_text, m_value, m_time in active['marks']:
+                m_value = '' if m_value is None else f' = {m_value:g}'.replace('.', ',')
+                f.write(f'# Также: {m_text}{m_value}, отсчёт {m_seq}, {m_time:.3f} с\n')
+            f.write('\t'.join(self.axis_rename.get(c, c) for c in self.columns) + '\n')
+            for values in itertools.chain(active['pre'], active['post']):
+                f.write('\t'.join('' if v is None or v != v else f'{v:.10g}'.replace('.', ',')
+                                   for v in values) + '\n')
+
+        index = self.base_dir / INDEX_FILE
+        new = not index.exists()
+        with open(index, 'a', encoding='utf-8') as f:
+            if new:
+                f.write(INDEX_HEADER)
+            f.write('\t'.join([time.strftime('%d.%m.%Y', wall), time.strftime('%H:%M:%S', wall), text,
+                               value_text, '' if seq is None else str(seq), str(len(active['pre'])),
+                               str(len(active['post'])), str(path.relative_to(self.base_dir))]) + '\n')
+        return path
+
+
+def read_index(base_dir='results', limit=None):
+    """Строки индекса событий (словари по заголовку INDEX_HEADER), новые первыми."""
+    path = Path(base_dir) / INDEX_FILE
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        header = f.readline().rstrip('\n').split('\t')
+        lines = f.read().splitlines()
+    lines.reverse()
+    if limit is not None:
+        lines = lines[:limit]
+    return [dict(zip(header, line.split('\t'))) for line in lines]
@@ -0,0 +1,369 @@
+import os
+import json
+import time
+import sqlite3
+import itertools
+import multiprocessing
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from src.SessionFile import parse_rows
+
+CATALOG_FILE = 'catalog.sqlite'
+META_SUFFIX = '-meta.json'
+POOL_MIN_FILES = 32   # меньше файлов — сканируются в своём процессе: запуск пула дороже
+# Причина окончания по умолчанию — по действию в имени файла (см. get_filepath)
+ACTION_REASONS = {'start': 'запуск', 'stop': 'останов', '': 'сохранение'}
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    saved TEXT, action TEXT, reason TEXT, rig TEXT,
+    rows INTEGER, duration REAL, cycles REAL, n_end REAL,
+    size INTEGER, mtime REAL, indexed REAL);
+CREATE INDEX IF NOT EXISTS sessions_saved ON sessions(saved);
+CREATE TABLE IF NOT EXISTS params (
+    session INTEGER NOT NULL, kind TEXT, name TEXT NOT NULL, value REAL,
+    PRIMARY KEY (session, name)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS params_value ON params(name, value);
+CREATE TABLE IF NOT EXISTS channels (
+    session INTEGER NOT NULL, channel TEXT NOT NULL, min REAL, max REAL, mean REAL, count INTEGER,
+    PRIMARY KEY (session, channel)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS channels_max ON channels(channel, max);
+"""
+
+
+class ColumnStats:
+    """
+    min/max/сумма/число значений по колонкам, блок за блоком (NaN пропускаются).
+    Копится при записи чанков, поэтому итог сессии готов без повторного чтения файла.
+    """
+    def __init__(self, columns):
+        self.columns = list(columns)
+        n = len(self.columns)
+        self.min = np.full(n, np.nan)
+        self.max = np.full(n, np.nan)
+        self.sum = np.zeros(n)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.rows = 0
+
+    def add(self, block):
+        """block — строки × колонки (порядок self.columns)."""
+        block = np.asarray(block, dtype=np.float64)
+        if not block.size:
+            return
+        self.min = np.fmin(self.min, np.fmin.reduce(block, axis=0))
+        self.max = np.fmax(self.max, np.fmax.reduce(block, axis=0))
+        valid = ~np.isnan(block)
+        self.sum += np.where(valid, block, 0.0).sum(axis=0)
+        self.count += valid.sum(axis=0)
+        self.rows += block.shape[0]
+
+    def result(self):
+        """{колонка: (min, max, mean, count)} для колонок, где есть значения."""
+        out = {}
+        for i, c in enumerate(self.columns):
+            if self.count[i]:
+                out[c] = (float(self.min[i]), float(self.max[i]), float(self.sum[i] / self.count[i]),
+                          int(self.count[i]))
+        return out
+
+
+def saved_time(path: Path):
+    """Время сохранения из results/<дд.мм.гггг>/<чч.мм.сс>[-действие].csv, иначе mtime файла."""
+    try:
+        stamp = time.strptime(f'{path.parent.name} {path.stem[:8]}', '%d.%m.%Y %H.%M.%S')
+    except ValueError:
+        stamp = time.localtime(path.stat().st_mtime)
+    return time.strftime('%Y-%m-%d %H:%M:%S', stamp)
+
+
+def _action(path: Path):
+    stem = path.stem
+    if len(stem) > 9 and stem[8] == '-':
+        return stem[9:]
+    return '' if len(stem) == 8 and stem[2] == '.' else stem
+
+
+def read_meta(path):
+    """Описание сессии из <файл>-meta.json (параметры, смещения, PID, причина окончания) или {}."""
+    meta_path = Path(path).with_name(Path(path).stem + META_SUFFIX)
+    if not meta_path.exists():
+        return {}
+    try:
+        return json.loads(meta_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_meta(path, meta):
+    meta_path = Path(path).with_name(Path(path).stem + META_SUFFIX)
+    meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=1), encoding='utf-8')
+    return meta_path
+
+
+def make_record(path, stats: ColumnStats, meta=None):
+    """Запись каталога: файл, итог по колонкам и описание сессии (см. read_meta)."""
+    path = Path(path)
+    meta = meta or {}
+    columns = stats.result()
+    st = path.stat()
+    action = _action(path)
+    record = {'path': path, 'saved': saved_time(path), 'action': action,
+              'reason': meta.get('reason') or ACTION_REASONS.get(action, action), 'rig': meta.get('rig'),
+              'rows': stats.rows, 'duration': None, 'cycles': None, 'n_end': None,
+              'size': st.st_size, 'mtime': st.st_mtime,
+              'channels': {c: v for c, v in columns.items() if c != 'time'}, 'params': {}}
+    if 'time' in columns:
+        record['duration'] = columns['time'][1] - columns['time'][0]
+    if 'N' in columns:
+        record['cycles'] = columns['N'][1] - columns['N'][0]
+        record['n_end'] = columns['N'][1]
+    for kind in ('params', 'offsets', 'pid'):
+        for name, value in (meta.get(kind) or {}).items():
+            try:
+                record['params'][name] = (kind, float(str(value).replace(',', '.')))
+            except ValueError:
+                pass
+    return record
+
+
+def scan_file(path, axis, block_rows=20000):
+    """
+    Итог по уже записанному файлу сессии: чтение блоками по block_rows строк, в памяти
+    не больше блока. axis — заголовок -> внутреннее имя (header_map). Выполняется в
+    процессах пула при перестроении каталога; ошибка возвращается в записи.
+    """
+    path = Path(path)
+    try:
+        with open(path, 'rb') as f:
+            line = f.readline()
+            while line.startswith(b'#'):
+                line = f.readline()
+            columns = [axis.get(name, name) for name in line.decode('utf-8').rstrip('\r\n').split('\t')]
+            stats = ColumnStats(columns)
+            while True:
+                lines = list(itertools.islice(f, block_rows))
+                if not lines:
+                    break
+                arrays = parse_rows(b''.join(lines), columns)
+                stats.add(np.column_stack([arrays[c] for c in columns]))
+        return make_record(path, stats, read_meta(path))
+    except Exception as e:
+        return {'path': path, 'error': f'{type(e).__name__}: {e}'}
+
+
+def parse_conditions(text):
+    """'P_tar=15 f_tar=4..6 T=..80' -> {имя: значение или (от, до)}; пустая граница — None."""
+    out = {}
+    for item in text.replace(',', '.').split():
+        name, _, value = item.partition('=')
+        if not value:
+            raise ValueError(f'условие {item}: нужно имя=значение или имя=от..до')
+        if '..' in value:
+            lo, hi = value.split('..', 1)
+            out[name] = (float(lo) if lo else None, float(hi) if hi else None)
+        else:
+            out[name] = float(value)
+    return out
+
+
+class Catalog:
+    """
+    Каталог записанных сессий в SQLite (results/catalog.sqlite): по строке на файл с
+    параметрами испытания, смещениями и PID (таблица params), итогом по каналам
+    (channels: min, max, среднее) и причиной окончания. Сессия добавляется при
+    сохранении (DataSaver.save_data) из итогов, накопленных при записи; rebuild()
+    досканирует папку результатов — в нескольких процессах и только изменившиеся
+    файлы. Соединение открывается на каждую операцию: каталог можно читать и писать
+    из разных потоков и процессов (журнал WAL).
+    """
+    def __init__(self, path=None, base_dir='results'):
+        self.base_dir = Path(base_dir)
+        self.path = Path(path) if path else self.base_dir / CATALOG_FILE
+        self._ready = False
+
+    @classmethod
+    def from_config(cls, config):
+        base_dir = config.get('result_path', 'results')
+        return cls(config.get('catalog_path'), base_dir)
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(self.path, timeout=30)
+        con.row_factory = sqlite3.Row
+        if not self._ready:
+            con.execute('PRAGMA journal_mode=WAL')
+            con.executescript(SCHEMA)
+            self._ready = True
+        return con
+
+    def _key(self, path):
+        """Путь в каталоге: относительно папки результатов, вне её — абсолютный."""
+        path = Path(path).absolute()
+        try:
+            return path.relative_to(self.base_dir.absolute()).as_posix()
+        except ValueError:
+            return str(path)
+
+    def _resolve(self, key):
+        path = Path(key)
+        return path if path.is_absolute() else self.base_dir / path
+
+    @staticmethod
+    def _delete(con, key):
+        for table in ('params', 'channels'):
+            con.execute(f'DELETE FROM {table} WHERE session IN (SELECT id FROM sessions WHERE path = ?)', (key,))
+        con.execute('DELETE FROM sessions WHERE path = ?', (key,))
+
+    def _store(self, con, record):
+        key = self._key(record['path'])
+        self._delete(con, key)
+        cur = con.execute(
+            'INSERT INTO sessions (path, saved, action, reason, rig, rows, duration, cycles, n_end, size, mtime, '
+            'indexed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, record['saved'], record['action'], record['reason'], record['rig'], record['rows'],
+             record['duration'], record['cycles'], record['n_end'], record['size'], record['mtime'], time.time()))
+        session = cur.lastrowid
+        con.executemany('INSERT INTO params VALUES (?, ?, ?, ?)',
+                        [(session, kind, name, value) for name, (kind, value) in record['params'].items()])
+        con.executemany('INSERT INTO channels VALUES (?, ?, ?, ?, ?, ?)',
+                        [(session, c, *v) for c, v in record['channels'].items()])
+        return session
+
+    def add(self, path, stats: ColumnStats, meta=None):
+        """Добавить (заменить) сессию по итогам, накопленным при записи."""
+        record = make_record(path, stats, meta)
+        with closing(self._connect()) as con, con:
+            return self._store(con, record)
+
+    def remove(self, path):
+        with closing(self._connect()) as con, con:
+            self._delete(con, self._key(path))
+
+    def __len__(self):
+        with closing(self._connect()) as con:
+            return con.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def find(self, since=None, until=None, text=None, params=None, channel_max=None, limit=500):
+        """
+        Сессии, новые первыми:
+            since, until — время сохранения, 'ГГГГ-ММ-ДД[ ЧЧ:ММ:СС]';
+            text         — подстрока пути, причины окончания или имени стенда;
+            params       — {имя: значение или (от, до)} по параметрам испытания
+                           (P_tar, f_tar, ...), PID (P_, I_, ...) и смещениям (P, M, L);
+            channel_max  — {канал: (от, до)} по максимуму канала за сессию;
+        границы None не ограничивают. Каждая сессия — словарь колонок sessions с
+        абсолютным path, params {имя: значение} и channels {канал: {min, max, mean, count}}.
+        """
+        where, args = [], []
+        if since:
+            where.append('s.saved >= ?')
+            args.append(str(since))
+        if until:
+            until = str(until)
+            where.append('s.saved <= ?')
+            args.append(until if len(until) > 10 else until + ' 23:59:59')
+        if text:
+            where.append('(s.path LIKE ? OR s.reason LIKE ? OR s.rig LIKE ?)')
+            args.extend([f'%{text}%'] * 3)
+        for table, column, conditions in (('params', 'value', params), ('channels', 'max', channel_max)):
+            key = 'name' if table == 'params' else 'channel'
+            for name, cond in (conditions or {}).items():
+                lo, hi = cond if isinstance(cond, (tuple, list)) else (cond, cond)
+                sub = [f'p.{key} = ?']
+                args.append(name)
+                if lo is not None and lo == hi:
+                    sub.append(f'abs(p.{column} - ?) < 1e-6')
+                    args.append(float(lo))
+                else:
+                    if lo is not None:
+                        sub.append(f'p.{column} >= ?')
+                        args.append(float(lo))
+                    if hi is not None:
+                        sub.append(f'p.{column} <= ?')
+                        args.append(float(hi))
+                where.append(f'EXISTS (SELECT 1 FROM {table} p WHERE p.session = s.id AND {" AND ".join(sub)})')
+        sql = 'SELECT * FROM sessions s'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY s.saved DESC, s.id DESC LIMIT ?'
+        args.append(int(limit))
+
+        with closing(self._connect()) as con:
+            rows = [dict(row) for row in con.execute(sql, args)]
+            ids = {row['id']: row for row in rows}
+            for row in rows:
+                row['path'] = self._resolve(row['path'])
+                row['params'], row['channels'] = {}, {}
+            keys = list(ids)
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                marks = ','.join('?' * len(part))
+                for session, name, value in con.execute(
+                        f'SELECT session, name, value FROM params WHERE session IN ({marks})', part):
+                    ids[session]['params'][name] = value
+                for session, channel, lo, hi, mean, count in con.execute(
+                        f'SELECT session, channel, min, max, mean, count FROM channels WHERE session IN ({marks})',
+                        part):
+                    ids[session]['channels'][channel] = {'min': lo, 'max': hi, 'mean': mean, 'count': count}
+        return rows
+
+    def rebuild(self, workers=None, full=False, progress=None, batch=50):
+        """
+        Досканировать папку результатов: новые и изменившиеся (размер, время изменения)
+        файлы *.csv разбираются в workers процессах (по умолчанию — по числу ядер; при
+        малом числе файлов — без пула), исчезнувшие удаляются из каталога; full —
+        пересканировать всё.
+        progress(готово, всего) вызывается после каждой пачки записей.
+        -> {'files', 'scanned', 'skipped', 'removed', 'errors'}
+        """
+        from src.SessionFile import header_map
+        files = sorted(p for p in self.base_dir.glob('**/*.csv') if not p.parent.name.startswith('session-'))
+        with closing(self._connect()) as con:
+            known = {row['path']: (row['size'], row['mtime'])
+                     for row in con.execute('SELECT path, size, mtime FROM sessions')}
+        present = {}
+        todo = []
+        for path in files:
+            key = self._key(path)
+            st = path.stat()
+            present[key] = path
+            if full or known.get(key) != (st.st_size, st.st_mtime):
+                todo.append(path)
+        gone = [key for key in known if key not in present and not self._resolve(key).exists()]
+
+        summary = {'files': len(files), 'scanned': 0, 'skipped': len(files) - len(todo), 'removed': len(gone),
+                   'errors': []}
+        with closing(self._connect()) as con, con:
+            for key in gone:
+                self._delete(con, key)
+        if not todo:
+            return summary
+
+        axis = header_map()
+        workers = max(1, min(int(workers or os.cpu_count() or 1), len(todo)))
+        pool = None
+        if workers > 1 and len(todo) >= POOL_MIN_FILES:
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+            results = pool.map(scan_file, todo, itertools.repeat(axis), chunksize=max(1, len(todo) // (workers * 8)))
+        else:
+            results = (scan_file(path, axis) for path in todo)
+        try:
+            done = 0
+            for part in iter(lambda: list(itertools.islice(results, batch)), []):
+                with closing(self._connect()) as con, con:
+                    for record in part:
+                        if 'error' in record:
+                            summary['errors'].append((str(record['path']), record['error']))
+                        else:
+                            self._store(con, record)
+                            summary['scanned'] += 1
+                done += len(part)
+                if progress is not None:
+                    progress(done, len(todo))
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        return summary
@@ -0,0 +1,190 @@
+import os
+import numpy as np
+from src.utils import read_json, read_TCP_conf
+
+TIME = 'time'
+CHANNELS_FILE = 'channels.json'
+# Каналы стенда по умолчанию. Адрес и тип берутся из modbus_adr.cfg, множитель — из
+# multiplier.json, заголовок можно переопределить в axis.json; channels.json дополняет
+# и переопределяет любые поля (см. Channel).
+DEFAULT_CHANNELS = {
+    'N': {'title': 'Наработка, цикл', 'units': 'циклов', 'decimals': 0, 'display': 'max'},
+    'P': {'title': 'Уровень нагружения, кН', 'units': 'кН', 'decimals': 2, 'display': 'offset', 'peaks': True},
+    'M': {'title': 'Крутящий момент, Нм', 'units': 'Н∙м', 'decimals': 2, 'display': 'minmax', 'peaks': True},
+    'T': {'title': 'Температура, °С', 'units': '°С', 'decimals': 2, 'display': 'plain', 'display_decimals': 1,
+          'peaks': True},
+    'f': {'title': 'Частота нагружения, Гц', 'units': 'Гц', 'decimals': 2, 'display': 'plain',
+          'display_decimals': 1, 'source': 'computed'},
+    'L': {'title': 'Значение зазора, мм', 'units': 'мм', 'decimals': 3, 'display': 'offset', 'peaks': True},
+}
+DEFAULT_PANEL = 'N,P,M,L,T,f'
+DISPLAY_KINDS = ('max', 'offset', 'minmax', 'plain', 'none')
+
+
+class Channel:
+    """
+    Канал стенда:
+        title, units       — заголовок колонки файла и оси, единицы на панели;
+        adr, dtype, regs   — регистр ПЛК (float/int на двух регистрах), source: plc или
+                             computed (вычисляется в потоке опроса, как f);
+        multiplier         — множитель к значению ПЛК;
+        decimals           — знаков в файле; display_decimals — на панели;
+        store              — писать в файл, окно графиков и кольцо просмотрщика (False —
+                             канал доступен только защите и фильтрам в потоке опроса);
+        display            — вид на панели: max (растущий счётчик), offset (со сбросом
+                             нуля), minmax (со сбросом и min/max), plain, none;
+        peaks              — экстремумы канала сохраняются в прореженном окне.
+    Смещения нуля — общие для всех каналов, в offsets.param.
+    """
+    def __init__(self, name, title=None, units='', adr=None, dtype='float', regs=2, multiplier=1.0,
+                 decimals=3, display_decimals=None, store=True, display='plain', peaks=False, source=None):
+        if dtype not in ('float', 'int'):
+            raise ValueError(f'канал {name}: неизвестный тип {dtype}')
+        if display not in DISPLAY_KINDS:
+            raise ValueError(f'канал {name}: неизвестный вид на панели {display}')
+        self.name = name
+        self.title = title or name
+        self.units = units
+        self.source = source or ('plc' if adr is not None else 'computed')
+        self.adr = None if adr is None or self.source != 'plc' else int(adr)
+        self.dtype = dtype
+        self.regs = int(regs)
+        self.multiplier = float(multiplier)
+        self.decimals = int(decimals)
+        self.display_decimals = self.decimals if display_decimals is None else int(display_decimals)
+        self.store = bool(store)
+        self.display = display
+        self.peaks = bool(peaks)
+
+    def __repr__(self):
+        return f'Channel({self.name!r}, adr={self.adr}, dtype={self.dtype!r})'
+
+
+class ChannelRegistry:
+    """
+    Набор каналов стенда в порядке колонок файла. Из него строятся опрос ПЛК
+    (PLCDecoder), запись (колонки, округление), оси графиков и панель значений.
+    stat — адрес слова состояния (регистр).
+    """
+    def __init__(self, channels, stat=None, panel=None):
+        self.channels = list(channels)
+        self.by_name = {ch.name: ch for ch in self.channels}
+        self.names = [ch.name for ch in self.channels]
+        self.stored = [ch.name for ch in self.channels if ch.store]
+        self.columns = [TIME] + self.stored
+        self.acquired = [ch for ch in self.channels if ch.adr is not None]
+        self.computed = [ch.name for ch in self.channels if ch.source == 'computed']
+        self.peaks = [ch.name for ch in self.channels if ch.peaks and ch.store]
+        self.stat = stat
+        order = [name for name in (panel or []) if name in self.by_name]
+        order += [name for name in self.names if name not in order]
+        self.panel = [self.by_name[name] for name in order if self.by_name[name].display != 'none']
+
+    @classmethod
+    def from_config(cls, config=None, tcp=None):
+        """
+        Каналы из файлов текущей папки: DEFAULT_CHANNELS + channels.json, адреса —
+        modbus_adr.cfg (или tcp — уже прочитанный), множители — multiplier.json,
+        заголовки — axis.json; порядок на панели — panel_channels из app.cfg.
+        """
+        if tcp is None:
+            tcp = read_TCP_conf('modbus_adr.cfg') if os.path.isfile('modbus_adr.cfg') else {}
+        multiplier = read_json('multiplier.json') if os.path.isfile('multiplier.json') else {}
+        titles = {key: title for title, key in read_json('axis.json').items()} if os.path.isfile('axis.json') else {}
+        extra = read_json(CHANNELS_FILE) if os.path.isfile(CHANNELS_FILE) else {}
+
+        specs = {name: dict(spec) for name, spec in DEFAULT_CHANNELS.items()}
+        for name, spec in extra.items():
+            specs.setdefault(name, {}).update(spec)
+        channels = []
+        for name, spec in specs.items():
+            if name in tcp and spec.get('source', 'plc') == 'plc':
+                dtype, adr, regs = tcp[name]
+                spec = dict({'dtype': dtype, 'adr': adr, 'regs': regs}, **spec)
+            spec.setdefault('multiplier', multiplier.get(name, 1.0))
+            if name in titles and 'title' not in extra.get(name, {}):
+                spec['title'] = titles[name]
+            channels.append(Channel(name, **spec))
+        stat = tcp['Stat'][1] if 'Stat' in tcp else None
+        panel = str((config or {}).get('panel_channels', DEFAULT_PANEL)).split(',')
+        return cls(channels, stat, panel)
+
+    def __iter__(self):
+        return iter(self.channels)
+
+    def __len__(self):
+        return len(self.channels)
+
+    def __getitem__(self, name):
+        return self.by_name[name]
+
+    def titles(self):
+        """Внутреннее имя колонки -> заголовок файла."""
+        rename = {TIME: self._time_title()}
+        rename.update({ch.name: ch.title for ch in self.channels})
+        return rename
+
+    def axis(self):
+        """Заголовок -> внутреннее имя для записываемых колонок (как axis.json)."""
+        titles = self.titles()
+        return {titles[c]: c for c in self.columns}
+
+    def decimals(self):
+        """Внутреннее имя колонки -> знаков после запятой в файле."""
+        out = {TIME: 2}
+        out.update({ch.name: ch.decimals for ch in self.channels if ch.store})
+        return out
+
+    @staticmethod
+    def _time_title():
+        if os.path.isfile('axis.json'):
+            for title, key in read_json('axis.json').items():
+                if key == TIME:
+                    return title
+        return 'Время, с'
+
+
+class PLCDecoder:
+    """
+    Разбор ответа ПЛК (катушки с 0, регистр k — биты 16k..16k+15) для всех каналов
+    сразу: биты упаковываются в байты, float и int читаются одним индексированием по
+    заранее вычисленным смещениям, множители — вектором. Время разбора почти не
+    зависит от числа каналов. span — сколько регистров нужно прочитать.
+    """
+    def __init__(self, registry: ChannelRegistry):
+        acquired = registry.acquired
+        ends = [ch.adr + ch.regs for ch in acquired]
+        if registry.stat is not None:
+            ends.append(registry.stat + 1)
+        self.span = max(ends, default=0)
+        self.stat = registry.stat
+
+        floats = [ch for ch in acquired if ch.dtype == 'float']
+        ints = [ch for ch in acquired if ch.dtype == 'int']
+        self.float_names = [ch.name for ch in floats]
+        self.float_idx = self._byte_index(floats)
+        self.float_mult = np.array([ch.multiplier for ch in floats], dtype=np.float64)
+        self.int_names = [ch.name for ch in ints]
+        self.int_idx = self._byte_index(ints)
+        self.int_mult = np.array([ch.multiplier for ch in ints], dtype=np.float64)
+        # Вычисляемые каналы до расчёта — 0.0, как раньше f
+        self.defaults = {name: 0.0 for name in registry.computed}
+
+    @staticmethod
+    def _byte_index(channels):
+        adr = np.array([ch.adr for ch in channels], dtype=np.intp)
+        return (2 * adr)[:, None] + np.arange(4)
+
+    def __call__(self, coils):
+        raw = np.packbits(np.frombuffer(bytes(coils), dtype=np.uint8), bitorder='little')
+        out = dict(self.defaults)
+        if self.stat is not None:
+            out['Stat'] = int(raw[2 * self.stat])   # младшие 8 бит регистра Stat
+        if self.float_names:
+            values = raw[self.float_idx].view('<f4').ravel().astype(np.float64)
+            values = np.round(values, 3) * self.float_mult
+            out.update(zip(self.float_names, values.tolist()))
+        if self.int_names:
+            values = raw[self.int_idx].view('<u4').ravel() * self.int_mult
+            out.update(zip(self.int_names, np.trunc(values).astype(np.int64).tolist()))
+        return out
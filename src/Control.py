@@ -0,0 +1,79 @@
+import json
+import socket
+import threading
+import socketserver
+from concurrent.futures import Future
+from PySide6.QtCore import QObject, Signal, Slot
+
+ENCODING = 'utf-8'
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Одна строка JSON — один запрос: {"cmd": "...", "args": {...}} -> {"ok": ..., "result"|"error": ...}."""
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line.decode(ENCODING))
+                reply = {'ok': True, 'result': self.server.control.call(request['cmd'], request.get('args') or {})}
+            except Exception as e:
+                reply = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(reply, ensure_ascii=False, default=str).encode(ENCODING) + b'\n')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ControlServer(QObject):
+    """
+    Управляющий сокет (TCP, по умолчанию только localhost). Запросы принимаются в
+    потоках сервера, а выполняются в потоке Qt-объекта handler: handler.command(cmd, args).
+    """
+    requested = Signal(str, object, object)
+
+    def __init__(self, handler, port, host='127.0.0.1', timeout=30.0):
+        super().__init__()
+        self.handler = handler
+        self.timeout = float(timeout)
+        self.requested.connect(self._execute)
+        self.server = _Server((host, int(port)), _Handler)
+        self.server.control = self
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name='control', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def call(self, cmd, args):
+        future = Future()
+        self.requested.emit(cmd, args, future)
+        return future.result(self.timeout)
+
+    @Slot(str, object, object)
+    def _execute(self, cmd, args, future):
+        try:
+            future.set_result(self.handler.command(cmd, args))
+        except Exception as e:
+            future.set_exception(e)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def send_command(cmd, host='127.0.0.1', port=5100, timeout=30.0, **args):
+    """Выполнить одну команду управляющего сокета; вернуть результат или поднять RuntimeError."""
+    with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+        sock.sendall(json.dumps({'cmd': cmd, 'args': args}, ensure_ascii=False).encode(ENCODING) + b'\n')
+        reply = sock.makefile('rb').readline()
+    if not reply:
+        raise ConnectionError('управляющий сокет закрыл соединение')
+    reply = json.loads(reply.decode(ENCODING))
+    if not reply['ok']:
+        raise RuntimeError(reply['error'])
+    return reply['result']
@@ -1,57 +1,135 @@
 import numpy as np
-import pandas as pd
 from pathlib import Path
 from collections import deque
 from PySide6.QtCore import QObject, QThread, Signal, Slot
-from src.utils import read_json, RollingMean
+from src.Channels import ChannelRegistry
+from src.SessionFile import make_block, BlockIndex, INDEX_AXES, RAW_SUFFIX
+from src.Filters import FilterBank
+from src.Rainflow import RainflowBank
+from src.Trend import LTrend
+from src.Capture import EventCapture
+from src.History import HistoryLoader
+from src.Density import DensityBank
+from src.SharedRing import SharedRing
+from src.Metrics import METRICS
+from src.Sequence import SequenceMonitor
+from src.StreamServer import StreamServer
+from src.StatusWord import StatusBits, StatusEvents
+from src.Catalog import Catalog, ColumnStats, write_meta
+from src.Report import SessionReport
+from src.utils import read_conf
+from concurrent.futures import ThreadPoolExecutor, Future
+import sqlite3
 import time
 import shutil
+import os
 
 
-def add_ext(main_dict:dict, dict2add:dict):
-    for param in ['P', 'M', 'T', 'L']:
-        arr = np.abs(dict2add[param])
-        for key in main_dict.keys():
-            idx_max = np.where(arr==np.max(arr))[0]
-            idx2add = idx_max
-            for idx in idx2add:
-                main_dict[key].append(dict2add[key][idx])
-
-    time_arg = np.argsort(main_dict['time'])
+def add_ext(main_dict:dict, dict2add:dict, params=('P', 'M', 'T', 'L')):
+    """
+    Дополняет прореженное окно main_dict отсчётами окна dict2add, на которых |канал|
+    максимален (по каждому из params). Окна идут друг за другом, поэтому новые точки
+    в порядке номера ложатся после накопленных; на колонку — одна выборка по индексам.
+    """
+    idx = []
+    for param in params:
+        arr = np.abs(np.asarray(dict2add[param], dtype=np.float64))
+        if arr.size:
+            idx.extend(np.flatnonzero(arr == np.max(arr)).tolist())
+    if not idx:
+        return main_dict
+    idx.sort()
     for key in main_dict.keys():
-        main_dict[key] = [main_dict[key][i] for i in time_arg]
-
+        main_dict[key].extend(np.asarray(dict2add[key])[idx].tolist())
     return main_dict
 
 
-def round_dataframe(df: pd.DataFrame, decimals=None) -> pd.DataFrame:
+def format_rows(block, decimals) -> str:
     """
-    Округляет все числовые значения в DataFrame до указанного числа знаков.
-    Строки и другие типы остаются без изменений.
+    Строки TSV блока (строки × колонки) с десятичной запятой: каждая колонка
+    округляется целиком до decimals[i] знаков (0 — целые, None — как есть), NaN —
+    пустая ячейка. Округление векторное, в Python остаётся только перевод чисел в текст.
     """
-    if decimals is None:
-        decimals = {'Время, с': 2, 'Наработка, цикл': 0, 'Уровень нагружения, кН': 2,
-                    'Крутящий момент, Нм': 2, 'Температура, °С': 2,
-                    'Частота нагружения, Гц': 2, 'Значение зазора, мм': 3}
-    for numeric_col in decimals.keys():
+    columns = []
+    for i, dec in enumerate(decimals):
+        col = block[:, i]
+        if dec == 0:
+            columns.append(['' if v != v else str(int(v)) for v in np.round(col).tolist()])
+        else:
+            columns.append(list(map(repr, (col if dec is None else np.round(col, dec)).tolist())))
+    text = '\n'.join(map('\t'.join, zip(*columns)))
+    return text.replace('nan', '').replace('.', ',') + '\n' if text else ''
 
-        df[numeric_col] = df[numeric_col].round(decimals[numeric_col])
-    return df
+
+class ColumnWindow:
+    """
+    Оперативное окно последних size строк всех колонок одним массивом (строки × колонки):
+    отсчёт записывается одним присваиванием, сколько бы ни было каналов. count —
+    всего записанных строк, clear() его не сбрасывает. Читатель из другого потока получает копии; строки,
+    перезаписанные во время копирования, могут оказаться новее — для графиков это допустимо.
+    """
+    def __init__(self, columns, size):
+        self.columns = list(columns)
+        self.index = {c: i for i, c in enumerate(self.columns)}
+        self.size = max(int(size), 1)
+        self.buf = np.full((self.size, len(self.columns)), np.nan)
+        self.count = 0
+        self.start = 0   # строки до start очищены
+
+    def __len__(self):
+        return min(self.count - self.start, self.size)
+
+    def append(self, values):
+        self.buf[self.count % self.size] = values
+        self.count += 1
+
+    def clear(self):
+        self.start = self.count
+
+    def tail(self, n=None, keys=None, dtype=np.float64, end=None):
+        """Последние n строк (по умолчанию все) до строки end колонок keys по порядку времени."""
+        count = self.count if end is None else end
+        n = max(min(len(self) if n is None else n, count - self.start, self.size - (self.count - count)), 0)
+        keys = self.columns if keys is None else keys
+        idx = np.arange(count - n, count) % self.size
+        cols = [self.index[k] for k in keys]
+        block = self.buf[idx][:, cols].astype(dtype, copy=False)
+        return {k: block[:, i].copy() for i, k in enumerate(keys)}
 
 class ChunkedLogger:
     """
     Пишет чанки по CHUNK_SIZE строк в отдельные файлы в папке сессии.
     При финализации сшивает все чанки + хвост в один файл.
+    События непрерывности (разрывы, повторы, опоздания) пишутся сразу в gaps.tsv
+    папки сессии и при финализации кладутся рядом с итоговым файлом (<имя>-gaps.tsv).
     """
-    def __init__(self, base_dir="results", axis_rename=None, chunk_size=1000):
+    EVENT_NAMES = {'gap': 'пропуск', 'duplicate': 'повтор', 'late': 'опоздание',
+                   'outage_start': 'обрыв связи', 'outage_end': 'связь восстановлена'}
+    EVENT_HEADER = 'Время, с\tСобытие\tНомер с\tНомер по\tКоличество\tОпоздание, мс\n'
+    STAT_HEADER = 'Время, с\tНомер отсчёта\tБит\tНазвание\tБыло\tСтало\n'
+    def __init__(self, base_dir="results", axis_rename=None, chunk_size=1000, raw_columns=(), columns=None,
+                 decimals=None):
         self.base_dir = Path(base_dir)
         self.chunk_size = chunk_size
         self.base_dir.mkdir(parents=True, exist_ok=True)
         self.axis_rename = axis_rename or {}
+        self.raw_columns = list(raw_columns)
+        self.columns = list(columns or ['time', 'N', 'P', 'M', 'T', 'f', 'L']) + self.raw_columns
+        # Знаков после запятой по колонкам (нефильтрованная копия — как у канала)
+        decimals = decimals if decimals is not None else ChannelRegistry.from_config().decimals()
+        self._decimals = [decimals.get(c[:-len('_raw')] if c.endswith('_raw') else c) for c in self.columns]
         self.session_dir = None
         self.rows_buffer = []
         self.chunks = []
+        self.blocks = []            # блоки чанков текущей сессии (по порядку чанков)
+        self.index = BlockIndex()            # индекс блоков с пирамидой сводок (для просмотра истории)
+        self.finished_index = BlockIndex()   # то же для последнего сшитого файла
+        self.stats = ColumnStats(self.columns)            # итог по колонкам текущей сессии (для каталога)
+        self.finished_stats = ColumnStats(self.columns)   # итог последнего сшитого файла
         self.chunk_idx = 0
+        # Номер поколения блоков: после сшивки чанки пишутся заново в те же файлы и по тем же
+        # смещениям, и кэш плиток истории (TileCache) не должен отдать данные прежней сессии
+        self.generation = 0
         self._start_new_session_dir()
 
     def _start_new_session_dir(self):
@@ -60,39 +138,115 @@ class ChunkedLogger:
         self.session_dir.mkdir(parents=True, exist_ok=True)
         self.rows_buffer.clear()
         self.chunks.clear()
+        self.blocks.clear()
+        self.index = BlockIndex()
+        self.stats = ColumnStats(self.columns)
         self.chunk_idx = 0
+        self.generation += 1
 
     def start_new_session(self):
         """Начать новую сессию (очистить список чанков, создать новую папку)."""
         self._start_new_session_dir()
 
+    def header_line(self):
+        return '\t'.join(self.axis_rename.get(c, c) for c in self.columns) + '\n'
+
     def _flush_chunk(self):
         if not self.rows_buffer:
             return
+        start = time.perf_counter()
         self.chunk_idx += 1
         chunk_path = self.session_dir / f"chunk-{self.chunk_idx:05d}.tsv"
 
         chunk_path.parent.mkdir(parents=True, exist_ok=True)
 
-        df = pd.DataFrame(self.rows_buffer)
-        if self.axis_rename:
-            df = df.rename(columns=self.axis_rename)
-        df = round_dataframe(df)
-        df.to_csv(chunk_path, index=False, sep="\t", decimal=",")
+        block = np.vstack(self.rows_buffer)
+        arrays = {c: block[:, i] for i, c in enumerate(self.columns)}
+        self.stats.add(block)
+        with open(chunk_path, 'w', encoding='utf-8') as f:
+            f.write(self.header_line())
+            f.write(format_rows(block, self._decimals))
         self.chunks.append(chunk_path)
         self.rows_buffer.clear()
 
-    def append_rows(self, rows: list[dict]):
-        """Добавить строки (внутренние имена колонок!), сбросить на диск при достижении CHUNK_SIZE."""
+        with open(chunk_path, 'rb') as f:
+            offset = len(f.readline())
+        size = chunk_path.stat().st_size - offset
+        block = make_block(chunk_path, offset, size, arrays, self.generation)
+        self.blocks.append(block)
+        self.index.append(block)
+        METRICS.count('chunk_bytes', offset + size, 'bytes')
+        METRICS.since('chunk_write', start)
+
+    @property
+    def events_path(self):
+        return self.session_dir / 'gaps.tsv'
+
+    @staticmethod
+    def _event_line(values):
+        cells = ['' if v is None else (f'{v}'.replace('.', ',') if isinstance(v, float) else str(v))
+                 for v in values]
+        return '\t'.join(cells) + '\n'
+
+    def log_events(self, events):
+        """Дописать события непрерывности (см. SequenceMonitor.check) в gaps.tsv сессии."""
+        if not events:
+            return
+        path = self.events_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        new = not path.exists()
+        with open(path, 'a', encoding='utf-8') as f:
+            if new:
+                f.write(self.EVENT_HEADER)
+            for t, event, *rest in events:
+                f.write(self._event_line([round(t, 2), self.EVENT_NAMES.get(event, event), *rest]))
+
+    @property
+    def stat_path(self):
+        return self.session_dir / 'stat.tsv'
+
+    def log_stat(self, transitions, bits: StatusBits):
+        """Дописать переходы битов состояния (см. StatusEvents.update) в stat.tsv сессии."""
+        path = self.stat_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        new = not path.exists()
+        with open(path, 'a', encoding='utf-8') as f:
+            if new:
+                f.write(self.STAT_HEADER)
+            for bit, old, value, t, seq in transitions:
+                f.write(self._event_line([round(t, 3), seq, bit, bits.name(bit),
+                                          None if old is None else int(old), int(value)]))
+
+    def _finalize_events(self, out_path: Path, counters):
+        """Итог по непрерывности + события сессии -> <out>-gaps.tsv."""
+        if counters is None:
+            return None
+        path = out_path.with_name(out_path.stem + '-gaps.tsv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.EVENT_HEADER)
+            if self.events_path.exists():
+                with open(self.events_path, 'r', encoding='utf-8') as fin:
+                    fin.readline()
+                    shutil.copyfileobj(fin, f)
+            f.write(self._event_line(['', 'принято', counters['first_seq'], counters['last_seq'],
+                                      counters['received'], counters['max_late_ms']]))
+            f.write(self._event_line(['', 'всего пропусков', '', '', counters['missing'], '']))
+            f.write(self._event_line(['', 'всего повторов', '', '', counters['duplicates'], '']))
+            f.write(self._event_line(['', 'всего опозданий', '', '', counters['late'], '']))
+        return path
+
+    def append_rows(self, rows: list):
+        """Добавить строки (массивы значений в порядке self.columns), сбросить на диск при достижении CHUNK_SIZE."""
         if not rows:
             return
         self.rows_buffer.extend(rows)
         if len(self.rows_buffer) >= self.chunk_size:
             self._flush_chunk()
 
-    def finalize_to(self, out_path: Path, delete_chunks: bool = True) -> Path:
+    def finalize_to(self, out_path: Path, delete_chunks: bool = True, counters=None) -> Path:
         """
         Дозаписать хвост в последний чанк (если есть), затем собрать все чанки в один файл out_path.
+        counters — итог SequenceMonitor для файла событий непрерывности.
         После — опционально удалить временные файлы/папку сессии.
         """
 
@@ -101,21 +255,32 @@ class ChunkedLogger:
 
         out_path = Path(out_path)
         out_path.parent.mkdir(parents=True, exist_ok=True)
+        self._finalize_events(out_path, counters)
+        if self.stat_path.exists():
+            shutil.copyfile(self.stat_path, out_path.with_name(out_path.stem + '-stat.tsv'))
 
+        self.finished_stats, self.stats = self.stats, ColumnStats(self.columns)
         if not self.chunks:
-            columns_internal = ['time', 'N', 'P', 'M', 'T', 'f', 'L']
-            columns = [self.axis_rename.get(c, c) for c in columns_internal]
-            pd.DataFrame(columns=columns).to_csv(out_path, index=False, sep="\t", decimal=",")
+            with open(out_path, 'w', encoding='utf-8') as f:
+                f.write(self.header_line())
             return out_path
 
+        finished = []
+        self.generation += 1   # out_path мог быть сшит раньше (повторное сохранение под тем же именем)
         with open(out_path, "wb") as fout:
             for i, chunk in enumerate(self.chunks):
                 with open(chunk, "rb") as fin:
+                    header = fin.readline()
                     if i == 0:
-                        shutil.copyfileobj(fin, fout)
-                    else:
-                        fin.readline()
-                        shutil.copyfileobj(fin, fout)
+                        fout.write(header)
+                    start = fout.tell()
+                    shutil.copyfileobj(fin, fout)
+                # Индекс блоков остаётся валидным для сшитого файла — меняются только смещения
+                if i < len(self.blocks) and self.blocks[i]['rows']:
+                    finished.append(dict(self.blocks[i], path=out_path, offset=start,
+                                         size=fout.tell() - start, generation=self.generation))
+        # Сводки грубых уровней с диском не связаны и переходят к сшитому файлу как есть
+        self.finished_index = BlockIndex([finished] + self.index.levels[1:], self.index.fanout)
 
         if delete_chunks:
             try:
@@ -124,7 +289,10 @@ class ChunkedLogger:
                 pass
         self.rows_buffer.clear()
         self.chunks.clear()
+        self.blocks.clear()
+        self.index = BlockIndex()
         self.chunk_idx = 0
+        self.generation += 1
         return out_path
 
 
@@ -132,22 +300,50 @@ class DataSaverWorker(QObject):
     """Работает в отдельном потоке, принимает новые данные и хранит их (RAM окно + чанки)."""
     finished = Signal()
 
-    def __init__(self, offsets, params=None, max_points_ram: int = 1000):
+    def __init__(self, offsets, channels: ChannelRegistry = None, max_points_ram: int = 1000, density_pairs=(),
+                 ring=None, chunk_size: int = None, late_ms: float = 100.0, clock=None, stream=None, raw_channels=(),
+                 rainflow=None, trend=None, capture=None, stat_bits=None):
         super().__init__()
-        if params is None:
-            params = ['time', 'N', 'P', 'M', 'T', 'f', 'L']
-        self.max_points_ram = max_points_ram
+        self.channels = channels or ChannelRegistry.from_config()
+        self.columns = self.channels.columns
+        # Каналы отсчёта (без времени) вектором: значения и смещения берутся одним проходом
+        self._keys = self.columns[1:]
+        self._zeros = [0.0] * len(self._keys)
+        self._int_idx = np.array([i for i, k in enumerate(self._keys, start=1)
+                                  if self.channels[k].dtype == 'int'], dtype=np.intp)
+        self.ring = ring
+        self.stream = stream
+        self.rainflow = rainflow
+        self.trend = trend
+        self.capture = capture
+        # Хронология слова состояния: в файл пишутся только переходы, первый отсчёт сессии — снимок
+        self.stat_bits = stat_bits or StatusBits({})
+        self.stat_events = StatusEvents()
         self.offsets = offsets
         self.max_points_ram = int(max_points_ram)
-        self.data = {p: deque(maxlen=self.max_points_ram) for p in params}
-        self.data_down = {p: deque(maxlen=self.max_points_ram) for p in params}
+        self.window = ColumnWindow(self.columns, self.max_points_ram)
+        self.data_down = {p: deque(maxlen=self.max_points_ram) for p in self.columns}
         self._running = True
 
-        axis = read_json('axis.json')
-        axis_rename = {v: k for k, v in axis.items()}
-
-        self.logger = ChunkedLogger(base_dir="results", axis_rename=axis_rename, chunk_size=self.max_points_ram)
+        axis_rename = self.channels.titles()
+        # Нефильтрованные значения (filter_raw) — отдельными колонками «<название> (без фильтра)»
+        self.raw_channels = list(raw_channels)
+        for ch in self.raw_channels:
+            axis_rename[f'{ch}_raw'] = axis_rename.get(ch, ch) + RAW_SUFFIX
+
+        self._raw_keys = [f'{ch}_raw' for ch in self.raw_channels]
+        self._raw_zeros = [0.0] * len(self.raw_channels)
+        self._row_columns = self.columns + self._raw_keys
+        self.chunk_size = int(chunk_size or self.max_points_ram)
+        self.logger = ChunkedLogger(base_dir="results", axis_rename=axis_rename, chunk_size=self.chunk_size,
+                                    raw_columns=self._raw_keys, columns=self.columns,
+                                    decimals=self.channels.decimals())
         self._batch = []
+        self._since_ext = 0
+        self.density = DensityBank(density_pairs)
+        # Непрерывность по seq; clock() — текущее время в шкале rel_time (мс), для опозданий доставки
+        self.sequence = SequenceMonitor(late_ms)
+        self.clock = clock
 
 
     @Slot(dict, float)
@@ -159,34 +355,69 @@ class DataSaverWorker(QObject):
         if not self._running:
             return
 
+        start = time.perf_counter()
+        arrival = self.clock() if self.clock else None
+        events = self.sequence.check(input_dict.get('seq'), input_dict.get('sched'),
+                                     elapsed_time_ms if arrival is None else arrival)
+        if events:
+            self._count_events(events)
+            self.logger.log_events(events)
+
         t = float(elapsed_time_ms) / 1000.0
-        self.data['time'].append(t)
-
-        row = {'time': t}
-
-        for key in ['N','P', 'M', 'L', 'T', 'f']:
-            val = input_dict.get(key, None)
-            if val is None:
-                v = np.nan
-            else:
-                off = self.offsets.get(key, 0.0)
-                if key == 'N':
-                    v = int(val - off)
-                else:
-                    v = float(val - off)
-            self.data[key].append(v)
-            row[key] = v
-
-        self._batch.append(row)
-
-        if len(self._batch) >= self.max_points_ram:
-            self.data_down = add_ext(self.data_down, self.data)
+        # Строка отсчёта одним массивом: время, каналы реестра, нефильтрованные копии (filter_raw).
+        # None -> NaN при переводе в массив; целые каналы (N) — с отбрасыванием дробной части
+        n = len(self.columns)
+        values = np.empty(len(self._row_columns))
+        values[0] = t
+        values[1:n] = np.array(list(map(input_dict.get, self._keys)), dtype=np.float64)
+        values[1:n] -= list(map(self.offsets.get, self._keys, self._zeros))
+        if self._int_idx.size:
+            values[self._int_idx] = np.trunc(values[self._int_idx])
+        if self.raw_channels:
+            raw = input_dict.get('raw') or {}
+            values[n:] = np.array(list(map(raw.get, self.raw_channels)), dtype=np.float64)
+            values[n:] -= list(map(self.offsets.get, self.raw_channels, self._raw_zeros))
+        self.window.append(values[:n])
+        row = dict(zip(self._row_columns, values.tolist()))
+
+        self._batch.append(values)
+        self.density.append(row)
+        if self.rainflow is not None:
+            self.rainflow.update(row)
+        if self.trend is not None:
+            self.trend.update(row['N'], row['L'], t)
+        stat = input_dict.get('Stat')
+        transitions = self.stat_events.update(stat, t, input_dict.get('seq'))
+        if transitions:
+            self.logger.log_stat(transitions, self.stat_bits)
+        if self.capture is not None:
+            self.capture.update(row, input_dict.get('seq'), stat)
+        if self.ring is not None:
+            self.ring.write(row)
+        if self.stream is not None:
+            self.stream.push(input_dict.get('seq'), row, stat)
+
+        self._since_ext += 1
+        if self._since_ext >= self.max_points_ram:
+            self._since_ext = 0
+            self.data_down = add_ext(self.data_down, self.window.tail(), self.channels.peaks)
+
+        METRICS.since('saver_append', start)
+
+        if len(self._batch) >= self.chunk_size:
+            start = time.perf_counter()
             try:
                 self.logger.session_dir.mkdir(parents=True, exist_ok=True)
             except Exception:
                 pass
             self.logger.append_rows(self._batch)
             self._batch.clear()
+            METRICS.since('saver_flush', start)
+
+    @property
+    def count(self):
+        """Всего принятых точек, для чтения новых данных потребителями."""
+        return self.window.count
 
     def get_data(self, ds=False):
         """Оперативное окно для графика (numpy-массивы)."""
@@ -194,19 +425,61 @@ class DataSaverWorker(QObject):
             return {k: np.fromiter(v, dtype=np.float32) if len(v) else np.array([], dtype=np.float32)
                         for k, v in self.data_down.items()}
         else:
-            return {k: np.fromiter(v, dtype=np.float32) if len(v) else np.array([], dtype=np.float32)
-                        for k, v in self.data.items()}
+            return self.window.tail(dtype=np.float32)
+
+    def get_tail(self, keys, since: int):
+        """
+        Точки, поступившие после отметки `since` (не более окна RAM).
+        Возвращает словарь массивов и новую отметку.
+        """
+        total = self.window.count
+        n = total - since
+        if n <= 0:
+            return {k: np.array([], dtype=np.float64) for k in keys}, total
+        return self.window.tail(n, keys, end=total), total
 
     def clear(self):
-        for k in self.data.keys():
-            self.data[k].clear()
+        self.window.clear()
+        for k in self.data_down.keys():
             self.data_down[k].clear()
+        self.density.reset()
 
     def start_new_session(self):
         """Сбросить оперативное окно и начать новую папку сессии для чанков."""
         self.clear()
         self.logger.start_new_session()
         self._batch.clear()
+        self.sequence.reset()
+        if self.rainflow is not None:
+            self.rainflow.reset()
+        if self.capture is not None:
+            self.capture.reset()
+        self.stat_events.reset()
+
+    @Slot(object)
+    def log_events(self, events):
+        self.logger.log_events(events)
+
+    @Slot(str, str, object, object)
+    def request_capture(self, name, text, value, seq):
+        if self.capture is not None:
+            self.capture.request(name, text, value, seq)
+
+    @Slot(dict)
+    def on_tripped(self, info):
+        """Срабатывание защиты (прямо из потока опроса): захват вокруг отсчёта, на котором оно было."""
+        self.request_capture(info['name'], info['text'], info['value'], info['seq'])
+
+    @staticmethod
+    def _count_events(events):
+        for _, event, _, _, count, _ in events:
+            if event == 'gap':
+                METRICS.count('seq_gaps')
+                METRICS.count('seq_missing', count)
+            elif event == 'duplicate':
+                METRICS.count('seq_duplicates')
+            elif event == 'late':
+                METRICS.count('seq_late', count)
 
     def finalize_to(self, out_path: Path):
         """Дозаписать хвост и сшить все чанки в единый файл."""
@@ -214,7 +487,28 @@ class DataSaverWorker(QObject):
             self.logger.append_rows(self._batch)
             self._batch.clear()
 
-        return self.logger.finalize_to(out_path)
+        self.logger.log_events(self.sequence.flush())
+        out_path = self.logger.finalize_to(out_path, counters=self.sequence.counters())
+        self.stat_events.reset()   # следующий файл начнётся со снимка состояния
+        if self.rainflow is not None and self.rainflow.counters:
+            self.rainflow.write(out_path.with_name(out_path.stem + '-rainflow.tsv'), self.logger.axis_rename)
+            # Спектр — только строк этого файла: чанки сшиты и удалены, следующий файл начнётся заново
+            self.rainflow.reset()
+        return out_path
+
+    @Slot(object, object)
+    def run_job(self, fn, future: Future):
+        """
+        Выполнить fn() в потоке записи — строго между отсчётами и по порядку с другими
+        заданиями (сшивка, новая сессия); итог или исключение — в future.
+        """
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            METRICS.count('save_errors')
+            future.set_exception(e)
 
     def stop(self):
         self._running = False
@@ -224,45 +518,103 @@ class DataSaverWorker(QObject):
 class DataSaver(QObject):
     """Фасад из GUI: поток + сигнал для добавления данных, API для начала/сшивки."""
     data_in = Signal(dict, float)
+    events_in = Signal(object)
+    capture_in = Signal(str, str, object, object)
+    history_requested = Signal(object, int, object)
+    report_ready = Signal(object)
+    job_in = Signal(object, object)
 
     def __init__(self, parent):
         super().__init__()
         self.main_window = parent
         self.config = parent.config
         self.offsets = parent.offsets
-        self._filter_frame = int(self.config.get('filter_frame',
-                                self.config.get('graph_filter_frame', 0)))
-        channels_str = str(self.config.get('filter_channels',
-                                self.config.get('graph_filter_channels', ''))).strip()
-        self._filter_channels = [c.strip() for c in channels_str.split(',') if c.strip()]
-        self._filters = {ch: RollingMean(self._filter_frame) for ch in self._filter_channels}
+        # Каналы стенда: колонки окна, файла, кольца просмотрщика и трансляции
+        self.channels = ChannelRegistry.from_config(self.config)
+        # Фильтры каналов применяет поток опроса (Worker), здесь — настройка и сброс
+        self.filters = FilterBank.from_config(self.config)
 
         max_points_ram = int(self.config.get('datasaver_max_points', parent.config['values_to_view']))
 
         self.thread = QThread()
-        self.worker = DataSaverWorker(self.offsets, max_points_ram=max_points_ram)
+        density_pairs = DensityBank.parse_pairs(self.config.get('density_pairs', 'P:M'))
+        # Графики в отдельном процессе: данные отдаются через разделяемую память
+        self.ring = None
+        if int(self.config.get('viewer_process', 0)):
+            self.ring = SharedRing.create(self.channels.columns, int(self.config.get('viewer_ring', 65536)))
+        # Трансляция отсчётов на другие машины (stream_port 0 — выключена)
+        self.stream = None
+        if int(self.config.get('stream_port', 0)):
+            self.stream = StreamServer(int(self.config['stream_port']),
+                                       self.config.get('stream_host', '127.0.0.1'),
+                                       interval_ms=int(self.config.get('stream_interval', 100)),
+                                       queue_frames=int(self.config.get('stream_queue', 20)),
+                                       channels=self.channels.stored).start()
+        self.worker = DataSaverWorker(self.offsets, self.channels, max_points_ram=max_points_ram,
+                                      density_pairs=density_pairs, ring=self.ring,
+                                      chunk_size=int(self.config.get('chunk_size', max_points_ram)),
+                                      late_ms=float(self.config.get('seq_late_ms',
+                                                                    5 * int(self.config['ask_int']))),
+                                      clock=self._clock, stream=self.stream,
+                                      raw_channels=self.filters.channels if self.filters.store_raw else (),
+                                      rainflow=RainflowBank.from_config(self.config),
+                                      trend=LTrend(float(self.config.get('trend_bucket', 100)),
+                                                   [float(s) for s in str(self.config.get(
+                                                       'trend_scales', '1e4,1e5,1e6')).split(',')]),
+                                      capture=EventCapture.from_config(
+                                          self.config, self.channels.columns +
+                                          ([f'{ch}_raw' for ch in self.filters.channels]
+                                           if self.filters.store_raw else [])),
+                                      stat_bits=StatusBits.from_config(self.config))
         self.worker.moveToThread(self.thread)
         self.data_in.connect(self.worker.add_data)
+        self.events_in.connect(self.worker.log_events)
+        self.capture_in.connect(self.worker.request_capture)
+        self.job_in.connect(self.worker.run_job)
+        self._jobs = set()   # задания потока записи, которых ждёт close()
         self.thread.start()
 
-    def apply_filters(self, input_dict: dict) -> dict:
-        """
-        Вернёт копию input_dict с применённым скользящим средним
-        для каналов из filter_channels. Не трогает None/NaN.
-        """
-        if not self._filter_channels or self._filter_frame <= 0:
-            return dict(input_dict)
-        out = dict(input_dict)
-        for ch in self._filter_channels:
-            if ch in out:
-                v = out[ch]
-                if v is None or (isinstance(v, float) and np.isnan(v)):
-                    if ch in self._filters:
-                        self._filters[ch].reset()
-                else:
-                    _filter = self._filters[ch]
-                    out[ch] = float(np.round(_filter.update(float(v)), 3))
-        return out
+        self.history_thread = QThread()
+        self.history = HistoryLoader(int(self.config.get('history_tiles', 64)))
+        self.history.moveToThread(self.history_thread)
+        self.history_requested.connect(self.history.load)
+        self._history_req = 0
+        self.history_thread.start()
+
+        # Каталог сессий: сшитый файл попадает в него сразу при сохранении
+        self.catalog = Catalog.from_config(self.config)
+        self.pid = {}   # последние прочитанные из ПЛК PID/SUP/T2F (Worker.parameters_ready)
+        # Отчёты по сохранённым файлам строятся в фоне по одному (куски файла — в процессах SessionReport)
+        self.report = SessionReport.from_config(self.config)
+        self.report_after_stop = int(self.config.get('report_after_stop', 1))
+        self._reports = ThreadPoolExecutor(max_workers=1)
+
+    def _clock(self):
+        """Текущее время в шкале rel_time потока опроса, мс."""
+        worker = getattr(self.main_window, 'worker', None)
+        if worker is None:
+            return None
+        return (time.perf_counter() - worker.init_time) * 1000.0
+
+    def log_events(self, events):
+        """Записать события (обрыв связи и т.п.) в файл событий текущей сессии."""
+        self.events_in.emit(events)
+
+    def capture(self, name='manual', text='ручной захват'):
+        """Захватить событие вокруг текущего отсчёта (кнопка, команда управления)."""
+        self.capture_in.emit(name, text, None, None)
+
+    def rainflow_matrices(self):
+        """Спектры rainflow строк с начала сессии или последнего сохранения: {канал: {(размах, среднее): циклов}}."""
+        return self.worker.rainflow.matrices()
+
+    def trend_forecast(self, limit):
+        """Прогноз зазора L до предела limit (см. LTrend.forecast); не сбрасывается со сменой сессии."""
+        return self.worker.trend.forecast(limit)
+
+    def sequence_counters(self):
+        """Счётчики непрерывности текущей сессии (принято, разрывы, пропуски, повторы, опоздания)."""
+        return self.worker.sequence.counters()
 
     def add_to_matrix(self, input_dict, elapsed_time_ms):
         self.data_in.emit(input_dict, elapsed_time_ms)
@@ -270,30 +622,158 @@ class DataSaver(QObject):
     def get_matrices(self, ds=False):
         return self.worker.get_data(ds)
 
+    @property
+    def count(self):
+        return self.worker.count
+
+    def get_tail(self, keys, since):
+        return self.worker.get_tail(keys, since)
+
+    def get_density(self, x_key, y_key):
+        """Гистограмма плотности пары каналов (для новой пары — начиная с окна RAM)."""
+        bank = self.worker.density
+        if not bank.has_pair(x_key, y_key):
+            window = self.worker.window
+            bank.add_pair(x_key, y_key, seed=lambda end: window.tail(keys=[x_key, y_key], end=end))
+        return bank.snapshot(x_key, y_key)
+
+    def history_indexes(self):
+        """
+        Снимки индексов блоков для просмотра истории: текущая сессия, при продолжении —
+        вместе с последним сшитым файлом. Последний блок на диске — последним.
+        """
+        live = self.worker.logger.index.snapshot()
+        done = self.worker.logger.finished_index.snapshot()
+        live_blocks, n_live = live[0]
+        done_blocks, n_done = done[0]
+        if n_done and (not n_live or
+                       live_blocks[0]['range']['time'][0] >= done_blocks[n_done - 1]['range']['time'][1]):
+            return [done, live] if n_live else [done]
+        return [live] if n_live or not n_done else [done]
+
+    def request_history(self, owner, x_key, y_key, x0=None, x1=None, width=1000):
+        """Асинхронный запрос данных истории; ответ придёт в history.data_ready."""
+        if x_key not in INDEX_AXES:
+            return None
+        indexes = self.history_indexes()
+        blocks, n = indexes[-1][0]
+        tail = (None, None)
+        data = self.get_matrices()
+        if len(data.get(x_key, [])):
+            x_tail = data[x_key]
+            y_tail = data[y_key]
+            if n:
+                mask = x_tail > blocks[n - 1]['range'][x_key][1]
+                x_tail, y_tail = x_tail[mask], y_tail[mask]
+            tail = (x_tail, y_tail)
+
+        self._history_req += 1
+        self.history.latest[owner] = self._history_req
+        self.history_requested.emit(owner, self._history_req,
+                                    {'indexes': indexes, 'x': x_key, 'y': y_key,
+                                     'x0': x0, 'x1': x1, 'width': width, 'tail': tail})
+        return self._history_req
+
+    def in_saver(self, fn) -> Future:
+        """Поставить fn в очередь потока записи (после уже принятых отсчётов); итог — Future."""
+        future = Future()
+        self._jobs.add(future)
+        future.add_done_callback(self._jobs.discard)
+        self.job_in.emit(fn, future)
+        return future
+
     def start_session(self):
         """Начать новую сессию записи (новая папка, чистое оперативное окно)."""
-        self.worker.start_new_session()
+        self.in_saver(self.worker.start_new_session)
         self.main_window.time_offset = 0
-        for f in self._filters.values():
-            f.reset()
+        self.reset_filters()
 
-    def save_data(self, path):
+    def save_data(self, path, reason=None, report=False) -> Future:
         """
         Сшивает все чанки текущей сессии + хвост в единый файл `path`.
-        Это вызывается при стопе/выгрузке.
+        Это вызывается при стопе/выгрузке. Рядом кладётся описание <файл>-meta.json
+        (параметры, смещения, PID, причина окончания reason), непустой файл
+        заносится в каталог сессий; report — по нему строится отчёт (если не
+        выключен report_after_stop в app.cfg).
+        Сшивка и каталог выполняются в потоке записи, по порядку с отсчётами;
+        возвращается Future с путём сшитого файла.
         """
         path = Path(path)
-        result = self.worker.finalize_to(path)
-        return result
+        meta = self.session_meta(reason)   # снимок параметров и PID на момент останова
+
+        def save():
+            result = self.worker.finalize_to(path)
+            stats = self.worker.logger.finished_stats
+            if stats.rows:
+                try:
+                    write_meta(result, meta)
+                    self.catalog.add(result, stats, meta)
+                except (OSError, sqlite3.Error):
+                    METRICS.count('catalog_errors')
+                if report and self.report_after_stop:
+                    self.make_report(result)
+            return result
+        return self.in_saver(save)
+
+    def make_report(self, path, open_report=False):
+        """
+        Отчёт по сохранённому файлу (SessionReport.run) в фоновом потоке. Итог — сигнал
+        report_ready: словарь run или {'path', 'error'}; open — открыть, когда готов.
+        """
+        def run():
+            try:
+                result = self.report.run(path)
+                METRICS.timing('report', result['seconds'] * 1000.0)
+            except Exception as e:
+                METRICS.count('report_errors')
+                result = {'path': str(path), 'error': f'{type(e).__name__}: {e}'}
+            result['open'] = open_report
+            self.report_ready.emit(result)
+        return self._reports.submit(run)
+
+    def set_pid(self, data: dict):
+        self.pid = dict(data)
+
+    def session_meta(self, reason=None):
+        """Описание сохраняемой сессии для каталога."""
+        params = read_conf('test_parameters.param') if os.path.isfile('test_parameters.param') else {}
+        return {'rig': self.config.get('name'), 'reason': reason, 'params': params,
+                'offsets': dict(self.offsets), 'pid': dict(self.pid),
+                'channels': self.channels.stored, 'saved': time.strftime('%d.%m.%Y %H:%M:%S')}
 
     def drop_data(self):
         """Сбросить только оперативное окно (график), без изменения чанков."""
-        self.worker.clear()
+        self.in_saver(self.worker.clear)
         self.main_window.time_offset = 0
-        for f in self._filters.values():
-            f.reset()
+        self.reset_filters()
 
-    def close(self):
+    def reset_filters(self):
+        """Сбросить фильтры каналов; их шагает поток опроса, поэтому сброс — его командой."""
+        poller = getattr(self.main_window, 'worker', None)
+        if poller is None:
+            self.filters.reset()
+        else:
+            poller.enqueue_cmd('reset_filters')
+
+    def close(self, timeout=60.0):
+        # Сшивка при закрытии уже в очереди потока записи — дождаться, пока он жив
+        for future in list(self._jobs):
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+        self._reports.shutdown(wait=False, cancel_futures=True)
         self.worker.stop()
         self.thread.quit()
-        self.thread.wait()
\ No newline at end of file
+        self.thread.wait()
+        if self.worker.capture is not None:
+            self.worker.capture.flush()
+        self.history_thread.quit()
+        self.history_thread.wait()
+        if self.stream is not None:
+            self.worker.stream = None
+            self.stream.close()
+        if self.ring is not None:
+            self.ring.mark_closed()
+            self.worker.ring = None
+            self.ring.close()
\ No newline at end of file
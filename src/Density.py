@@ -0,0 +1,152 @@
+import threading
+import numpy as np
+
+
+class Histogram2D:
+    """
+    Двумерная гистограмма с постоянным числом бинов.
+    При выходе данных за диапазон шаг удваивается, соседние бины суммируются —
+    счёт остаётся точным, а память и время не зависят от числа точек.
+    """
+    def __init__(self, bins: int = 128):
+        self.bins = int(bins) // 2 * 2
+        self.counts = np.zeros((self.bins, self.bins), dtype=np.float64)   # [ix, iy]
+        self.lo = None
+        self.width = None
+        self.total = 0
+
+    def reset(self):
+        self.counts[:] = 0
+        self.lo = None
+        self.width = None
+        self.total = 0
+
+    def _init_range(self, x, y):
+        self.lo = np.empty(2)
+        self.width = np.empty(2)
+        for axis, arr in enumerate((x, y)):
+            a_min, a_max = float(arr.min()), float(arr.max())
+            span = max(a_max - a_min, abs(a_max) * 1e-3, 1e-6)
+            self.lo[axis] = a_min - 0.05 * span
+            self.width[axis] = 1.1 * span / self.bins
+
+    def _grow(self, axis, a_min, a_max):
+        half = self.bins // 2
+        while True:
+            hi = self.lo[axis] + self.bins * self.width[axis]
+            if a_min >= self.lo[axis] and a_max < hi:
+                return
+            counts = np.moveaxis(self.counts, axis, 0)
+            merged = counts.reshape(half, 2, self.bins).sum(axis=1)
+            grown = np.zeros_like(counts)
+            if a_max >= hi:
+                grown[:half] = merged
+            else:
+                grown[half:] = merged
+                self.lo[axis] -= self.bins * self.width[axis]
+            self.width[axis] *= 2
+            self.counts = np.ascontiguousarray(np.moveaxis(grown, 0, axis))
+
+    def add(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        mask = np.isfinite(x) & np.isfinite(y)
+        if not mask.any():
+            return
+        x, y = x[mask], y[mask]
+        if self.lo is None:
+            self._init_range(x, y)
+        self._grow(0, x.min(), x.max())
+        self._grow(1, y.min(), y.max())
+
+        ix = np.clip(((x - self.lo[0]) / self.width[0]).astype(np.int64), 0, self.bins - 1)
+        iy = np.clip(((y - self.lo[1]) / self.width[1]).astype(np.int64), 0, self.bins - 1)
+        self.counts += np.bincount(ix * self.bins + iy,
+                                   minlength=self.bins * self.bins).reshape(self.bins, self.bins)
+        self.total += x.size
+
+    def rect(self):
+        """(x0, y0, ширина, высота) области гистограммы в единицах данных."""
+        span = self.width * self.bins
+        return float(self.lo[0]), float(self.lo[1]), float(span[0]), float(span[1])
+
+
+class DensityBank:
+    """
+    Набор гистограмм по парам каналов. Точки копятся блоками и разносятся по бинам
+    одним вызовом numpy. Чтение из GUI идёт под короткой блокировкой.
+    count — всего принятых точек, flushed — из них уже разнесённых по гистограммам
+    (нумерация та же, что у счётчика окна источника).
+    """
+    def __init__(self, pairs=(), bins: int = 128, block: int = 100):
+        self.bins = bins
+        self.block = max(int(block), 1)
+        self._lock = threading.Lock()
+        self._hists = {}
+        self._rows = []
+        self.count = 0
+        self.flushed = 0
+        for pair in pairs:
+            self._hists[tuple(pair)] = Histogram2D(bins)
+
+    @staticmethod
+    def parse_pairs(text: str):
+        """'P:M,N:L' -> [('P', 'M'), ('N', 'L')]"""
+        pairs = []
+        for item in str(text).split(','):
+            if ':' in item:
+                x, y = item.split(':', 1)
+                pairs.append((x.strip(), y.strip()))
+        return pairs
+
+    def has_pair(self, x_key, y_key):
+        return (x_key, y_key) in self._hists
+
+    def add_pair(self, x_key, y_key, seed=None):
+        """
+        Начать копить гистограмму для новой пары. seed(end) — уже имеющиеся точки
+        (окно RAM) до точки номер end: берутся только разнесённые по гистограммам,
+        ещё не разнесённый блок попадёт в новую пару при следующем flush().
+        """
+        with self._lock:
+            if (x_key, y_key) in self._hists:
+                return
+            hist = Histogram2D(self.bins)
+            if seed is not None:
+                data = seed(self.flushed)
+                if len(data.get(x_key, [])):
+                    hist.add(data[x_key], data[y_key])
+            self._hists[(x_key, y_key)] = hist
+
+    def append(self, row: dict):
+        self._rows.append(row)
+        self.count += 1
+        if len(self._rows) >= self.block:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        with self._lock:
+            keys = {k for pair in self._hists for k in pair}
+            cols = {k: np.fromiter((r.get(k, np.nan) for r in rows), dtype=np.float64, count=len(rows))
+                    for k in keys}
+            for (x_key, y_key), hist in self._hists.items():
+                hist.add(cols[x_key], cols[y_key])
+            self.flushed = self.count
+
+    def snapshot(self, x_key, y_key):
+        """Копия счётчиков и области гистограммы или None, если данных ещё нет."""
+        with self._lock:
+            hist = self._hists.get((x_key, y_key))
+            if hist is None or hist.lo is None:
+                return None
+            return hist.counts.copy(), hist.rect(), hist.total
+
+    def reset(self):
+        with self._lock:
+            self._rows = []
+            self.flushed = self.count
+            for hist in self._hists.values():
+                hist.reset()
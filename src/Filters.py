@@ -0,0 +1,195 @@
+import math
+import bisect
+from collections import deque
+
+
+class MovingAverage:
+    """Скользящее среднее по n отсчётам; в начале — по накопленным."""
+    def __init__(self, n):
+        self.n = max(int(n), 1)
+        self.reset()
+
+    def reset(self):
+        self.buf = deque(maxlen=self.n)
+        self.sum = 0.0
+
+    def step(self, x):
+        if len(self.buf) == self.n:
+            self.sum -= self.buf[0]
+        self.buf.append(x)
+        self.sum += x
+        return self.sum / len(self.buf)
+
+
+class MovingMedian:
+    """Скользящая медиана по n отсчётам — подавляет одиночные выбросы, не размывая ступеньки."""
+    def __init__(self, n):
+        self.n = max(int(n), 1)
+        self.reset()
+
+    def reset(self):
+        self.buf = deque(maxlen=self.n)
+        self.sorted = []
+
+    def step(self, x):
+        if len(self.buf) == self.n:
+            del self.sorted[bisect.bisect_left(self.sorted, self.buf[0])]
+        self.buf.append(x)
+        bisect.insort(self.sorted, x)
+        k = len(self.sorted)
+        return self.sorted[k // 2] if k % 2 else 0.5 * (self.sorted[k // 2 - 1] + self.sorted[k // 2])
+
+
+class IIRSection:
+    """
+    БИХ-звено второго порядка (b0, b1, b2) / (1, a1, a2). Состояние — два последних
+    входа и выхода; при первом отсчёте заполняется установившимся значением, чтобы
+    фильтр не «разгонялся» от нуля.
+    """
+    def __init__(self, b, a):
+        self.b0, self.b1, self.b2 = (float(v) for v in b)
+        self.a1, self.a2 = float(a[1]), float(a[2])
+        self.dc = (self.b0 + self.b1 + self.b2) / (1.0 + self.a1 + self.a2)
+        self.reset()
+
+    def reset(self):
+        self.x1 = self.x2 = self.y1 = self.y2 = None
+
+    def _init(self, x):
+        self.x1 = self.x2 = x
+        self.y1 = self.y2 = x * self.dc
+
+    def step(self, x):
+        if self.x1 is None:
+            self._init(x)
+        y = self.b0 * x + self.b1 * self.x1 + self.b2 * self.x2 - self.a1 * self.y1 - self.a2 * self.y2
+        self.x2, self.x1 = self.x1, x
+        self.y2, self.y1 = self.y1, y
+        return y
+
+
+def ema(alpha):
+    """Экспоненциальное сглаживание y = alpha*x + (1 - alpha)*y_prev."""
+    alpha = float(alpha)
+    if not 0.0 < alpha <= 1.0:
+        raise ValueError(f'ema: alpha должен быть в (0, 1], получено {alpha}')
+    return Chain([IIRSection((alpha, 0.0, 0.0), (1.0, alpha - 1.0, 0.0))], f'ema:{alpha:g}')
+
+
+def butterworth(cutoff_hz, fs, order=2):
+    """ФНЧ Баттерворта порядка order (билинейное преобразование): биквады + звено 1-го порядка для нечётного."""
+    cutoff_hz, fs, order = float(cutoff_hz), float(fs), int(order)
+    if not 0.0 < cutoff_hz < fs / 2.0:
+        raise ValueError(f'butter: частота среза {cutoff_hz} Гц вне (0, {fs / 2.0:g}) Гц')
+    if order < 1:
+        raise ValueError('butter: порядок должен быть не меньше 1')
+    w0 = 2.0 * math.pi * cutoff_hz / fs
+    cos_w0 = math.cos(w0)
+    sections = []
+    for k in range(1, order // 2 + 1):
+        q = 1.0 / (2.0 * math.cos((2 * k - 1) * math.pi / (2 * order)))
+        alpha = math.sin(w0) / (2.0 * q)
+        a0 = 1.0 + alpha
+        b0 = (1.0 - cos_w0) / 2.0 / a0
+        sections.append(IIRSection((b0, 2.0 * b0, b0), (1.0, -2.0 * cos_w0 / a0, (1.0 - alpha) / a0)))
+    if order % 2:
+        kt = math.tan(w0 / 2.0)
+        b0 = kt / (1.0 + kt)
+        sections.append(IIRSection((b0, b0, 0.0), (1.0, (kt - 1.0) / (kt + 1.0), 0.0)))
+    return Chain(sections, f'butter:{cutoff_hz:g}:{order}')
+
+
+class Chain:
+    """Последовательность звеньев (фильтров или звеньев БИХ) — сама тоже звено."""
+    def __init__(self, stages, spec=''):
+        self.stages = list(stages)
+        self.spec = spec
+
+    def reset(self):
+        for s in self.stages:
+            s.reset()
+
+    def step(self, x):
+        for s in self.stages:
+            x = s.step(x)
+        return x
+
+
+def parse_chain(spec, fs):
+    """
+    Фильтр канала из строки конфигурации, звенья через '+':
+        mean:N  median:N  ema:ALPHA  butter:ЧАСТОТА_ГЦ[:ПОРЯДОК]
+    например `median:5+butter:2:4`.
+    """
+    stages = []
+    for part in str(spec).split('+'):
+        name, *args = part.strip().split(':')
+        if name == 'mean':
+            stages.append(MovingAverage(int(args[0])))
+        elif name == 'median':
+            stages.append(MovingMedian(int(args[0])))
+        elif name == 'ema':
+            stages.append(ema(args[0]))
+        elif name == 'butter':
+            stages.append(butterworth(args[0], fs, *args[1:2]))
+        else:
+            raise ValueError(f'неизвестный фильтр: {part}')
+    return Chain(stages, spec)
+
+
+class FilterBank:
+    """
+    Фильтры каналов. Поток идёт через update()/apply() — по отсчёту, на чистом
+    Python без numpy-скаляров. None/NaN сбрасывает фильтр канала и проходит без изменений.
+    """
+    def __init__(self, specs: dict, fs: float, store_raw=False, decimals=3):
+        self.fs = float(fs)
+        self.chains = {ch: parse_chain(spec, self.fs) for ch, spec in specs.items() if spec}
+        self.channels = list(self.chains)
+        self.store_raw = bool(store_raw)
+        self.decimals = decimals
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        filter_<канал> <фильтр> — для каждого канала (см. parse_chain); прежние
+        filter_frame/filter_channels означают mean:filter_frame для перечисленных каналов.
+        filter_raw 1 — писать в файл и нефильтрованные значения.
+        """
+        specs = {}
+        frame = int(config.get('filter_frame', config.get('graph_filter_frame', 0)))
+        channels = str(config.get('filter_channels', config.get('graph_filter_channels', ''))).strip()
+        if frame > 0:
+            for ch in channels.split(','):
+                if ch.strip():
+                    specs[ch.strip()] = f'mean:{frame}'
+        for key, value in config.items():
+            if key.startswith('filter_') and key not in ('filter_frame', 'filter_channels', 'filter_raw'):
+                specs[key[len('filter_'):]] = value if value not in ('0', 'none') else None
+        fs = 1000.0 / float(config.get('ask_int', 20))
+        return cls(specs, fs, store_raw=int(config.get('filter_raw', 0)))
+
+    def __bool__(self):
+        return bool(self.chains)
+
+    def reset(self):
+        for chain in self.chains.values():
+            chain.reset()
+
+    def update(self, ch, value):
+        chain = self.chains.get(ch)
+        if chain is None:
+            return value
+        if value is None or value != value:
+            chain.reset()
+            return value
+        return round(chain.step(float(value)), self.decimals)
+
+    def apply(self, data: dict) -> dict:
+        """Отфильтровать каналы отсчёта на месте; вернуть исходные значения отфильтрованных каналов."""
+        raw = {}
+        for ch, chain in self.chains.items():
+            if ch in data:
+                raw[ch] = value = data[ch]
+                data[ch] = self.update(ch, value)
+        return raw
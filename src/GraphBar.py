@@ -1,9 +1,16 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QLabel, QPushButton
 import pyqtgraph as pg
-from PySide6.QtCore import QTimer, QThread, Signal, QObject
+from PySide6.QtCore import QTimer, QThread, Signal, QObject, QRectF
+from PySide6.QtGui import QShortcut, QKeySequence
 import numpy as np
-from src.utils import read_json, _align_xy
+import time
+import itertools
+from src.utils import _align_xy
+from src.Channels import ChannelRegistry
 from src.SettingsWindow import PID_button
+from src.Profiler import FrameStats
+from src.SharedRing import OPEN_GRAPH, OPEN_SPECTRUM
+from src.Viewer import launch_viewer
 
 class GraphWorker(QObject):
     data_ready = Signal(object, object)
@@ -31,7 +38,7 @@ class GraphWorker(QObject):
 class AxisChooser(QWidget):
     def __init__(self):
         super().__init__()
-        self.axis = read_json('axis.json')
+        self.axis = ChannelRegistry.from_config().axis()
         self.graph_type_chooser = QPushButton('Скользящее окно')
         self.graph_type_chooser.clicked.connect(self.change_type)
         self.graph_type = 'rolling'
@@ -74,6 +81,12 @@ class AxisChooser(QWidget):
 
     def change_type(self):
         if self.graph_type == 'None':
+            self.graph_type_chooser.setText('История')
+            self.graph_type = 'history'
+        elif self.graph_type == 'history':
+            self.graph_type_chooser.setText('Плотность')
+            self.graph_type = 'density'
+        elif self.graph_type == 'density':
             self.graph_type_chooser.setText('Скользящее окно')
             self.graph_type = 'rolling'
         elif self.graph_type == 'rolling':
@@ -81,10 +94,23 @@ class AxisChooser(QWidget):
             self.graph_type = 'None'
 
 
+class TimedPlotWidget(pg.PlotWidget):
+    """PlotWidget, замеряющий время собственной отрисовки."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = None
+
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        super().paintEvent(event)
+        if self.stats is not None:
+            self.stats.add_paint((time.perf_counter() - start) * 1000.0)
+
+
 class Graph(QWidget):
     def __init__(self, config):
         super().__init__()
-        self.graphWidget = pg.PlotWidget()
+        self.graphWidget = TimedPlotWidget()
         self.graphWidget.showGrid(x=True, y=True)
 
         layout = QVBoxLayout()
@@ -93,11 +119,19 @@ class Graph(QWidget):
         self.graphWidget.setBackground('w')
         pen = pg.mkPen(config['pen_color'], width=int(config['pen_width']))
         self.curve = self.graphWidget.plot([0], [0] , pen=pen)
+        # Режим плотности: гистограмма XY как изображение с логарифмической шкалой цвета
+        self.density = pg.ImageItem()
+        self.density.setColorMap(pg.colormap.get('viridis'))
+        self.density.setZValue(-10)
+        self.density.setVisible(False)
+        self.graphWidget.addItem(self.density)
         self.graphWidget.update()
         self.setLayout(layout)
 
 
 class GraphWindow(QWidget):
+    _numbers = itertools.count(1)   # номер окна в логе статистики отрисовки
+
     def __init__(self, datasaver, config):
         super().__init__()
         self.datasaver = datasaver
@@ -126,11 +160,46 @@ class GraphWindow(QWidget):
         self.axis.change_type = self.wrap_axis_change(self.axis.change_type)
         self.graph.graphWidget.setDownsampling(auto=False)
 
+        # Просмотр истории: догрузка с диска при масштабировании/панорамировании
+        self._history_req = None
+        self._history_started = None
+        self._history_full = False
+        self._history_applying = False
+        self._history_timer = QTimer(self)
+        self._history_timer.setSingleShot(True)
+        self._history_timer.timeout.connect(self.request_history)
+        if self.datasaver.history is not None:
+            self.datasaver.history.data_ready.connect(self.on_history_ready)
+        self.graph.graphWidget.getViewBox().sigXRangeChanged.connect(self.on_view_changed)
+
+        # Замеры времени кадра: F3 — показать/скрыть оверлей, F4 — записать в лог
+        self.number = next(GraphWindow._numbers)
+        self.stats = FrameStats(self.stats_name())
+        self.graph.graphWidget.stats = self.stats
+        self.stats_overlay = pg.TextItem(color='r', anchor=(0, 0))
+        self.stats_overlay.setParentItem(self.graph.graphWidget.getPlotItem())
+        self.stats_overlay.setPos(60, 10)
+        self.stats_overlay.setVisible(bool(int(self.config.get('graph_stats', 0))))
+        QShortcut(QKeySequence('F3'), self, self.toggle_stats)
+        QShortcut(QKeySequence('F4'), self, self.dump_stats)
+
+    def toggle_stats(self):
+        self.stats_overlay.setVisible(not self.stats_overlay.isVisible())
+
+    def stats_name(self):
+        """Имя окна в логе отрисовки: класс, номер окна, пара осей и режим."""
+        return f'{self.__class__.__name__} #{self.number} {self.axis.y}({self.axis.x}) {self.axis.graph_type}'
+
+    def dump_stats(self):
+        path = self.stats.dump(self.config.get('result_path', 'results'))
+        self.setWindowTitle(f'Статистика отрисовки записана: {path}')
+
     def wrap_axis_change(self, func):
         def wrapper(*args, **kwargs):
             func(*args, **kwargs)
             self.full_redraw = True
             self.last_index = 0
+            self.stats.name = self.stats_name()
         return wrapper
 
     def update_graph(self):
@@ -141,11 +210,33 @@ class GraphWindow(QWidget):
         self.graph.graphWidget.setLabel('bottom', self.axis.xlbl)
         self.graph.graphWidget.setLabel('left', self.axis.ylbl)
 
+        if self.full_redraw:
+            self.graph.graphWidget.setTitle(None)
+            self.graph.density.setVisible(self.axis.graph_type == 'density')
+            self.graph.curve.setVisible(self.axis.graph_type != 'density')
+
+        if self.axis.graph_type == 'history':
+            if self.full_redraw:
+                self.full_redraw = False
+                self.request_history(full=True)
+            return
+
+        if self.full_redraw:
+            self.graph.graphWidget.enableAutoRange()
+
+        if self.axis.graph_type == 'density':
+            self.full_redraw = False
+            self.update_density(x_key, y_key)
+            return
 
+        stats = self.stats
+        stats.begin()
         if self.axis.graph_type == 'rolling':
             data = self.datasaver.get_matrices()
             if not data or len(data.get("time", [])) == 0:
+                stats.cancel()
                 return
+            stats.mark('get_matrices', nbytes=sum(a.nbytes for a in data.values()))
 
             x_full = np.asarray(data.get(x_key, []), dtype=np.float32)
             y_full = np.asarray(data.get(y_key, []), dtype=np.float32)
@@ -157,26 +248,97 @@ class GraphWindow(QWidget):
 
             data = self.datasaver.get_matrices(ds=True)
             if not data or len(data.get("time", [])) == 0:
+                stats.cancel()
                 return
                 # data = self.datasaver.get_matrices()
                 # if not data:
                 #     return
+            stats.mark('get_matrices', nbytes=sum(a.nbytes for a in data.values()))
             x = np.asarray(data.get(x_key, []), dtype=np.float32)
             y = np.asarray(data.get(y_key, []), dtype=np.float32)
             step = x.shape[0] // 200 + 1
             x = x[::step]
             y = y[::step]
+        stats.mark('decimate')
 
         x, y = _align_xy(x, y)
+        stats.mark('align', nbytes=x.nbytes + y.nbytes)
 
         if x.size <= 1:
+            stats.cancel()
             return
 
         self.graph.curve.setData(x, y)
+        stats.mark('set_data', points=x.size)
+        stats.end()
+        if self.stats_overlay.isVisible():
+            self.stats_overlay.setText(stats.text())
 
         self.full_redraw = False
         self.last_index = 0
 
+    def update_density(self, x_key, y_key):
+        stats = self.stats
+        stats.begin()
+        snap = self.datasaver.get_density(x_key, y_key)
+        if snap is None:
+            stats.cancel()
+            return
+        counts, (x0, y0, w, h), total = snap
+        stats.mark('get_matrices', nbytes=counts.nbytes)
+        img = np.log10(1.0 + counts)
+        stats.mark('align', nbytes=img.nbytes)
+        self.graph.density.setImage(img, autoLevels=False, levels=(0.0, max(float(img.max()), 1.0)))
+        self.graph.density.setRect(QRectF(x0, y0, w, h))
+        stats.mark('set_data', points=img.size)
+        stats.end()
+        if self.stats_overlay.isVisible():
+            self.stats_overlay.setText(stats.text())
+
+    def on_view_changed(self, *_):
+        if self.axis.graph_type == 'history' and not self._history_applying:
+            self._history_timer.start(150)
+
+    def request_history(self, full=False):
+        vb = self.graph.graphWidget.getViewBox()
+        width = int(vb.width()) or 1000
+        if full:
+            x0 = x1 = None
+        else:
+            x0, x1 = vb.viewRange()[0]
+        self._history_full = full
+        self._history_started = time.perf_counter()
+        self._history_req = self.datasaver.request_history(id(self), self.axis.x, self.axis.y,
+                                                           x0, x1, width)
+        if self._history_req is None:
+            self.graph.curve.setData([], [])
+            self.graph.graphWidget.setTitle('История доступна для оси X: время или наработка')
+        else:
+            self.graph.graphWidget.setTitle(None)
+
+    def on_history_ready(self, owner, req_id, x, y):
+        if owner != id(self) or req_id != self._history_req or self.axis.graph_type != 'history':
+            return
+        # Кадр истории — от запроса: get_matrices включает загрузку в потоке истории
+        stats = self.stats
+        stats.begin(self._history_started)
+        stats.mark('get_matrices', nbytes=x.nbytes + y.nbytes)
+        self._history_applying = True
+        try:
+            self.graph.curve.setData(x, y)
+            stats.mark('set_data', points=x.size)
+            vb = self.graph.graphWidget.getViewBox()
+            if self._history_full and x.size > 1:
+                vb.setRange(xRange=(float(x.min()), float(x.max())),
+                            yRange=(float(np.nanmin(y)), float(np.nanmax(y))))
+            # дальше масштаб задаёт пользователь
+            vb.disableAutoRange()
+        finally:
+            self._history_applying = False
+        stats.end()
+        if self.stats_overlay.isVisible():
+            self.stats_overlay.setText(stats.text())
+
     def change_title(self):
         self.setWindowTitle(self.axis.ylbl)
 
@@ -193,16 +355,44 @@ class GraphBar(GraphWindow):
         self.windows = []
         self.add_btn = QPushButton("+")
         self.add_btn.clicked.connect(self.add_graph_window)
+        self.spectrum_btn = QPushButton("Спектр")
+        self.spectrum_btn.clicked.connect(self.add_spectrum_window)
         btns_layout = QHBoxLayout()
         btns_layout.addWidget(self.add_btn)
+        btns_layout.addWidget(self.spectrum_btn)
         btns_layout.addWidget(pid_settings)
         self.layout.addLayout(btns_layout)
 
+        # Графики в отдельном процессе: встроенный график не рисуем, окна открывает просмотрщик
+        self._viewer = None
+        if self.datasaver.ring is not None:
+            self.timer.stop()
+            self.graph.hide()
+            self.axis.hide()
+            self.request_viewer(OPEN_GRAPH)
+
+    def request_viewer(self, slot):
+        if self._viewer is None or self._viewer.poll() is not None:
+            self._viewer = launch_viewer(self.datasaver.ring)
+        self.datasaver.ring.request(slot)
+
     def add_graph_window(self):
+        if self.datasaver.ring is not None:
+            self.request_viewer(OPEN_GRAPH)
+            return
         win = GraphWindow(self.datasaver, self.config)
         self.windows.append(win)
         win.show()
 
+    def add_spectrum_window(self):
+        if self.datasaver.ring is not None:
+            self.request_viewer(OPEN_SPECTRUM)
+            return
+        from src.Spectrum import SpectrumWindow
+        win = SpectrumWindow(self.datasaver, self.config)
+        self.windows.append(win)
+        win.show()
+
     def change_title(self):
         pass
 
@@ -0,0 +1,105 @@
+import numpy as np
+from collections import OrderedDict
+from PySide6.QtCore import QObject, Signal, Slot
+from src.SessionFile import SUMMARY_BINS, SUMMARY_FANOUT, BlockIndex, read_block
+from src.utils import minmax_decimate
+
+
+class TileCache:
+    """LRU-кэш прочитанных с диска блоков, чтобы повторное панорамирование не читало файл."""
+    def __init__(self, max_tiles: int = 64):
+        self.max_tiles = max(int(max_tiles), 1)
+        self._tiles = OrderedDict()
+
+    def get(self, block):
+        key = (str(block['path']), block['offset'], block.get('generation', 0))
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+        tile = {k: v.astype(np.float32) for k, v in read_block(block).items()}
+        self._tiles[key] = tile
+        if len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def clear(self):
+        self._tiles.clear()
+
+
+class HistoryLoader(QObject):
+    """
+    Загрузка исторических данных для графиков в отдельном потоке.
+    Разрешение выбирается по видимому диапазону и ширине графика в пикселях:
+    на крупном масштабе берётся сводка min/max блоков из RAM, на мелком — сами блоки с диска.
+    """
+    data_ready = Signal(object, int, object, object)
+
+    def __init__(self, max_tiles: int = 64):
+        super().__init__()
+        self.cache = TileCache(max_tiles)
+        self.latest = {}
+
+    @Slot(object, int, object)
+    def load(self, owner, req_id, query):
+        # Устаревшие запросы (пользователь уже сдвинул окно) не выполняем
+        if self.latest.get(owner) != req_id:
+            return
+        try:
+            x, y = self.query(query)
+        except Exception:
+            x, y = np.array([], dtype=np.float32), np.array([], dtype=np.float32)
+        if self.latest.get(owner) == req_id:
+            self.data_ready.emit(owner, req_id, x, y)
+
+    def query(self, query):
+        x_key, y_key = query['x'], query['y']
+        x0, x1 = query.get('x0'), query.get('x1')
+        width = max(int(query.get('width', 1000)), 10)
+
+        xs, ys = [], []
+        for snapshot in query['indexes']:
+            entries, summary = self.select(snapshot, x_key, x0, x1, width)
+            for b in entries:
+                if summary:
+                    bx = b['summary'][x_key][0]
+                    y_min, y_max = b['summary'][y_key]
+                    xs.append(np.repeat(bx, 2))
+                    ys.append(np.stack([y_min, y_max], axis=1).ravel())
+                else:
+                    tile = self.cache.get(b)
+                    xs.append(tile[x_key])
+                    ys.append(tile[y_key])
+
+        tail_x, tail_y = query.get('tail', (None, None))
+        if tail_x is not None and len(tail_x):
+            xs.append(np.asarray(tail_x, dtype=np.float32))
+            ys.append(np.asarray(tail_y, dtype=np.float32))
+
+        if not xs:
+            return np.array([], dtype=np.float32), np.array([], dtype=np.float32)
+
+        x = np.concatenate(xs)
+        y = np.concatenate(ys)
+        if x0 is not None and x1 is not None:
+            mask = (x >= x0) & (x <= x1)
+            # по одной точке за краями, чтобы линия доходила до границы окна
+            idx = np.flatnonzero(mask)
+            if idx.size:
+                mask[max(idx[0] - 1, 0)] = True
+                mask[min(idx[-1] + 1, x.size - 1)] = True
+            x, y = x[mask], y[mask]
+        return minmax_decimate(x, y, width)
+
+    @staticmethod
+    def select(snapshot, x_key, x0, x1, width):
+        """
+        Самый грубый уровень индекса (BlockIndex.snapshot), сводок которого в окне
+        хватает на ширину графика; если не хватает и блоков — сами блоки с диска.
+        Возвращает (записи, берутся_ли_сводки).
+        """
+        for level in range(len(snapshot) - 1, -1, -1):
+            visible = BlockIndex.visible(BlockIndex.cover(snapshot, level, SUMMARY_FANOUT), x_key, x0, x1)
+            if len(visible) * SUMMARY_BINS >= width / 2:
+                return visible, True
+        return visible, False
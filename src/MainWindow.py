@@ -1,102 +1,21 @@
 from PySide6.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget
-from PySide6.QtCore import QObject, QThread, Signal, QElapsedTimer
-from queue import Queue, Empty
+from PySide6.QtCore import QThread, QTimer, Signal, QElapsedTimer, QUrl
+from PySide6.QtGui import QDesktopServices
+from concurrent.futures import Future
 from src.utils import *
 from src.StatusBar import StatusBar
 from src.TestBar import TestBar
 from src.GraphBar import GraphBar
 from src.ModbusClient import Client
+from src.Worker import Worker
 from src.DataSaver import DataSaver
 from src.SettingsWindow import check_PID, get_parameters
+from src.Metrics import METRICS
+from src.StatusWord import StatusBits, StatusFeed
 import sys
 import time
 
 
-class Worker(QObject):
-    data_ready = Signal(dict, float)
-    error = Signal(str)
-
-    def __init__(self, plc, interval_ms, main_window):
-        super().__init__()
-        self.main_window = main_window
-        self.plc = plc
-        self.interval = interval_ms / 1000.0
-        self._running = True
-        self.init_time = time.perf_counter()
-        self._cmd_q: Queue[tuple[str, tuple]] = Queue()
-        self._busy = False
-
-    def enqueue_cmd(self, name: str, *args):
-        self._cmd_q.put((name, args))
-
-    def reset_time(self):
-        self.init_time = time.perf_counter()
-
-    def _process_one_command(self):
-        try:
-            name, args = self._cmd_q.get_nowait()
-        except Empty:
-            return False
-
-        self._busy = True
-        try:
-            if name == 'send_params':
-                params, offsets = args
-                self.plc.send_params(params, offsets)
-            elif name == 'load':
-                self.plc.load()
-            elif name == 'unload':
-                self.plc.unload()
-            elif name == 'rotate':
-                self.plc.rotate()
-            elif name == 'stop_rotate':
-                self.plc.stop_rotate()
-            elif name == 'reset':
-                self.plc.reset()
-            elif name == 'stop_all':
-                self.plc.stop()
-            elif name == 'reset_time':
-                self.reset_time()
-            elif name == 'send_PID':
-                self.main_window.graph_bar.pid_settings.send_parameters()
-                self.plc.write_PID()
-            else:
-                self.error.emit(f'Неизвестная команда: {name}')
-        except Exception as e:
-            self.error.emit(f'Команда {name} завершилась ошибкой: {e}')
-        finally:
-            self._busy = False
-        return True
-
-    def run(self):
-        """Основной цикл: сначала выполняем накопившиеся команды, затем опрашиваем ПЛК."""
-        while self._running:
-            try:
-                processed = 0
-                while self._process_one_command():
-                    processed += 1
-                    if processed >= 100:
-                        break
-
-                if processed > 0 or not self._cmd_q.empty():
-                    time.sleep(0.005)
-
-                start = time.perf_counter()
-                data = self.plc()
-                rel_time = round((time.perf_counter() - self.init_time) * 1000.0,2)
-                self.data_ready.emit(data if data else {}, rel_time)
-
-                elapsed = time.perf_counter() - start
-                if self.interval > elapsed:
-                    time.sleep(self.interval - elapsed)
-
-            except Exception as e:
-                self.error.emit(str(e))
-
-    def stop(self):
-        self._running = False
-
-
 class MainApp(QApplication):
     def __init__(self):
         super().__init__(sys.argv)
@@ -104,7 +23,10 @@ class MainApp(QApplication):
 
 
 class MainWindow(QMainWindow):
-    def __init__(self, lic):
+    licence_ready = Signal(object)
+
+    def __init__(self, lic, plc=None):
+        """plc — источник данных вместо ПЛК (например, ReplayClient); по умолчанию Client из app.cfg."""
         super().__init__()
         self.time_offset = 0
         # Read app configuration
@@ -114,20 +36,42 @@ class MainWindow(QMainWindow):
 
         # Logic part
         self.datasaver = DataSaver(self)
-        self.plc = Client(self.config['host'])
-        self.check_hardware(lic,
-                            # PID_filled=check_PID(self.plc)
-                            PID_filled = True
-                            )
+        if plc is None:
+            plc = Client(self.config['host'], port=int(self.config.get('port', 502)),
+                         backoff_max=float(self.config.get('reconnect_max', 2.0)))
+        self.plc = plc
+        # lic может быть Future: проверка лицензии идёт параллельно с построением окна
+        self._lic_future = lic if isinstance(lic, Future) else None
+        if self._lic_future is None:
+            self.check_hardware(lic,
+                                # PID_filled=check_PID(self.plc)
+                                PID_filled = True
+                                )
+        else:
+            self.setWindowTitle(f"{self.config['name']} - Проверка лицензии...")
         self.timer = QElapsedTimer()
         self.thread = QThread()
-        self.worker = Worker(self.plc, int(self.config['ask_int']), self)
+        interval = 0 if getattr(self.plc, 'paced', False) else int(self.config['ask_int'])
+        self.worker = Worker(self.plc, interval, self)
         self.worker.moveToThread(self.thread)
 
         # сигналы
         self.thread.started.connect(self.worker.run)
         self.worker.data_ready.connect(self.on_data_ready)
         self.worker.error.connect(self.on_error)
+        self.worker.link_changed.connect(self.on_link_changed)
+        self.worker.tripped.connect(self.on_tripped)
+        # захват вокруг срабатывания идёт в поток записи напрямую, минуя GUI
+        self.worker.tripped.connect(self.datasaver.worker.on_tripped)
+        # Биты состояния приходят только при изменении; виджеты подписываются на свои
+        self.stat_bits = StatusBits.from_config(self.config)
+        self.status_feed = StatusFeed(self.stat_bits)
+        self.worker.stat_changed.connect(self.status_feed.dispatch)
+        self.worker.parameters_ready.connect(self.datasaver.set_pid)
+        self.datasaver.report_ready.connect(self.on_report)
+        self.stop_reason = None   # причина следующего останова для каталога сессий (по умолчанию — оператор)
+        self.closing = False      # при закрытии отчёт по последнему файлу не строится
+        self._title = None
 
 
         # Main Widget
@@ -136,6 +80,9 @@ class MainWindow(QMainWindow):
         self.graph_bar = GraphBar(self)
 
         self.status_bar.offsets_changed.connect(self._resend_setpoints)
+        self.status_feed.subscribe(['T_limit', 'M_limit', 'N_limit'], self.settings_bar.on_limits)
+        self.status_feed.subscribe(['loaded'], self.on_loaded)
+        self.worker.profile_changed.connect(self.settings_bar.on_profile)
 
         # Layout cfg
         self.main_layout = QVBoxLayout()
@@ -151,19 +98,35 @@ class MainWindow(QMainWindow):
         widget.setLayout(self.main_layout)
         self.setCentralWidget(widget)
 
-        self._freq_window_size = 100
-        self._time_window = []
-        self._cycle_window = []
-        self._last_freq = None
-        self.elapsed_time = 0
-        
-
+        # Метрики горячего пути периодически дописываются в results/metrics.tsv
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.dump_metrics)
+        metrics_interval = float(self.config.get('metrics_interval', 60))
+        if metrics_interval > 0:
+            self.metrics_timer.start(int(metrics_interval * 1000))
+
+        if self._lic_future is not None:
+            self.licence_ready.connect(self.apply_licence)
+            self._lic_future.add_done_callback(lambda f: self.licence_ready.emit(f))
+        elif self.checked:
+            self.start_acquisition()
+
+    def start_acquisition(self):
+        self.thread.start()
+        self.timer.start()
+        self.time_offset = self.timer.elapsed()
+        self.datasaver.start_session()
 
+    def apply_licence(self, future):
+        """Результат фоновой проверки лицензии: разблокировать управление и запустить опрос."""
+        try:
+            lic = future.result()
+        except Exception:
+            lic = False
+        self.check_hardware(lic, PID_filled=True)
         if self.checked:
-            self.thread.start()
-            self.timer.start()
-            self.time_offset = self.timer.elapsed()
-            self.datasaver.start_session()
+            self.settings_bar.lic_ok()
+            self.start_acquisition()
 
     def check_hardware(self, lic, PID_filled):
         if lic and PID_filled:
@@ -183,7 +146,8 @@ class MainWindow(QMainWindow):
 
     def stop(self):
         self.time_offset = self.get_time()
-        self.datasaver.save_data(get_filepath(self.config['result_path'], 'stop'))
+        reason, self.stop_reason = self.stop_reason or 'оператор', None
+        self.datasaver.save_data(get_filepath(self.config['result_path'], 'stop'), reason, report=not self.closing)
         self.worker.enqueue_cmd('stop_all')
 
     def start(self):
@@ -200,66 +164,85 @@ class MainWindow(QMainWindow):
         return self.timer.elapsed() + self.time_offset
 
     def closeEvent(self, event):
+        self.stop_reason = 'закрытие программы'
+        self.closing = True
         self.stop()
         self.settings_bar.stop()
         time.sleep(1)
         self.worker.stop()
         self.thread.quit()
         self.thread.wait()
-        self.datasaver.save_data('temp.csv')
+        self.datasaver.save_data('temp.csv', 'закрытие программы')
         self.graph_bar.close()
+        self.datasaver.close()
+        self.metrics_timer.stop()
+        self.dump_metrics()
         super().closeEvent(event)
 
     def on_data_ready(self, data, rel_time):
+        start = time.perf_counter()
+        lag = (start - self.worker.init_time) * 1000.0 - rel_time
+        if lag >= 0:   # отрицательная — отсчёт до сброса времени
+            METRICS.timing('signal_lag', lag)
         if data:
+            # при воспроизведении отсчёт несёт исходное время записи
+            rel_time = data.pop('rel_time', rel_time)
 
-            f_val = self.update_frequency_regression(data, rel_time)
-            if f_val is not None:
-                data['f'] = f_val
-
-            stat = data["Stat"]
-            data = self.datasaver.apply_filters(data)
-            self.settings_bar.update(stat)
             self.status_bar.update_values(data)
             self.datasaver.add_to_matrix(data, round(rel_time, 1))
-            if (self.elapsed_time // 10) == 1:
-                self.elapsed_time = 0
-                if stat[0] and self.settings_bar.loaded == False:
-                    self.settings_bar.loaded = True
-                    self.settings_bar.loading_btn.setText("Стоп")
-                    self.settings_bar.rotation_btn.setEnabled(True)
-                elif stat[0] == False and self.settings_bar.loaded == True:
-                    self.settings_bar.stop()
-
-            else:
-                self.elapsed_time += 1
 
         else:
             self.setWindowTitle(f"{self.config['name']} - Нет данных")
+        METRICS.since('on_data_ready', start)
+
+    def dump_metrics(self):
+        try:
+            METRICS.dump(self.config['result_path'])
+        except OSError:
+            pass
 
     def on_error(self, msg):
         self.setWindowTitle(f"{self.config['name']} - Ошибка PLC: {msg}")
 
+    def on_report(self, result):
+        """Отчёт по сохранённому файлу готов (DataSaver.make_report): открыть, если просили."""
+        if 'error' in result:
+            self.setWindowTitle(f"{self.config['name']} - Отчёт не построен: {result['error']}")
+        elif result['open'] or int(self.config.get('report_open', 0)):
+            path = result.get('html') or result.get('pdf')
+            if path:
+                QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+
+    def on_link_changed(self, info):
+        """Обрыв/восстановление связи: заголовок окна и отметка интервала в файле событий сессии."""
+        if info['online']:
+            if self._title is not None:
+                self.setWindowTitle(self._title)
+            self.datasaver.log_events([(info['time'] / 1000.0, 'outage_end', info['seq_from'], info['seq_to'],
+                                        info['seq_to'] - info['seq_from'] + 1, None)])
+        else:
+            self._title = self.windowTitle()
+            self.setWindowTitle(f"{self.config['name']} - Ошибка PLC: {info['message']}")
+            self.datasaver.log_events([(info['time'] / 1000.0, 'outage_start', info['seq'], None, None, None)])
+
+    def on_loaded(self, transitions):
+        """
+        Нагружение включено не из этого окна (ПЛК, другой клиент) — кнопки в состояние «нагружен».
+        Сброс нагрузки отслеживает защита в потоке опроса (on_tripped).
+        """
+        if transitions[-1][2] and not self.settings_bar.loaded:
+            self.settings_bar.loaded = True
+            self.settings_bar.loading_btn.setText("Стоп")
+            self.settings_bar.rotation_btn.setEnabled(True)
+
+    def on_tripped(self, info):
+        """Сработала защита: ПЛК уже остановлен потоком опроса, здесь — кнопки, файл и заголовок."""
+        self.setWindowTitle(f"{self.config['name']} - {info['text']}")
+        if info['action'] != 'log' and self.settings_bar.loaded:
+            self.stop_reason = info['text']
+            self.settings_bar.stop()
+
     def clean_data(self):
         self.worker.reset_time()
         self.datasaver.drop_data()
         self.datasaver.start_session()
-
-    def update_frequency_regression(self, data, rel_time):
-        """Обновляет частоту f по линейной регрессии на последних N точках."""
-        N = data.get("N")
-        if N is None:
-            return None
-
-        self._time_window.append(rel_time / 1000.0)  # в сек
-        self._cycle_window.append(N)
-
-        if len(self._time_window) > self._freq_window_size:
-            self._time_window.pop(0)
-            self._cycle_window.pop(0)
-
-        if len(self._time_window) >= 2:
-            coef = np.polyfit(self._time_window, self._cycle_window, 1)
-            slope = coef[0]
-            self._last_freq = slope
-        return self._last_freq
\ No newline at end of file
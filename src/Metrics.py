@@ -0,0 +1,105 @@
+import time
+import numpy as np
+from collections import deque
+from pathlib import Path
+
+
+class Stat:
+    """
+    Одна метрика: число событий, сумма, последнее значение, максимум и окно
+    последних значений для перцентилей. Пишет в неё один поток, поэтому
+    обновление — несколько присваиваний без блокировок (хватает GIL).
+    """
+    __slots__ = ('kind', 'count', 'total', 'last', 'max', 'recent')
+
+    def __init__(self, kind, window=512):
+        self.kind = kind
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+        self.recent.append(value)
+
+    def summary(self):
+        recent = np.fromiter(list(self.recent), dtype=np.float64)
+        out = {'kind': self.kind, 'count': self.count, 'total': self.total, 'last': self.last, 'max': self.max,
+               'mean': None, 'p95': None, 'recent_max': None}
+        if recent.size:
+            out['mean'] = float(recent.mean())
+            out['p95'] = float(np.percentile(recent, 95))
+            out['recent_max'] = float(recent.max())
+        return out
+
+
+class Metrics:
+    """
+    Реестр счётчиков и таймеров горячего пути (опрос ПЛК, доставка сигналов,
+    фильтры, запись). Виды метрик:
+        time  — длительность, мс;
+        gauge — текущее значение (глубина очереди);
+        count — накопительный счётчик событий;
+        bytes — накопительный счётчик байт.
+    """
+    UNITS = {'time': 'мс', 'gauge': '', 'count': '', 'bytes': 'Б'}
+
+    def __init__(self, window=512):
+        self.window = int(window)
+        self._stats = {}
+        self.started = time.time()
+
+    def _get(self, name, kind):
+        stat = self._stats.get(name)
+        if stat is None:
+            stat = self._stats.setdefault(name, Stat(kind, self.window))
+        return stat
+
+    def timing(self, name, ms):
+        self._get(name, 'time').add(ms)
+
+    def gauge(self, name, value):
+        self._get(name, 'gauge').add(value)
+
+    def count(self, name, value=1, kind='count'):
+        self._get(name, kind).add(value)
+
+    def since(self, name, start):
+        """Записать время от `start` (perf_counter) до текущего момента."""
+        self._get(name, 'time').add((time.perf_counter() - start) * 1000.0)
+
+    def snapshot(self):
+        return {name: stat.summary() for name, stat in sorted(self._stats.items())}
+
+    def reset(self):
+        self._stats.clear()
+        self.started = time.time()
+
+    def dump(self, base_dir='results'):
+        """Дописать текущие значения в results/metrics.tsv, вернуть путь."""
+        path = Path(base_dir) / 'metrics.tsv'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        new = not path.exists()
+        stamp = time.strftime('%d.%m.%Y %H:%M:%S')
+        with open(path, 'a', encoding='utf-8') as f:
+            if new:
+                f.write('Время\tМетрика\tВид\tСобытий\tСреднее\tp95\tМакс. (окно)\tМакс.\tСумма\n')
+            for name, s in self.snapshot().items():
+                f.write('\t'.join([stamp, name, s['kind'], str(s['count']), _fmt(s['mean']), _fmt(s['p95']),
+                                   _fmt(s['recent_max']), _fmt(s['max']), _fmt(s['total'])]) + '\n')
+        return path
+
+
+def _fmt(value):
+    if value is None:
+        return ''
+    return f'{value:.3f}'.replace('.', ',')
+
+
+METRICS = Metrics()
@@ -1,8 +1,15 @@
 import struct
+import time
 from pyModbusTCP.client import ModbusClient
-from src.utils import read_json
+from src.utils import read_json, read_TCP_conf
+from src.Metrics import METRICS
+from src.Channels import ChannelRegistry, PLCDecoder
 from PySide6.QtCore import QElapsedTimer
 
+# Уставки, к которым добавляется смещение нуля канала
+SETPOINT_OFFSETS = {'P_tar': 'P', 'M_max': 'M', 'L_lim': 'L'}
+
+
 def get_registers(parameter, config):
     return [i for i in range(config[parameter][1], config[parameter][1] + config[parameter][2])]
 
@@ -13,16 +20,6 @@ def div_parameters(data, multiplier):
     return data
 
 
-def read_TCP_conf(path):
-    config = {}
-    with open(path, 'r') as _cfg:
-        lines = _cfg.read().split('\n')
-    for line in lines:
-        name, adr, reg, dtype = line.split(' ')
-        config[name] = (dtype, int(adr), int(reg))
-    return config
-
-
 def convert_ieee_754_float(regs):
     """Конвертирует 2 регистра Modbus в float (IEEE 754)"""
     if regs and len(regs) == 2:
@@ -89,96 +86,188 @@ def coils_to_registers(coils, bits_per_register=16):
     return registers
 
 
-def ask_plc(client, conf, m):
-    output = {'f':0.0}
-
-    all_data = client.read_coils(0, 36*16)
-    for var in ['Stat', 'T', 'N', 'P', 'L', 'M']:
-        dtype, adr, reg = conf[var]
-
-        if dtype == 'byte':
-            output[var] = all_data[adr * 16: adr * 16 + 8]
-        else:
-            value = coils_to_registers(all_data[adr * 16: adr * 16 + 32])
-            if value:
-                output[var] = decode_ieee_754(value, dtype)
-                output[var] *= m[var]
-                if dtype == 'int':
-                    output[var] = int(output[var])
+class PLCOffline(ConnectionError):
+    """Связи с ПЛК нет, очередная попытка подключения ещё не наступила."""
 
-            else:
-                output[var] = None
 
+def ask_plc(client, decoder: PLCDecoder):
+    """Один запрос катушек на все каналы реестра, разбор — векторно (см. PLCDecoder)."""
+    start = time.perf_counter()
+    all_data = client.read_coils(0, decoder.span * 16)
+    if all_data is None:
+        raise ConnectionError(f'нет ответа ПЛК: {client.last_error_as_txt}')
+    decode_start = time.perf_counter()
+    METRICS.timing('modbus_read', (decode_start - start) * 1000.0)
+    output = decoder(all_data)
+    METRICS.since('decode', decode_start)
     return output
 
 
 
 def write_plc(client, adds, values):
+    """Запись регистров по одному; False — ПЛК не подтвердил запись (pyModbusTCP не бросает исключений)."""
     for i in range(len(adds)):
-        client.write_single_register(adds[i], values[i])
+        if not client.write_single_register(adds[i], values[i]):
+            return False
+    return True
 
 class Client:
-    def __init__(self, host_ip, cfg_path='modbus_adr.cfg'):
-        self.client = ModbusClient(host=host_ip, timeout=1)
+    """
+    Связь с ПЛК. Состояние соединения:
+        online  — опрос идёт как обычно;
+        offline — после ошибки связи. Запросы сразу завершаются PLCOffline, без обращения
+                  к сети, пока не наступит retry_at. Тогда выполняется пробное подключение
+                  с коротким таймаутом. Интервал между попытками удваивается от
+                  backoff_min до backoff_max; при успехе сразу возвращаемся в online.
+    """
+    def __init__(self, host_ip, cfg_path='modbus_adr.cfg', port=502,
+                 backoff_min=0.25, backoff_max=2.0, probe_timeout=0.3):
+        self.timeout = 1
+        self.client = ModbusClient(host=host_ip, port=port, timeout=self.timeout)
         self.config = read_TCP_conf(cfg_path)
         self.multiplier = read_json('multiplier.json')
+        self.channels = ChannelRegistry.from_config(tcp=self.config)
+        self.decoder = PLCDecoder(self.channels)
         self.timer = QElapsedTimer()
         self.timer.start()
         self.time_offset = self.timer.elapsed()
 
+        self.backoff_min = float(backoff_min)
+        self.backoff_max = float(backoff_max)
+        self.probe_timeout = float(probe_timeout)
+        self.online = True
+        self.failures = 0
+        self.backoff = self.backoff_min
+        self.retry_at = 0.0
+        self.down_since = None
+        self.last_error = ''
+
     def get_time(self):
         return self.timer.elapsed() + self.time_offset
 
     def __call__(self):
-        data = ask_plc(self.client, self.config, self.multiplier)
+        if not self.online and not self._probe():
+            raise PLCOffline(self.last_error)
+        try:
+            data = ask_plc(self.client, self.decoder)
+        except ConnectionError as e:
+            self._link_down(e)
+            raise
+        self._link_up()
         return data
 
+    def _probe(self):
+        """Пробное подключение, не чаще чем раз в backoff секунд."""
+        now = time.monotonic()
+        if now < self.retry_at:
+            return False
+        self.client.timeout = self.probe_timeout
+        try:
+            ok = self.client.open()
+        finally:
+            self.client.timeout = self.timeout
+        if not ok:
+            self._link_down(ConnectionError(f'нет ответа ПЛК: {self.client.last_error_as_txt}'))
+        return ok
+
+    def _link_down(self, error):
+        self.client.close()
+        now = time.monotonic()
+        if self.online:
+            self.online = False
+            self.down_since = now
+            self.backoff = self.backoff_min
+        else:
+            self.backoff = min(self.backoff * 2.0, self.backoff_max)
+        self.failures += 1
+        self.retry_at = now + self.backoff
+        self.last_error = str(error)
+
+    def _link_up(self):
+        if not self.online:
+            self.online = True
+            self.down_since = None
+            self.backoff = self.backoff_min
+
+    def _confirm(self, ok, what):
+        """
+        Запись без подтверждения ПЛК — ошибка связи: клиент переходит в offline,
+        вызывающий получает ConnectionError (команды безопасности Worker удержит).
+        """
+        if not ok:
+            error = ConnectionError(f'ПЛК не принял {what}: {self.client.last_error_as_txt}')
+            self._link_down(error)
+            raise error
+
     def send_params(self, params, offsets=None):
         params = div_parameters(params, self.multiplier)
         for param in ['P_tar', 'f_tar', 'P_rate_tar', 'L_lim', 'T_max', 'N_max_lim', 'M_max']:
             value = params[param]
-            if param == 'P_tar':
-                value = value + offsets['P']
-            elif param == 'M_max':
-                value = value + offsets['M']
-            elif param == 'L_lim':
-                value = value + offsets['L']
-            write_plc(self.client, get_registers(param, self.config),
-                      encode_ieee_754(value, self.config[param][0]))
-            
+            if param in SETPOINT_OFFSETS:
+                value = value + offsets[SETPOINT_OFFSETS[param]]
+            self._confirm(write_plc(self.client, get_registers(param, self.config),
+                                    encode_ieee_754(value, self.config[param][0])), f'уставку {param}')
+
+    def write_setpoints(self, values, offsets=None):
+        """
+        Записать только переданные уставки (единицы полей TestBar; множители и смещения —
+        как в send_params). Соседние регистры уходят одним запросом записи нескольких
+        регистров. Возвращает число запросов.
+        """
+        regs = {}
+        for param, value in values.items():
+            value = float(str(value).replace(',', '.')) / self.multiplier[param[0]]
+            if param in SETPOINT_OFFSETS:
+                value += (offsets or {}).get(SETPOINT_OFFSETS[param], 0.0)
+            regs.update(zip(get_registers(param, self.config), encode_ieee_754(value, self.config[param][0])))
+        requests = 0
+        run = []
+        for adr in sorted(regs) + [None]:
+            if run and (adr is None or adr != run[0] + len(run)):
+                self._confirm(self.client.write_multiple_registers(run[0], [regs[a] for a in run]), 'уставки')
+                requests += 1
+                run = []
+            if adr is not None:
+                run.append(adr)
+        return requests
+
     def send_PID(self, P, I, D, SUP, T2F):
-        write_plc(self.client, get_registers('P_', self.config), encode_ieee_754(P, self.config['P_'][0]))
-        write_plc(self.client, get_registers('I_', self.config), encode_ieee_754(I, self.config['I_'][0]))
-        write_plc(self.client, get_registers('D_', self.config), encode_ieee_754(D, self.config['D_'][0]))
-        write_plc(self.client, get_registers('SUP', self.config), encode_ieee_754(SUP, self.config['SUP'][0]))
-        write_plc(self.client, get_registers('T2F', self.config), encode_ieee_754(T2F, self.config['T2F'][0]))
+        for param, value in zip(['P_', 'I_', 'D_', 'SUP', 'T2F'], [P, I, D, SUP, T2F]):
+            self._confirm(write_plc(self.client, get_registers(param, self.config),
+                                    encode_ieee_754(value, self.config[param][0])), f'параметр {param}')
 
     def get_parameters(self):
+        """Читает PID/SUP/T2F одним запросом holding-регистров."""
+        params = ['P_', 'I_', 'D_', 'SUP', 'T2F']
+        first = min(self.config[p][1] for p in params)
+        last = max(self.config[p][1] + self.config[p][2] for p in params)
+        regs = self.client.read_holding_registers(first, last - first)
+        if not regs:
+            raise ConnectionError('нет ответа ПЛК при чтении параметров PID')
         data = {}
-        for param in ['P_', 'I_', 'D_', 'SUP', 'T2F']:
-            regs = self.client.read_holding_registers(self.config[param][1], self.config[param][2])
-            data[param] = decode_ieee_754(regs, self.config[param][0])
+        for param in params:
+            _, adr, reg = self.config[param]
+            data[param] = decode_ieee_754(regs[adr - first: adr - first + reg], self.config[param][0])
         return data
 
+    def _command(self, bit, value):
+        adr = self.config['Cmd'][1]*16 + bit
+        self._confirm(self.client.write_single_coil(adr, value), f'команду Cmd[{bit}]={int(value)}')
+
     def load(self):
-        adr = self.config['Cmd'][1]*16 + 0
-        self.client.write_single_coil(adr, True)
+        self._command(0, True)
 
     def unload(self):
-        adr = self.config['Cmd'][1]*16 + 0
-        self.client.write_single_coil(adr, False)
+        self._command(0, False)
 
     def rotate(self):
-        adr = self.config['Cmd'][1]*16 + 1
-        self.client.write_single_coil(adr, True)
+        self._command(1, True)
 
     def write_PID(self):
-        adr = self.config['Cmd'][1]*16 + 3
-        self.client.write_single_coil(adr, True)
+        self._command(3, True)
 
     def stop_rotate(self):
-        adr = self.config['Cmd'][1]*16 + 1
-        self.client.write_single_coil(adr, False)
+        self._command(1, False)
 
     def stop(self):
         self.stop_rotate()
@@ -186,5 +275,4 @@ class Client:
         self.time_offset = self.get_time()
 
     def reset(self):
-        adr = self.config['Cmd'][1]*16 + 2
-        self.client.write_single_coil(adr, True)
+        self._command(2, True)
@@ -0,0 +1,263 @@
+import json
+from pathlib import Path
+
+# Параметры испытания и допустимые диапазоны (как у полей TestBar)
+TEST_LIMITS = {'P_tar': (-100, 100), 'f_tar': (0, 100), 'P_rate_tar': (0, 100), 'L_lim': (0, 10),
+               'T_max': (0, 1000), 'N_max_lim': (0, 1e8), 'M_max': (-50, 50)}
+# Подписи уставок в описании шагов
+LABELS = {'P_tar': ('P', 'кН'), 'f_tar': ('f', 'Гц'), 'P_rate_tar': ('dP', 'с'), 'L_lim': ('L', 'мм'),
+          'T_max': ('T', '°С'), 'N_max_lim': ('N', 'цикл'), 'M_max': ('M', 'Нм')}
+DEFAULT_RESOLUTION = 0.1   # шаг записи уставки на линейном участке, в единицах уставки
+
+
+class Step:
+    """
+    Шаг программы: уставки values (единицы полей TestBar) и длительность — cycles
+    циклов или seconds секунд от начала шага; без длительности шаг длится до
+    остановки программы (только последний). ramp — уставки идут линейно от
+    значений на входе в шаг к values за время шага; resolution — наименьшее
+    изменение уставки, ради которого она переписывается в ПЛК.
+    """
+    __slots__ = ('values', 'cycles', 'seconds', 'ramp', 'resolution', 'label')
+
+    def __init__(self, values, cycles=None, seconds=None, ramp=False, resolution=DEFAULT_RESOLUTION, label=''):
+        self.values = dict(values)
+        self.cycles = None if cycles is None else int(cycles)
+        self.seconds = None if seconds is None else float(seconds)
+        self.ramp = bool(ramp)
+        self.resolution = float(resolution)
+        self.label = label
+
+    @property
+    def length(self):
+        return self.cycles if self.cycles is not None else self.seconds
+
+    @property
+    def unit(self):
+        return 'цикл' if self.cycles is not None else 'с'
+
+    def describe(self):
+        parts = []
+        for key, value in self.values.items():
+            name, units = LABELS.get(key, (key, ''))
+            parts.append(f'{name}={value:g} {units}'.rstrip())
+        text = ', '.join(parts) or 'без изменений'
+        if self.ramp:
+            text = 'плавно до ' + text
+        if self.length is not None:
+            text += f' на {self.length:g} {self.unit}'
+        return f'{self.label}: {text}' if self.label else text
+
+
+def _parse_steps(items, resolution, where=''):
+    """Список шагов и блоков ({"repeat": K, "steps": [...]}) -> плоский список Step."""
+    steps = []
+    for i, spec in enumerate(items, 1):
+        place = f'{where}{i}'
+        if 'steps' in spec:
+            repeat = int(spec.get('repeat', 1))
+            block = spec.get('name', f'блок {place}')
+            inner = spec['steps']
+            for k in range(repeat):
+                for step in _parse_steps(inner, float(spec.get('resolution', resolution)), f'{place}.'):
+                    suffix = f'{block} {k + 1}/{repeat}' if repeat > 1 else block
+                    step.label = f'{suffix}, {step.label}' if step.label else suffix
+                    steps.append(step)
+            continue
+        values = {}
+        for key, value in spec.items():
+            if key in ('cycles', 'seconds', 'ramp', 'resolution', 'name'):
+                continue
+            if key not in TEST_LIMITS:
+                raise ValueError(f'шаг {place}: неизвестная уставка {key}')
+            value = float(str(value).replace(',', '.'))
+            low, high = TEST_LIMITS[key]
+            if not low <= value <= high:
+                raise ValueError(f'шаг {place}: {key}={value:g} вне диапазона [{low}, {high}]')
+            values[key] = value
+        if 'cycles' in spec and 'seconds' in spec:
+            raise ValueError(f'шаг {place}: задаётся либо cycles, либо seconds')
+        step = Step(values, spec.get('cycles'), spec.get('seconds'), spec.get('ramp', False),
+                    spec.get('resolution', resolution), spec.get('name', ''))
+        if step.length is not None and step.length < 0:
+            raise ValueError(f'шаг {place}: отрицательная длительность')
+        if step.ramp and not step.length:
+            raise ValueError(f'шаг {place}: для плавного изменения нужна длительность')
+        steps.append(step)
+    return steps
+
+
+class Program:
+    """
+    Программа нагружения: последовательность шагов (см. Step), блоки повторяются.
+    Файл JSON (или YAML, если установлен PyYAML):
+
+        {"name": "Блоки 4/6 кН", "resolution": 0.1,
+         "steps": [
+            {"P_tar": 4, "f_tar": 5, "cycles": 10000},
+            {"repeat": 3, "steps": [
+                {"P_tar": 6, "cycles": 5000},
+                {"P_tar": 2, "cycles": 5000, "ramp": true}]},
+            {"P_tar": 0, "seconds": 60}]}
+
+    В шаге — только меняющиеся уставки (P_tar, f_tar, P_rate_tar, L_lim, T_max,
+    N_max_lim, M_max), остальные остаются как были.
+    """
+    def __init__(self, name, steps):
+        self.name = name
+        self.steps = list(steps)
+        if not self.steps:
+            raise ValueError('в программе нет шагов')
+        for i, step in enumerate(self.steps[:-1], 1):
+            if step.length is None:
+                raise ValueError(f'шаг {i} без длительности — таким может быть только последний')
+
+    @classmethod
+    def from_dict(cls, spec, name='программа'):
+        if isinstance(spec, list):
+            spec = {'steps': spec}
+        resolution = float(spec.get('resolution', DEFAULT_RESOLUTION))
+        return cls(spec.get('name', name), _parse_steps(spec.get('steps', []), resolution))
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        text = path.read_text(encoding='utf-8')
+        if path.suffix.lower() in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError('для программ в YAML нужен пакет PyYAML; сохраните программу в JSON') from None
+            spec = yaml.safe_load(text)
+        else:
+            spec = json.loads(text)
+        return cls.from_dict(spec, path.stem)
+
+    def __len__(self):
+        return len(self.steps)
+
+
+class ProfileRunner:
+    """
+    Исполнение программы в потоке опроса: update() на каждом отсчёте по наработке N
+    и времени получения отсчёта; возвращает уставки, которые нужно записать в ПЛК
+    (только отличающиеся от уже записанных), и номера шагов, в которые вошли.
+
+    Границы шагов отсчитываются от плановых, а не от фактических: шаг по циклам
+    кончается ровно через cycles циклов после плановой границы предыдущего, и
+    задержка обнаружения перехода (до одного периода опроса) не накапливается.
+    Сброс счётчика N в ПЛК не сбивает программу: наработка копится по приращениям.
+    setpoints — уставки, записанные в ПЛК до запуска (единицы полей TestBar).
+    """
+    def __init__(self, program: Program, setpoints=None):
+        self.program = program
+        self.current = dict(setpoints or {})
+        self.state = 'ready'   # ready -> running -> done | stopped
+        self.index = -1
+        self.cycles = 0
+        self.elapsed = 0.0
+        self.overshoot = 0.0
+        self._last_n = None
+        self._t0 = None
+        self._base = (0, 0.0)   # наработка и время (с) плановой границы текущего шага
+        self._ramp_from = {}
+
+    @property
+    def running(self):
+        return self.state in ('ready', 'running')
+
+    @property
+    def step(self):
+        return self.program.steps[self.index] if 0 <= self.index < len(self.program) else None
+
+    def stop(self, state='stopped'):
+        if self.running:
+            self.state = state
+
+    def forget(self, keys):
+        """Запись уставок не удалась: считать их неизвестными, чтобы переписать на следующем отсчёте."""
+        for key in keys:
+            self.current.pop(key, None)
+
+    def update(self, n, now):
+        """n — наработка из отсчёта, now — время отсчёта, с. -> (уставки для записи, вошедшие шаги)."""
+        if not self.running:
+            return {}, []
+        if self._last_n is None:
+            self._last_n, self._t0 = n, now
+            self.state = 'running'
+        dn = n - self._last_n
+        self.cycles += dn if dn >= 0 else n
+        self._last_n = n
+        self.elapsed = now - self._t0
+
+        targets, entered = {}, []
+        if self.index < 0:
+            self._enter(0, targets, entered)
+        while self.running:
+            step = self.step
+            if step.length is None:
+                break
+            done = self._position(step)
+            if done < step.length:
+                if step.ramp:
+                    self._ramp(step, done / step.length, targets)
+                break
+            targets.update(step.values)
+            self.overshoot = done - step.length
+            cycles, seconds = self._base
+            if step.cycles is not None:
+                self._base = (cycles + step.cycles, self.elapsed)
+            else:
+                self._base = (self.cycles, seconds + step.seconds)
+            if self.index + 1 >= len(self.program):
+                self.state = 'done'
+                break
+            self._enter(self.index + 1, targets, entered)
+        return self._commit(targets), entered
+
+    def _position(self, step):
+        cycles, seconds = self._base
+        return self.cycles - cycles if step.cycles is not None else self.elapsed - seconds
+
+    def _enter(self, index, targets, entered):
+        if index == 0:
+            self._base = (self.cycles, self.elapsed)
+        self.index = index
+        entered.append(index)
+        step = self.step
+        if step.ramp:
+            merged = dict(self.current, **targets)
+            self._ramp_from = {key: merged.get(key, value) for key, value in step.values.items()}
+        else:
+            targets.update(step.values)
+
+    def _ramp(self, step, fraction, targets):
+        for key, end in step.values.items():
+            begin = self._ramp_from[key]
+            value = round(begin + (end - begin) * fraction, 6)
+            last = targets.get(key, self.current.get(key))
+            if last is None or abs(value - last) >= step.resolution:
+                targets[key] = value
+
+    def _commit(self, targets):
+        changes = {key: value for key, value in targets.items() if self.current.get(key) != value}
+        self.current.update(changes)
+        return changes
+
+    def status(self):
+        """Состояние для GUI: шаг, прогресс шага, следующий шаг, текущие уставки."""
+        step = self.step
+        total = len(self.program)
+        out = {'name': self.program.name, 'state': self.state, 'index': self.index, 'steps': total,
+               'step': step.describe() if step is not None else '', 'unit': step.unit if step is not None else '',
+               'done': 0.0, 'length': None, 'progress': 0.0, 'cycles': self.cycles, 'elapsed': self.elapsed,
+               'next': self.program.steps[self.index + 1].describe() if 0 <= self.index < total - 1 else '',
+               'setpoints': dict(self.current)}
+        if step is not None and step.length is not None and self.state == 'running':
+            done = self._position(step)
+            out.update(done=done, length=step.length,
+                       progress=min(done / step.length, 1.0) if step.length else 1.0)
+        elif self.state == 'done':
+            out['progress'] = 1.0
+        return out
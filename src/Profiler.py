@@ -0,0 +1,107 @@
+import time
+import numpy as np
+from collections import deque
+from pathlib import Path
+
+
+class FrameStats:
+    """
+    Замеры отрисовки графика по фазам: конвертация данных, прореживание,
+    выравнивание X/Y, передача в pyqtgraph и собственно отрисовка.
+    Хранит последние `window` кадров, считает среднее, p95 и максимум.
+    """
+    PHASES = ('get_matrices', 'decimate', 'align', 'set_data', 'paint')
+
+    def __init__(self, name='graph', window: int = 300):
+        self.name = name
+        self.window = int(window)
+        self.phases = {p: deque(maxlen=self.window) for p in self.PHASES}
+        self.frames = deque(maxlen=self.window)
+        self.points = deque(maxlen=self.window)
+        self.copied = deque(maxlen=self.window)
+        self._t0 = None
+        self._last = None
+        self._current = None
+        self._pending = None
+
+    def begin(self, start=None):
+        """Начать кадр; start — момент (perf_counter) начала, если кадр начался раньше (асинхронный запрос)."""
+        self._close_pending()
+        self._t0 = self._last = time.perf_counter() if start is None else start
+        self._current = {'points': 0, 'bytes': 0}
+
+    def mark(self, phase, points=None, nbytes=0):
+        """Закрыть фазу `phase`: время от предыдущей отметки."""
+        if self._current is None:
+            return
+        now = time.perf_counter()
+        self.phases[phase].append((now - self._last) * 1000.0)
+        self._last = now
+        self._current['bytes'] += int(nbytes)
+        if points is not None:
+            self._current['points'] = int(points)
+
+    def end(self):
+        """Кадр обновлён; время отрисовки добавится, когда Qt выполнит paint."""
+        if self._current is None:
+            return
+        self._current['update'] = (time.perf_counter() - self._t0) * 1000.0
+        self._pending = self._current
+        self._current = None
+
+    def cancel(self):
+        self._current = None
+
+    def add_paint(self, ms):
+        self.phases['paint'].append(ms)
+        if self._pending is not None:
+            self._pending['paint'] = self._pending.get('paint', 0.0) + ms
+
+    def _close_pending(self):
+        frame = self._pending
+        if frame is None:
+            return
+        self.frames.append(frame['update'] + frame.get('paint', 0.0))
+        self.points.append(frame['points'])
+        self.copied.append(frame['bytes'])
+        self._pending = None
+
+    @staticmethod
+    def _describe(values):
+        if not values:
+            return None
+        arr = np.fromiter(values, dtype=np.float64)
+        return {'mean': float(arr.mean()), 'p95': float(np.percentile(arr, 95)), 'max': float(arr.max())}
+
+    def summary(self):
+        return {
+            'frames': len(self.frames),
+            'frame_ms': self._describe(self.frames),
+            'phases_ms': {p: self._describe(v) for p, v in self.phases.items()},
+            'points': self._describe(self.points),
+            'bytes': self._describe(self.copied),
+        }
+
+    def text(self):
+        """Краткий текст для оверлея на графике."""
+        s = self.summary()
+        if not s['frame_ms']:
+            return 'нет данных'
+        lines = ['кадр, мс: ср {mean:.1f}  p95 {p95:.1f}  max {max:.1f}'.format(**s['frame_ms'])]
+        for phase, d in s['phases_ms'].items():
+            if d:
+                lines.append(f'{phase}: ср {d["mean"]:.2f}  p95 {d["p95"]:.2f}  max {d["max"]:.2f}')
+        lines.append(f'точек: {s["points"]["mean"]:.0f}   копировано, КБ: {s["bytes"]["mean"] / 1024:.0f}')
+        return '\n'.join(lines)
+
+    def dump(self, base_dir='results'):
+        """Дописать текущую статистику в лог-файл, вернуть путь."""
+        path = Path(base_dir) / 'frame_stats.log'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        s = self.summary()
+        stamp = time.strftime('%d.%m.%Y %H:%M:%S')
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(f'[{stamp}] {self.name}: кадров {s["frames"]}\n')
+            for line in self.text().split('\n'):
+                f.write(f'    {line}\n')
+        return path
@@ -0,0 +1,191 @@
+import threading
+from collections import defaultdict
+
+NAN = float('nan')
+
+
+class TurningPoints:
+    """
+    Точки разворота потока с гистерезисом gate: разворот подтверждается, когда сигнал
+    отошёл от текущего экстремума больше чем на gate. Первый отсчёт — начальная точка.
+    NaN пропускаются, не прерывая цикл.
+    """
+    def __init__(self, gate):
+        self.gate = float(gate)
+        self.reset()
+
+    def reset(self):
+        self.extreme = None   # текущий, ещё не подтверждённый экстремум
+        self.direction = 0
+
+    def update(self, x):
+        """Новый отсчёт; возвращает подтверждённую точку разворота или None."""
+        if x != x:
+            return None
+        ext = self.extreme
+        if ext is None:
+            self.extreme = x
+            return x
+        if self.direction > 0:
+            if x > ext:
+                self.extreme = x
+            elif ext - x > self.gate:
+                self.direction = -1
+                self.extreme = x
+                return ext
+        elif self.direction < 0:
+            if x < ext:
+                self.extreme = x
+            elif x - ext > self.gate:
+                self.direction = 1
+                self.extreme = x
+                return ext
+        elif abs(x - ext) > self.gate:
+            self.direction = 1 if x > ext else -1
+            self.extreme = x
+        return None
+
+
+def astm_count(points, counts, weight=1.0):
+    """
+    Трёхточечный метод ASTM E1049 (5.4.4) по точкам разворота (уровни — целые номера
+    бинов). counts[(размах, сумма уровней)] += 1 за цикл, 0.5 за полуцикл.
+    """
+    stack = []
+    for p in points:
+        stack.append(p)
+        while len(stack) >= 3:
+            x = abs(stack[-1] - stack[-2])
+            y = abs(stack[-2] - stack[-3])
+            if x < y:
+                break
+            a, b = stack[-3], stack[-2]
+            if len(stack) == 3:
+                counts[(y, a + b)] += 0.5 * weight
+                del stack[0]
+            else:
+                counts[(y, a + b)] += weight
+                del stack[-3:-1]
+    for a, b in zip(stack, stack[1:]):
+        counts[(abs(a - b), a + b)] += 0.5 * weight
+    return counts
+
+
+class RainflowCounter:
+    """
+    Поточный подсчёт циклов rainflow одного канала. Точки разворота (гистерезис = ширина
+    бина width) квантуются до номера бина и идут в стек четырёхточечного метода: из
+    четвёрки a, b, c, d цикл (b, c) закрыт, если |c - b| не больше |b - a| и |d - c|.
+    Каждая точка кладётся и снимается не больше раза — O(1) на отсчёт в среднем.
+    В остатке размахи сначала растут, потом убывают, а уровни — целые номера бинов,
+    поэтому остаток ограничен примерно двумя числами бинов по амплитуде сигнала.
+
+    matrix() — закрытые циклы плюс остаток, досчитанный методом ASTM (полуциклы),
+    в тех же бинах; совпадает с count_offline() по всей записи.
+    """
+    def __init__(self, width):
+        self.width = float(width)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.points = TurningPoints(self.width)
+            self.residue = []
+            self.cycles = defaultdict(float)
+            self.total = 0
+
+    def update(self, x):
+        p = self.points.update(x)
+        if p is None:
+            return
+        level = round(p / self.width)
+        stack = self.residue
+        if stack and stack[-1] == level:
+            return
+        with self._lock:
+            stack.append(level)
+            while len(stack) >= 4:
+                a, b, c, d = stack[-4:]
+                inner = abs(c - b)
+                if inner > abs(b - a) or inner > abs(d - c):
+                    break
+                self.cycles[(inner, b + c)] += 1.0
+                self.total += 1
+                del stack[-3:-1]
+
+    def residue_points(self):
+        """Остаток с ещё не подтверждённым последним экстремумом."""
+        points = list(self.residue)
+        ext = self.points.extreme
+        if ext is not None and self.points.direction:
+            level = round(ext / self.width)
+            if not points or points[-1] != level:
+                points.append(level)
+        return points
+
+    def matrix(self):
+        """{(размах, среднее): циклов} в единицах канала, включая полуциклы остатка."""
+        with self._lock:
+            counts = defaultdict(float, self.cycles)
+            residue = self.residue_points()
+        astm_count(residue, counts)
+        w = self.width
+        return {(r * w, s * w / 2.0): n for (r, s), n in counts.items() if r > 0}
+
+
+def count_offline(values, width):
+    """Эталон: точки разворота всей записи и трёхточечный ASTM, те же бины, что у RainflowCounter."""
+    points = TurningPoints(width)
+    levels = []
+    for x in values:
+        p = points.update(float(x))
+        if p is not None:
+            level = round(p / width)
+            if not levels or levels[-1] != level:
+                levels.append(level)
+    if points.extreme is not None and points.direction:
+        level = round(points.extreme / width)
+        if not levels or levels[-1] != level:
+            levels.append(level)
+    counts = astm_count(levels, defaultdict(float))
+    return {(r * width, s * width / 2.0): n for (r, s), n in counts.items() if r > 0}
+
+
+class RainflowBank:
+    """Счётчики rainflow для каналов из конфигурации: rainflow_<канал> <ширина бина> (0 — выключен)."""
+    DEFAULTS = {'P': 0.1, 'M': 0.1}
+    HEADER = 'Канал\tРазмах\tСреднее\tЦиклов\n'
+
+    def __init__(self, widths: dict):
+        self.counters = {ch: RainflowCounter(w) for ch, w in widths.items() if w > 0}
+
+    @classmethod
+    def from_config(cls, config):
+        widths = dict(cls.DEFAULTS)
+        for key, value in config.items():
+            if key.startswith('rainflow_'):
+                widths[key[len('rainflow_'):]] = float(str(value).replace(',', '.'))
+        return cls(widths)
+
+    def update(self, row: dict):
+        for ch, counter in self.counters.items():
+            counter.update(row.get(ch, NAN))
+
+    def reset(self):
+        for counter in self.counters.values():
+            counter.reset()
+
+    def matrices(self):
+        return {ch: counter.matrix() for ch, counter in self.counters.items()}
+
+    def write(self, path, names=None):
+        """Спектры всех каналов в TSV (десятичная запятая), по убыванию размаха."""
+        names = names or {}
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.HEADER)
+            for ch, matrix in self.matrices().items():
+                for (rng, mean), n in sorted(matrix.items(), key=lambda item: (-item[0][0], item[0][1])):
+                    cells = [f'{v:.6g}'.replace('.', ',') for v in (rng, mean, n)]
+                    f.write('\t'.join([names.get(ch, ch)] + cells) + '\n')
+        return path
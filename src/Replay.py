@@ -0,0 +1,169 @@
+import time
+from pathlib import Path
+from src.utils import read_conf
+from src.SessionFile import read_header, parse_rows
+from src.ModbusClient import PLCOffline
+from src.Channels import TIME, ChannelRegistry
+from src.SessionFile import EXTRA_AXES
+
+
+SETTLE_S = 1.0         # чанк не менялся столько — записан целиком
+FOLLOW_IDLE_S = 30.0   # новых чанков нет столько — сессия больше не пишется
+FOLLOW_POLL_S = 0.2
+
+
+def session_files(path, settle_s=SETTLE_S, idle_s=FOLLOW_IDLE_S):
+    """
+    Файлы сессии по порядку: сшитый файл или чанки папки незавершённой сессии.
+    Папка может ещё писаться: список чанков перечитывается, когда прочитанные
+    кончаются; последний чанк отдаётся, только когда за ним появился следующий или
+    он не менялся settle_s. Конец — папку удалили (сессия сшита) или новых чанков
+    нет idle_s.
+    """
+    path = Path(path)
+    if not path.is_dir():
+        yield path
+        return
+    last = None
+    idle_since = time.monotonic()
+    while path.is_dir():
+        chunks = [c for c in sorted(path.glob('chunk-*.tsv')) if last is None or c.name > last]
+        ready = chunks[:-1]
+        if chunks:
+            try:
+                if time.time() - chunks[-1].stat().st_mtime >= settle_s:
+                    ready = chunks
+            except FileNotFoundError:
+                return
+        for chunk in ready:
+            last = chunk.name
+            yield chunk
+        if ready:
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since >= idle_s:
+            return
+        else:
+            time.sleep(FOLLOW_POLL_S)
+
+
+def iter_rows(path, block_rows=5000):
+    """Строки записанной сессии (внутренние имена колонок), в памяти не больше одного блока."""
+    for file in session_files(path):
+        try:
+            columns, offset = read_header(file)
+        except FileNotFoundError:
+            return   # папку сессии уже сшили и удалили
+        with open(file, 'rb') as f:
+            f.seek(offset)
+            lines = []
+            for line in f:
+                lines.append(line)
+                if len(lines) >= block_rows:
+                    yield from _rows(parse_rows(b''.join(lines), columns), columns)
+                    lines.clear()
+            if lines:
+                yield from _rows(parse_rows(b''.join(lines), columns), columns)
+
+
+def _rows(arrays, columns):
+    for i in range(len(arrays[columns[0]])):
+        yield {c: float(arrays[c][i]) for c in columns}
+
+
+class ReplayClient:
+    """
+    Источник данных вместо Client: отдаёт строки записанной сессии с исходными
+    интервалами, ускоренными в speed раз (speed <= 0 — без пауз, как можно быстрее).
+    Отсчёт проходит тот же путь Worker -> фильтры -> DataSaver -> графики, что и живые данные.
+
+    В файле значения записаны уже за вычетом смещений, поэтому к ним прибавляются
+    текущие смещения (offsets.param) — DataSaver вычтет их снова. Исходное время
+    отсчёта передаётся в поле rel_time (мс). Если записаны и нефильтрованные значения
+    (filter_raw), воспроизводятся они; биты состояния — если есть (файл события). Паузы длиннее max_gap_s в записи
+    сокращаются до max_gap_s. Команды управления ПЛК игнорируются.
+    """
+    paced = True   # темп задаёт сам источник, Worker опрашивает без собственного интервала
+
+    def __init__(self, path, speed=1.0, offsets=None, max_gap_s=1.0):
+        self.path = Path(path)
+        self.speed = float(speed)
+        self.offsets = offsets if offsets is not None else read_conf('offsets.param', float)
+        self.max_gap_s = float(max_gap_s)
+        self.int_channels = {ch.name for ch in ChannelRegistry.from_config() if ch.dtype == 'int'}
+        self.online = True
+        self.last_error = ''
+        self.sent = 0
+        self._rows = iter_rows(self.path)
+        self._due = None
+        self._prev_t = None
+
+    def __call__(self):
+        try:
+            row = next(self._rows)
+        except StopIteration:
+            if self.online:
+                self.online = False
+                self.last_error = f'воспроизведение завершено ({self.sent} отсчётов)'
+            time.sleep(0.1)
+            raise PLCOffline(self.last_error)
+
+        t = row['time']
+        now = time.perf_counter()
+        if self._due is None or self.speed <= 0:
+            self._due = now
+        else:
+            step = min(max(t - self._prev_t, 0.0), self.max_gap_s)
+            self._due += step / self.speed
+            if self._due > now:
+                time.sleep(self._due - now)
+            elif now - self._due > 1.0:
+                self._due = now   # не успеваем — не копим отставание бесконечно
+        self._prev_t = t
+        self.sent += 1
+
+        stat = row.get('stat')
+        stat = 0 if stat is None or stat != stat else int(stat)
+        data = {'Stat': stat, 'rel_time': t * 1000.0}
+        for key in row:
+            if key == TIME or key in EXTRA_AXES or key.endswith('_raw'):
+                continue
+            value = row.get(key + '_raw', row[key])   # есть нефильтрованная копия — фильтры сработают заново
+            if value != value:
+                data[key] = None
+                continue
+            value += self.offsets.get(key, 0.0)
+            data[key] = int(round(value)) if key in self.int_channels else value
+        return data
+
+    def send_params(self, params, offsets=None):
+        pass
+
+    def write_setpoints(self, values, offsets=None):
+        return 0
+
+    def send_PID(self, P, I, D, SUP, T2F):
+        pass
+
+    def write_PID(self):
+        pass
+
+    def get_parameters(self):
+        return {}
+
+    def load(self):
+        pass
+
+    def unload(self):
+        pass
+
+    def rotate(self):
+        pass
+
+    def stop_rotate(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def reset(self):
+        pass
@@ -0,0 +1,616 @@
+import os
+import math
+import time
+import html
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from src.SessionFile import read_header, parse_rows, header_map
+from src.Catalog import read_meta, saved_time
+from src.Channels import ChannelRegistry
+from src.Watchdog import Watchdog, ThresholdRule, parse_rule
+from src.Trend import format_duration, format_cycles
+from src.utils import read_conf
+
+REPORT_SUFFIX = '-report'
+# Пороги «время выше» — в синтаксисе защиты (см. Watchdog.parse_rule): число или параметр испытания
+DEFAULT_THRESHOLDS = 'T>T_max,L>L_lim,M>M_max'
+QUANTILES = (0.01, 0.05, 0.5, 0.95, 0.99)
+SKETCH_ALPHA = 0.005       # относительная погрешность квантилей
+CHUNK_BYTES = 8 * 2 ** 20  # кусок файла на один процесс
+POOL_MIN_BYTES = 64 * 2 ** 20   # файл меньше — считается в своём процессе: запуск пула дороже
+BLOCK_BYTES = 2 ** 20   # блок разбора внутри куска
+SERVICE_COLUMNS = ('time', 'seq', 'stat')   # не каналы: в таблицы и графики не идут
+
+
+class QuantileSketch:
+    """
+    Квантили с относительной погрешностью alpha (логарифмические бины, как в DDSketch):
+    |x| попадает в бин ceil(log_gamma |x|), gamma = (1 + alpha) / (1 - alpha); положительные
+    и отрицательные значения — в разных счётчиках, |x| < min_value — в нулевом. Сливается
+    сложением счётчиков; размер — число занятых бинов (сотни), а не число отсчётов.
+    """
+    def __init__(self, alpha=SKETCH_ALPHA, min_value=1e-6):
+        self.alpha = float(alpha)
+        self.gamma = (1 + self.alpha) / (1 - self.alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = float(min_value)
+        self.pos = {}
+        self.neg = {}
+        self.zero = 0
+        self.count = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        self.count += values.size
+        self.zero += int(np.count_nonzero(np.abs(values) < self.min_value))
+        for store, part in ((self.pos, values[values >= self.min_value]),
+                            (self.neg, -values[values <= -self.min_value])):
+            if not part.size:
+                continue
+            keys = np.ceil(np.log(part) / self.log_gamma).astype(np.int64)
+            low = int(keys.min())
+            counts = np.bincount(keys - low)
+            for k in np.flatnonzero(counts).tolist():
+                store[k + low] = store.get(k + low, 0) + int(counts[k])
+
+    def merge(self, other: 'QuantileSketch'):
+        for store, part in ((self.pos, other.pos), (self.neg, other.neg)):
+            for k, c in part.items():
+                store[k] = store.get(k, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+
+    def _value(self, key):
+        return 2.0 * self.gamma ** key / (self.gamma + 1.0)
+
+    def quantiles(self, qs):
+        """Значения квантилей qs (0..1) за один проход по бинам; NaN, если отсчётов нет."""
+        if not self.count:
+            return [math.nan] * len(qs)
+        bins = [(-self._value(k), self.neg[k]) for k in sorted(self.neg, reverse=True)]
+        if self.zero:
+            bins.append((0.0, self.zero))
+        bins += [(self._value(k), self.pos[k]) for k in sorted(self.pos)]
+        ranks = sorted((q * (self.count - 1), i) for i, q in enumerate(qs))
+        out = [bins[-1][0]] * len(qs)
+        seen, j = 0, 0
+        for value, count in bins:
+            seen += count
+            while j < len(ranks) and seen > ranks[j][0]:
+                out[ranks[j][1]] = value
+                j += 1
+            if j == len(ranks):
+                break
+        return out
+
+
+class SessionStats:
+    """
+    Итог по строкам файла сессии, сливаемый по кускам: точные min/max/среднее/СКО
+    (попарное слияние моментов), квантили (QuantileSketch), время выше порогов,
+    статистика по фазам наработки и прореженный обзор (min/max в points интервалах
+    времени). merge() ждёт куски в порядке файла: интервал между последней строкой
+    одного куска и первой строкой следующего относится ко времени выше порога
+    по последней строке. Размер не зависит от числа строк.
+    plan — из SessionReport.plan: колонки, границы времени и наработки, пороги.
+    """
+    def __init__(self, plan):
+        self.plan = plan
+        columns = plan['columns']
+        n = len(columns)
+        self.rows = 0
+        self.count = np.zeros(n, dtype=np.int64)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.min = np.full(n, np.nan)
+        self.max = np.full(n, np.nan)
+        self.sketches = [QuantileSketch() for _ in columns]
+        k = len(plan['thresholds'])
+        self.above_s = np.zeros(k)
+        self.above_rows = np.zeros(k, dtype=np.int64)
+        self.first_time = None
+        self.last_time = None
+        self.last_flags = np.zeros(k, dtype=bool)
+        phases, points = plan['phases'], plan['points']
+        self.phase_count = np.zeros((phases, n), dtype=np.int64)
+        self.phase_sum = np.zeros((phases, n))
+        self.phase_min = np.full((phases, n), np.nan)
+        self.phase_max = np.full((phases, n), np.nan)
+        self.ov_min = np.full((points, n), np.nan)
+        self.ov_max = np.full((points, n), np.nan)
+
+    @staticmethod
+    def _bins(values, low, high, bins):
+        """Номера интервалов [low, high] (bins штук) для values; -1 — NaN."""
+        span = high - low
+        with np.errstate(invalid='ignore'):
+            idx = np.zeros(values.shape, dtype=np.intp) if span <= 0 else \
+                np.clip(np.floor((values - low) / span * bins), 0, bins - 1).astype(np.intp)
+        idx[np.isnan(values)] = -1
+        return idx
+
+    def add(self, block):
+        """block — строки × колонки plan['columns'], строки — подряд из файла."""
+        block = np.asarray(block, dtype=np.float64)
+        rows = block.shape[0]
+        if not rows:
+            return
+        plan = self.plan
+        self.rows += rows
+        valid = ~np.isnan(block)
+        values = np.where(valid, block, 0.0)
+        count = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = values.sum(axis=0) / count
+            m2 = np.where(valid, (block - mean) ** 2, 0.0).sum(axis=0)
+        self._merge_moments(count, np.nan_to_num(mean), m2)
+        self.min = np.fmin(self.min, np.fmin.reduce(block, axis=0))
+        self.max = np.fmax(self.max, np.fmax.reduce(block, axis=0))
+        for i, sketch in enumerate(self.sketches):
+            sketch.add(block[:, i])
+
+        t = block[:, plan['time']]
+        if plan['thresholds']:
+            flags = np.column_stack([block[:, col] > limit if op == '>' else block[:, col] < limit
+                                     for col, op, limit in plan['threshold_index']])
+            self.above_rows += flags.sum(axis=0)
+            dt = np.diff(t, prepend=np.nan if self.last_time is None else self.last_time)
+            prev = np.vstack([self.last_flags[None, :], flags[:-1]])
+            dt = np.where(np.isnan(dt) | (dt < 0), 0.0, dt)
+            self.above_s += (prev * dt[:, None]).sum(axis=0)
+            self.last_flags = flags[-1]
+        if self.first_time is None:
+            self.first_time = float(t[0])
+        self.last_time = float(t[-1])
+
+        idx = self._bins(block[:, plan['phase_axis']], plan['phase_low'], plan['phase_high'], plan['phases'])
+        self._group(idx, block, self.phase_min, self.phase_max, (values, valid, self.phase_sum, self.phase_count))
+        self._group(self._bins(t, plan['t0'], plan['t1'], plan['points']), block, self.ov_min, self.ov_max)
+
+    @staticmethod
+    def _group(idx, block, low, high, sums=None):
+        """
+        min/max строк block по интервалам idx (-1 — строка не учитывается); sums —
+        (значения с 0 вместо NaN, маска значений, сумма, число) — и суммы. Время и N в
+        файле растут, idx неубывающий — свёртка по отрезкам (reduceat); иначе — поэлементно.
+        """
+        keep = idx >= 0
+        if not keep.all():
+            idx, block = idx[keep], block[keep]
+            if sums is not None:
+                sums = (sums[0][keep], sums[1][keep], sums[2], sums[3])
+        if not idx.size:
+            return
+        values, valid, total, count = sums or (None,) * 4
+        if np.all(idx[1:] >= idx[:-1]):
+            starts = np.flatnonzero(np.diff(idx, prepend=-1))
+            keys = idx[starts]
+            low[keys] = np.fmin(low[keys], np.fmin.reduceat(block, starts, axis=0))
+            high[keys] = np.fmax(high[keys], np.fmax.reduceat(block, starts, axis=0))
+            if total is not None:
+                total[keys] += np.add.reduceat(values, starts, axis=0)
+                count[keys] += np.add.reduceat(valid, starts, axis=0, dtype=np.int64)
+            return
+        np.fmin.at(low, idx, block)
+        np.fmax.at(high, idx, block)
+        if total is not None:
+            np.add.at(total, idx, values)
+            np.add.at(count, idx, valid)
+
+    def _merge_moments(self, count, mean, m2):
+        total = self.count + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean - self.mean
+            share = np.where(total > 0, count / total, 0.0)
+            self.mean = self.mean + delta * share
+            self.m2 = self.m2 + m2 + delta ** 2 * self.count * share
+        self.count = total
+
+    def merge(self, other: 'SessionStats'):
+        """Дописать итог следующего по файлу куска."""
+        if not other.rows:
+            return self
+        if self.last_time is not None and other.first_time is not None:
+            dt = other.first_time - self.last_time
+            if dt > 0:
+                self.above_s += self.last_flags * dt
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.rows += other.rows
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        for sketch, part in zip(self.sketches, other.sketches):
+            sketch.merge(part)
+        self.above_s += other.above_s
+        self.above_rows += other.above_rows
+        if self.first_time is None:
+            self.first_time = other.first_time
+        self.last_time = other.last_time
+        self.last_flags = other.last_flags
+        self.phase_count += other.phase_count
+        self.phase_sum += other.phase_sum
+        for mine, theirs, op in ((self.phase_min, other.phase_min, np.fmin), (self.phase_max, other.phase_max, np.fmax),
+                                 (self.ov_min, other.ov_min, np.fmin), (self.ov_max, other.ov_max, np.fmax)):
+            op(mine, theirs, out=mine)
+        return self
+
+    def channel(self, i):
+        """Итог колонки i: min, max, mean, std, count, квантили QUANTILES."""
+        count = int(self.count[i])
+        std = math.sqrt(self.m2[i] / count) if count else math.nan
+        lo, hi = float(self.min[i]), float(self.max[i])
+        # оценка квантиля не выходит за точные границы
+        quantiles = [min(max(q, lo), hi) for q in self.sketches[i].quantiles(QUANTILES)]
+        return {'min': lo, 'max': hi, 'mean': float(self.mean[i]) if count else math.nan, 'std': std,
+                'count': count, 'quantiles': quantiles}
+
+
+def _edge_rows(path, offset, columns):
+    """Первая и последняя строки данных файла (без чтения середины)."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        first = f.readline()
+        size = f.seek(0, 2)
+        f.seek(max(offset, size - 65536))
+        tail = f.read().splitlines()
+    last = next((line for line in reversed(tail) if line.strip()), b'')
+    if not first.strip():
+        raise ValueError('в файле нет данных')
+    return parse_rows(first, columns), parse_rows(last, columns)
+
+
+def _chunks(offset, size, chunk_bytes):
+    """Границы кусков файла [start, end): строка относится к куску, где лежит её первый байт."""
+    starts = list(range(offset, size, max(int(chunk_bytes), 1)))
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def scan_chunk(path, start, end, plan, block_bytes=BLOCK_BYTES):
+    """
+    SessionStats по строкам, начинающимся в [start, end): чтение блоками по block_bytes
+    (по целым строкам), в памяти не больше блока. Выполняется в процессах пула.
+    """
+    stats = SessionStats(plan)
+    columns = plan['columns']
+    with open(path, 'rb') as f:
+        if start > plan['offset']:
+            f.seek(start - 1)
+            pos = start - 1 + len(f.readline())   # хвост строки, начатой в предыдущем куске
+        else:
+            f.seek(start)
+            pos = start
+        carry = b''
+        while pos < end:
+            raw = f.read(min(block_bytes, end - pos))
+            if not raw:
+                break
+            pos += len(raw)
+            if pos >= end and not raw.endswith(b'\n'):
+                raw += f.readline()   # строка, начатая до конца куска, — его
+            cut = raw.rfind(b'\n') + 1 if pos < end else len(raw)
+            data, carry = carry + raw[:cut], raw[cut:]
+            if data.strip():
+                arrays = parse_rows(data, columns)
+                stats.add(np.vstack([arrays[c] for c in columns]).T)   # по колонкам подряд: свёртки быстрее
+    return stats
+
+
+def _params(path):
+    """Параметры испытания из описания сессии (-meta.json), иначе — текущие из test_parameters.param."""
+    meta = read_meta(path)
+    if meta.get('params'):
+        return meta, dict(meta['params'])
+    params = read_conf('test_parameters.param') if Path('test_parameters.param').is_file() else {}
+    return meta, params
+
+
+class SessionReport:
+    """
+    Отчёт по сохранённому файлу сессии: <файл>-report.html (и .pdf) рядом с данными.
+    Файл читается кусками по chunk_bytes в workers процессах (у больших файлов; малые —
+    в своём), в работе одновременно не больше 2·workers кусков — память не зависит от
+    длины сессии. Итоги кусков сливаются по порядку (SessionStats.merge).
+        points     — интервалов обзорных графиков (min/max в каждом);
+        phases     — фаз по наработке N (равные доли от начала до конца сессии);
+        thresholds — пороги «время выше», через запятую (см. DEFAULT_THRESHOLDS);
+        formats    — html и/или pdf (pdf — через Qt, нужен QGuiApplication).
+    """
+    def __init__(self, points=1000, phases=10, thresholds=DEFAULT_THRESHOLDS, formats=('html',), workers=None,
+                 chunk_bytes=CHUNK_BYTES):
+        self.points = max(int(points), 1)
+        self.phases = max(int(phases), 1)
+        self.thresholds = [s for s in str(thresholds).split(',') if s and s not in ('0', 'none')]
+        self.formats = tuple(formats)
+        self.workers = workers
+        self.chunk_bytes = int(chunk_bytes)
+
+    @classmethod
+    def from_config(cls, config):
+        """report_points, report_phases, report_thresholds, report_format (html,pdf), report_workers из app.cfg."""
+        return cls(int(config.get('report_points', 1000)), int(config.get('report_phases', 10)),
+                   config.get('report_thresholds', DEFAULT_THRESHOLDS),
+                   str(config.get('report_format', 'html')).split(','), int(config.get('report_workers', 0)) or None)
+
+    def plan(self, path):
+        """Разметка файла: колонки, начало данных, границы времени и наработки, пороги."""
+        columns, offset = read_header(path)
+        if 'time' not in columns:
+            raise ValueError('в файле нет колонки времени')
+        first, last = _edge_rows(path, offset, columns)
+        meta, params = _params(path)
+        watchdog = Watchdog([], params=params)
+        thresholds, index = [], []
+        for spec in self.thresholds:
+            try:
+                rule = parse_rule(spec, spec)
+            except ValueError as e:
+                raise ValueError(f'app.cfg report_thresholds {spec}: {e}') from None
+            if type(rule) is not ThresholdRule:
+                raise ValueError(f'app.cfg report_thresholds {spec}: нужно условие вида канал>предел')
+            limit = watchdog.resolve(rule.limit)
+            if rule.channel in columns and limit is not None:
+                thresholds.append((rule.channel, rule.op, limit, spec))
+                index.append((columns.index(rule.channel), rule.op, limit))
+        axis = 'N' if 'N' in columns and last['N'][0] > first['N'][0] else 'time'
+        return {'columns': columns, 'offset': offset, 'time': columns.index('time'),
+                't0': float(first['time'][0]), 't1': float(last['time'][0]),
+                'phase_axis': columns.index(axis), 'phase_name': axis,
+                'phase_low': float(first[axis][0]), 'phase_high': float(last[axis][0]),
+                'phases': self.phases, 'points': self.points,
+                'thresholds': thresholds, 'threshold_index': index, 'meta': meta, 'params': params}
+
+    def scan(self, path, progress=None):
+        """-> (план, SessionStats по всему файлу, число кусков, процессов)."""
+        path = Path(path)
+        plan = self.plan(path)
+        size = path.stat().st_size
+        chunks = _chunks(plan['offset'], size, self.chunk_bytes)
+        workers = max(1, min(int(self.workers or os.cpu_count() or 1), len(chunks)))
+        if size < POOL_MIN_BYTES:
+            workers = 1
+        total = SessionStats(plan)
+        if workers == 1:
+            for done, (start, end) in enumerate(chunks, 1):
+                total.merge(scan_chunk(path, start, end, plan))
+                if progress is not None:
+                    progress(done, len(chunks))
+            return plan, total, len(chunks), workers
+
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            pending = deque()
+            todo = iter(chunks)
+            done = 0
+            for start, end in itertools.islice(todo, 2 * workers):
+                pending.append(pool.submit(scan_chunk, path, start, end, plan))
+            while pending:
+                total.merge(pending.popleft().result())
+                done += 1
+                for start, end in itertools.islice(todo, 1):
+                    pending.append(pool.submit(scan_chunk, path, start, end, plan))
+                if progress is not None:
+                    progress(done, len(chunks))
+        finally:
+            pool.shutdown(cancel_futures=True)
+        return plan, total, len(chunks), workers
+
+    def run(self, path, progress=None):
+        """
+        Построить отчёт по файлу path; progress(готово, всего) — после каждого куска.
+        -> {'path', 'html', 'pdf' (или 'pdf_error'), 'rows', 'chunks', 'workers', 'seconds'}
+        """
+        start = time.perf_counter()
+        path = Path(path)
+        plan, stats, chunks, workers = self.scan(path, progress)
+        result = {'path': str(path), 'rows': stats.rows, 'chunks': chunks, 'workers': workers}
+        plots = overview_plots(plan, stats)
+        if 'html' in self.formats:
+            html_path = path.with_name(f'{path.stem}{REPORT_SUFFIX}.html')
+            html_path.write_text(render_html(path, plan, stats, [svg for _, svg in plots]), encoding='utf-8')
+            result['html'] = str(html_path)
+        if 'pdf' in self.formats:
+            pdf_path = path.with_name(f'{path.stem}{REPORT_SUFFIX}.pdf')
+            try:
+                write_pdf(pdf_path, render_html(path, plan, stats, [f'<img src="plot:{i}">' for i in range(len(plots))]),
+                          [svg for _, svg in plots])
+                result['pdf'] = str(pdf_path)
+            except RuntimeError as e:   # без QGuiApplication (фоновый процесс стенда) — только HTML
+                result['pdf_error'] = str(e)
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+
+def _fmt(value, digits=4):
+    if value is None or value != value:
+        return '—'
+    return f'{value:.{digits}g}'.replace('.', ',')
+
+
+def _duration(seconds):
+    return f'{seconds:.1f} с'.replace('.', ',') if seconds < 60 else format_duration(seconds)
+
+
+def _ticks(low, high, count=5):
+    if not high > low:
+        return [low]
+    step = 10 ** math.floor(math.log10((high - low) / count))
+    for mult in (1, 2, 5, 10):
+        if (high - low) / (step * mult) <= count:
+            step *= mult
+            break
+    return [k * step for k in range(math.ceil(low / step), math.floor(high / step) + 1)]
+
+
+def svg_plot(x, low, high, title, width=900, height=170):
+    """Огибающая min/max по интервалам (прореженный график) в SVG; разрывы — по пустым интервалам."""
+    left, right, top, bottom = 60, 10, 18, 22
+    valid = ~(np.isnan(low) | np.isnan(high))
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'font-family="sans-serif" font-size="11">',
+             f'<text x="{left}" y="12">{html.escape(title)}</text>']
+    if valid.any():
+        x0, x1 = float(x[0]), float(x[-1])
+        y0, y1 = float(np.min(low[valid])), float(np.max(high[valid]))
+        if y1 <= y0:
+            y0, y1 = y0 - 1.0, y1 + 1.0
+        sx = (width - left - right) / (x1 - x0 if x1 > x0 else 1.0)
+        sy = (height - top - bottom) / (y1 - y0)
+
+        def px(v):
+            return left + (v - x0) * sx
+
+        def py(v):
+            return height - bottom - (v - y0) * sy
+
+        for v in _ticks(y0, y1):
+            parts.append(f'<line x1="{left}" x2="{width - right}" y1="{py(v):.1f}" y2="{py(v):.1f}" stroke="#ddd"/>'
+                         f'<text x="{left - 4}" y="{py(v) + 4:.1f}" text-anchor="end">{_fmt(v)}</text>')
+        for v in _ticks(x0, x1, 8):
+            parts.append(f'<text x="{px(v):.1f}" y="{height - 6}" text-anchor="middle">{_fmt(v)}</text>')
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], valid.astype(np.int8), [0]])))
+        for a, b in zip(edges[::2], edges[1::2]):
+            upper = ' '.join(f'{px(xv):.1f},{py(yv):.1f}' for xv, yv in zip(x[a:b], high[a:b]))
+            lower = ' '.join(f'{px(xv):.1f},{py(yv):.1f}' for xv, yv in zip(x[a:b][::-1], low[a:b][::-1]))
+            parts.append(f'<polygon points="{upper} {lower}" fill="#4a78b5" stroke="#2b4c7e" stroke-width="0.6"/>')
+        parts.append(f'<rect x="{left}" y="{top}" width="{width - left - right}" height="{height - top - bottom}" '
+                     f'fill="none" stroke="#888"/>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def _titles(columns):
+    titles = {key: name for name, key in header_map().items()}
+    return {c: titles.get(c, c) for c in columns}
+
+
+def _labels(columns):
+    """Короткие подписи колонок для таблиц: имя канала и единицы."""
+    registry = ChannelRegistry.from_config()
+    out = {}
+    for c in columns:
+        channel = registry.by_name.get(c[:-len('_raw')] if c.endswith('_raw') else c)
+        out[c] = f'{c}, {channel.units}' if channel is not None and channel.units else c
+    return out
+
+
+def overview_plots(plan, stats: SessionStats):
+    """[(колонка, SVG)] прореженных графиков каналов по времени."""
+    columns = plan['columns']
+    titles = _titles(columns)
+    edges = np.linspace(plan['t0'], plan['t1'], plan['points'] + 1)
+    x = (edges[:-1] + edges[1:]) / 2
+    return [(c, svg_plot(x, stats.ov_min[:, i], stats.ov_max[:, i], f"{titles[c]} — время, с"))
+            for i, c in enumerate(columns) if c not in SERVICE_COLUMNS]
+
+
+def _table(head, rows):
+    out = ['<table>']
+    if head:
+        out.append('<tr>' + ''.join(f'<th>{html.escape(str(h))}</th>' for h in head) + '</tr>')
+    for row in rows:
+        out.append('<tr>' + ''.join(f'<td>{html.escape(str(v))}</td>' for v in row) + '</tr>')
+    out.append('</table>')
+    return '\n'.join(out)
+
+
+def render_html(path, plan, stats: SessionStats, plots):
+    """HTML отчёта; plots — разметка графиков по порядку каналов (SVG или ссылки на картинки)."""
+    columns = plan['columns']
+    titles = _labels(columns)
+    channels = [(i, c) for i, c in enumerate(columns) if c not in SERVICE_COLUMNS]
+    meta = plan['meta']
+    duration = (stats.last_time or 0.0) - (stats.first_time or 0.0)
+    summary = [('Файл', str(path)), ('Сохранён', saved_time(Path(path))), ('Стенд', meta.get('rig') or '—'),
+               ('Причина окончания', meta.get('reason') or '—'), ('Строк', stats.rows),
+               ('Длительность', _duration(duration))]
+    if 'N' in columns:
+        n = columns.index('N')
+        cycles = stats.max[n] - stats.min[n]
+        summary.append(('Наработка', f'{format_cycles(cycles)} ({_fmt(stats.min[n], 9)} … {_fmt(stats.max[n], 9)})'))
+        if duration > 0:
+            summary.append(('Средняя частота, Гц', _fmt(cycles / duration)))
+
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8">',
+             f'<title>Отчёт: {html.escape(Path(path).name)}</title>',
+             '<style>body{font-family:sans-serif;font-size:13px;margin:20px}'
+             'table{border-collapse:collapse;margin:6px 0 16px}'
+             'td,th{border:1px solid #bbb;padding:2px 8px;text-align:right}'
+             'th{background:#eee}td:first-child{text-align:left}</style></head><body>',
+             f'<h1>Отчёт по испытанию {html.escape(Path(path).name)}</h1>',
+             _table(None, summary)]
+    if plan['params']:
+        parts += ['<h2>Параметры испытания</h2>', _table(['Параметр', 'Значение'], plan['params'].items())]
+
+    head = ['Канал', 'min', 'max', 'среднее', 'СКО'] + [f'P{q * 100:g}' for q in QUANTILES] + ['отсчётов']
+    rows = []
+    for i, c in channels:
+        item = stats.channel(i)
+        rows.append([titles[c]] + [_fmt(item[key], 6) for key in ('min', 'max', 'mean', 'std')]
+                    + [_fmt(q, 6) for q in item['quantiles']] + [item['count']])
+    parts += ['<h2>Каналы</h2>', _table(head, rows),
+              f'<p>min, max, среднее и СКО — точные; квантили — с относительной погрешностью '
+              f'{_fmt(SKETCH_ALPHA * 100)} %.</p>']
+
+    if plan['thresholds']:
+        rows = []
+        for k, (channel, op, limit, spec) in enumerate(plan['thresholds']):
+            share = stats.above_s[k] / duration * 100 if duration > 0 else math.nan
+            rows.append([f'{titles.get(channel, channel)} {op} {_fmt(limit)}', spec, _duration(stats.above_s[k]),
+                         _fmt(share, 3), int(stats.above_rows[k])])
+        parts += ['<h2>Время за порогами</h2>',
+                  _table(['Условие', 'Правило', 'Время', '% сессии', 'отсчётов'], rows)]
+
+    axis = plan['phase_name']
+    edges = np.linspace(plan['phase_low'], plan['phase_high'], plan['phases'] + 1)
+    head = ['Фаза', 'N от' if axis == 'N' else 't от, с', 'N до' if axis == 'N' else 't до, с']
+    head += [f'{titles[c]}: среднее / max' for _, c in channels if c != axis]
+    rows = []
+    for p in range(plan['phases']):
+        row = [p + 1, _fmt(edges[p], 9), _fmt(edges[p + 1], 9)]
+        for i, c in channels:
+            if c == axis:
+                continue
+            count = stats.phase_count[p, i]
+            mean = stats.phase_sum[p, i] / count if count else math.nan
+            row.append(f'{_fmt(mean)} / {_fmt(stats.phase_max[p, i])}')
+        rows.append(row)
+    parts += ['<h2>Фазы по наработке</h2>' if axis == 'N' else '<h2>Фазы по времени</h2>', _table(head, rows)]
+
+    parts.append('<h2>Обзор</h2>')
+    parts += [f'<div>{plot}</div>' for plot in plots]
+    parts.append(f'<p>Огибающая min/max по {plan["points"]} интервалам времени.</p></body></html>')
+    return '\n'.join(parts)
+
+
+def write_pdf(path, text, svgs):
+    """
+    PDF из HTML отчёта через Qt (QTextDocument -> QPdfWriter); графики — картинки
+    plot:<номер>, отрисованные из SVG. Нужен созданный QGuiApplication.
+    """
+    from PySide6.QtCore import QUrl, QByteArray, QSizeF
+    from PySide6.QtGui import QGuiApplication, QTextDocument, QPdfWriter, QPageSize, QImage, QPainter
+    from PySide6.QtSvg import QSvgRenderer
+    if QGuiApplication.instance() is None:
+        raise RuntimeError('PDF строится только в процессе с QGuiApplication')
+    doc = QTextDocument()
+    for i, svg in enumerate(svgs):
+        renderer = QSvgRenderer(QByteArray(svg.encode('utf-8')))
+        size = renderer.defaultSize()
+        image = QImage(size.width() * 2, size.height() * 2, QImage.Format_ARGB32)
+        image.fill(0xFFFFFFFF)
+        painter = QPainter(image)
+        renderer.render(painter)
+        painter.end()
+        doc.addResource(QTextDocument.ImageResource, QUrl(f'plot:{i}'), image)
+    doc.setHtml(text.replace('<img src="plot:', '<img width="640" src="plot:'))
+    writer = QPdfWriter(str(path))
+    writer.setPageSize(QPageSize(QPageSize.A4))
+    writer.setResolution(96)
+    doc.setPageSize(QSizeF(writer.width(), writer.height()))
+    doc.print_(writer)
@@ -0,0 +1,341 @@
+import os
+import sys
+import json
+import time
+import signal
+from collections import deque
+from pathlib import Path
+from PySide6.QtCore import QObject, QThread, QTimer, QCoreApplication
+from src.utils import read_conf, get_filepath
+from src.ModbusClient import Client
+from src.Worker import Worker
+from src.DataSaver import DataSaver
+from src.Metrics import METRICS
+from src.StatusWord import StatusBits
+from src.Profile import Program, TEST_LIMITS
+from src.Catalog import parse_conditions
+
+CHANNELS = ('N', 'P', 'M', 'T', 'f', 'L')   # колонки сводной панели стендов
+DAEMON_FILE = 'daemon.json'
+
+
+class RigCore(QObject):
+    """
+    Сбор и запись одного стенда без виджетов: Client, Worker в своём потоке и DataSaver.
+    Обработка отсчёта та же, что в MainWindow.on_data_ready: частота по регрессии,
+    фильтры, запись. Данные для графиков идут через SharedRing DataSaver'а.
+    Конфигурация (app.cfg, modbus_adr.cfg, offsets.param, multiplier.json) читается
+    из текущей папки — у каждого стенда своя. control_port > 0 — открыть управляющий
+    сокет (см. command); None — взять control_port из app.cfg.
+    """
+    def __init__(self, name=None, plc=None, control_port=None):
+        super().__init__()
+        self.config = read_conf('app.cfg')
+        self.config['viewer_process'] = '1'   # кольцо в разделяемой памяти нужно для окон графиков
+        self.name = name or self.config['name']
+        self.offsets = read_conf('offsets.param', float)
+        self.time_offset = 0
+
+        self.datasaver = DataSaver(self)
+        if plc is None:
+            plc = Client(self.config['host'], port=int(self.config.get('port', 502)),
+                         backoff_max=float(self.config.get('reconnect_max', 2.0)))
+        self.plc = plc
+        interval = 0 if getattr(self.plc, 'paced', False) else int(self.config['ask_int'])
+        self.thread = QThread()
+        self.worker = Worker(self.plc, interval, self)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run)
+        self.worker.data_ready.connect(self.on_data_ready)
+        self.worker.error.connect(self.on_error)
+        self.worker.link_changed.connect(self.on_link_changed)
+        self.worker.tripped.connect(self.on_tripped)
+        self.worker.tripped.connect(self.datasaver.worker.on_tripped)
+        self.worker.stat_changed.connect(self.on_stat_changed)
+        self.worker.profile_changed.connect(self.on_profile)
+        self.worker.parameters_ready.connect(self.datasaver.set_pid)
+        self.datasaver.report_ready.connect(self.on_report)
+
+        self.last = {}
+        self.stat_bits = StatusBits.from_config(self.config)
+        self.stat = None
+        self.profile = None
+        self.report = None   # итог последнего отчёта (DataSaver.make_report)
+        self.errors = deque(maxlen=20)
+        self.online = True
+        self.recording = True   # после команды stop хвост при закрытии уходит в temp.csv, как в GUI
+        self._rate = deque(maxlen=2)   # (время, число отсчётов) для оценки темпа
+
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.dump_metrics)
+        metrics_interval = float(self.config.get('metrics_interval', 60))
+        if metrics_interval > 0:
+            self.metrics_timer.start(int(metrics_interval * 1000))
+
+        if control_port is None:
+            control_port = int(self.config.get('control_port', 0))
+        self.control = None
+        if control_port:
+            from src.Control import ControlServer
+            host = self.config.get('control_host', '127.0.0.1')
+            self.control = ControlServer(self, control_port, host).start()
+
+    def start(self):
+        self.recording = True
+        self.thread.start()
+        self.datasaver.start_session()
+        self.worker.enqueue_cmd('get_PID')   # PID попадает в описание сохраняемых сессий
+
+    def on_data_ready(self, data, rel_time):
+        if not data:
+            return
+        rel_time = data.pop('rel_time', rel_time)
+        self.last = {k: data.get(k) for k in self.datasaver.channels.names}
+        self.datasaver.add_to_matrix(data, round(rel_time, 1))
+
+    def on_stat_changed(self, value, transitions):
+        self.stat = value
+
+    def on_profile(self, status):
+        """Состояние программы нагружения; записанные ею уставки сохраняются в test_parameters.param."""
+        self.profile = status
+        merged = self.read_test_parameters()
+        changed = {key: f'{value:g}' for key, value in status['setpoints'].items()
+                   if key in merged and merged[key] != f'{value:g}'}
+        if changed:
+            merged.update(changed)
+            self.write_test_parameters(merged)
+
+    def on_report(self, result):
+        self.report = result
+        if 'error' in result:
+            self.on_error(f"отчёт {result['path']}: {result['error']}")
+
+    def on_error(self, msg):
+        self.errors.append((time.strftime('%H:%M:%S'), msg))
+
+    def on_tripped(self, info):
+        """Сработала защита (ПЛК уже остановлен потоком опроса): запись до срабатывания — в файл stop."""
+        self.on_error(info['text'])
+        if info['action'] != 'log' and self.recording:
+            self.recording = False
+            self.save('stop', info['text'])
+
+    def on_link_changed(self, info):
+        self.online = info['online']
+        if info['online']:
+            self.datasaver.log_events([(info['time'] / 1000.0, 'outage_end', info['seq_from'], info['seq_to'],
+                                        info['seq_to'] - info['seq_from'] + 1, None)])
+        else:
+            self.on_error(info['message'])
+            self.datasaver.log_events([(info['time'] / 1000.0, 'outage_start', info['seq'], None, None, None)])
+
+    def status(self) -> dict:
+        """Краткое состояние для панели стендов."""
+        now = time.monotonic()
+        count = self.datasaver.count
+        if not self._rate or now - self._rate[-1][0] >= 0.5:   # частые запросы не сбивают оценку
+            self._rate.append((now, count))
+        (t0, c0), (t1, c1) = self._rate[0], (now, count)
+        return {'name': self.name, 'pid': os.getpid(), 'online': self.online,
+                'ring': self.datasaver.ring.name if self.datasaver.ring is not None else None,
+                'values': dict(self.last), 'stat': self.stat_bits.decode(self.stat), 'count': count,
+                'rate': (c1 - c0) / (t1 - t0) if t1 > t0 else 0.0,
+                'sequence': self.datasaver.sequence_counters(),
+                'trend': self.datasaver.trend_forecast(self.length_limit()),
+                'profile': self.profile,
+                'report': self.report,
+                'error': self.errors[-1] if self.errors else None}
+
+    def length_limit(self):
+        try:
+            return float(str(self.read_test_parameters().get('L_lim', 0)).replace(',', '.'))
+        except ValueError:
+            return 0.0
+
+    def dump_metrics(self):
+        try:
+            METRICS.dump(self.config['result_path'])
+        except OSError:
+            pass
+
+    def read_test_parameters(self):
+        if os.path.isfile('test_parameters.param'):
+            return read_conf('test_parameters.param')
+        return {key: '0' for key in TEST_LIMITS}
+
+    def send_params(self, params=None):
+        """Обновить параметры испытания (проверка диапазонов), сохранить и отправить в ПЛК."""
+        merged = self.read_test_parameters()
+        for key, value in (params or {}).items():
+            if key not in TEST_LIMITS:
+                raise ValueError(f'неизвестный параметр: {key}')
+            low, high = TEST_LIMITS[key]
+            if not low <= float(str(value).replace(',', '.')) <= high:
+                raise ValueError(f'{key}={value} вне диапазона [{low}, {high}]')
+            merged[key] = str(value)
+        self.write_test_parameters(merged)
+        self.worker.enqueue_cmd('send_params', dict(merged), self.offsets)
+        return merged
+
+    @staticmethod
+    def write_test_parameters(params):
+        with open('test_parameters.param', 'w') as file:
+            for key in params:
+                file.write(f'{key} {params[key]}\n')
+
+    def save(self, action, reason=None, report=True):
+        """Сшить запись в results/<дата>/<время>-action.csv; по файлу stop — отчёт (report=False — без него)."""
+        path = get_filepath(self.config['result_path'], action)
+        self.datasaver.save_data(path, reason, report=report and action == 'stop')
+        return str(path)
+
+    def command(self, name, args):
+        """
+        Команды управляющего сокета (та же последовательность, что у кнопок TestBar):
+            status, start, stop, load [params], unload, rotate [params], stop_rotate,
+            reset, send_params params, save, capture, shutdown,
+            profile {"path": файл} или {"program": {...}} — запустить программу нагружения,
+            profile_stop,
+            catalog {"params": {...}, "since": ..., "until": ..., "text": ..., "limit": N} — поиск
+            в каталоге сессий (см. Catalog.find),
+            report {"path": файл} — отчёт по сохранённому файлу в фоне (итог — в status()['report']).
+        """
+        params = args.get('params')
+        if name == 'status':
+            return self.status()
+        elif name == 'send_params':
+            return self.send_params(params)
+        elif name == 'start':
+            self.worker.enqueue_cmd('reset_time')
+            path = self.save('start')
+            self.datasaver.start_session()
+            self.worker.enqueue_cmd('reset')
+            self.recording = True
+            return path
+        elif name == 'stop':
+            self.worker.enqueue_cmd('stop_rotate')
+            self.worker.enqueue_cmd('unload')
+            self.worker.enqueue_cmd('stop_all')
+            self.recording = False
+            return self.save('stop', 'команда stop')
+        elif name == 'load':
+            self.send_params(params)
+            path = self.command('start', {})
+            self.worker.enqueue_cmd('load')
+            return path
+        elif name == 'rotate':
+            self.send_params(params)
+            self.worker.enqueue_cmd('rotate')
+        elif name in ('unload', 'stop_rotate', 'reset'):
+            self.worker.enqueue_cmd(name)
+        elif name == 'save':
+            path = self.save('')
+            self.datasaver.start_session()
+            return path
+        elif name == 'profile':
+            if args.get('program') is not None:
+                program = Program.from_dict(args['program'])
+            else:
+                program = Program.load(args['path'])
+            self.worker.enqueue_cmd('profile_start', program)
+            return {'name': program.name, 'steps': len(program)}
+        elif name == 'profile_stop':
+            self.worker.enqueue_cmd('profile_stop')
+        elif name == 'catalog':
+            query = {key: args[key] for key in ('since', 'until', 'text', 'channel_max', 'limit') if key in args}
+            params = {key: tuple(value) if isinstance(value, list) else parse_conditions(f'{key}={value}')[key]
+                      for key, value in (params or {}).items()}
+            return self.datasaver.catalog.find(params=params, **query)
+        elif name == 'report':
+            if not os.path.isfile(args.get('path', '')):
+                raise ValueError(f"нет файла: {args.get('path')}")
+            self.datasaver.make_report(args['path'])
+            return {'started': args['path']}
+        elif name == 'capture':
+            self.datasaver.capture('control', 'захват по команде')
+        elif name == 'shutdown':
+            QTimer.singleShot(0, QCoreApplication.instance().quit)
+        else:
+            raise ValueError(f'неизвестная команда: {name}')
+        return None
+
+    def close(self, save=True):
+        """Остановить стенд, дописать и сшить запись."""
+        if self.control is not None:
+            self.control.close()
+        self.metrics_timer.stop()
+        self.worker.enqueue_cmd('stop_all')
+        time.sleep(2 * self.worker.interval + 0.1)
+        self.worker.stop()
+        self.thread.quit()
+        self.thread.wait()
+        if save and self.recording:
+            self.save('stop', 'закрытие', report=False)
+        elif save:
+            self.datasaver.save_data('temp.csv', 'закрытие')
+        self.datasaver.close()
+        self.dump_metrics()
+
+
+def run_rig(name, rig_dir, status_queue, stop_event, status_ms=500):
+    """
+    Процесс одного стенда (свой интерпретатор и GIL): сбор и запись без GUI,
+    состояние раз в status_ms отправляется в status_queue, остановка — по stop_event.
+    """
+    os.chdir(rig_dir)
+    app = QCoreApplication([])
+    core = RigCore(name)
+    core.start()
+
+    def tick():
+        if stop_event.is_set():
+            timer.stop()
+            core.close()
+            app.quit()
+            return
+        try:
+            status_queue.put_nowait(core.status())
+        except Exception:
+            pass   # панель не успевает читать — пропускаем обновление
+
+    timer = QTimer()
+    timer.timeout.connect(tick)
+    timer.start(int(status_ms))
+    return app.exec()
+
+
+def run_headless(rig_dir='.'):
+    """
+    Сбор и запись без GUI в папке стенда rig_dir. Управление — через сокет
+    (control_port из app.cfg, по умолчанию 5100), данные для окон — через SharedRing.
+    Адрес сокета и имя кольца записываются в daemon.json, к ним подключается
+    main.py --attach. Запись не зависит от подключённых окон; остановка — командой
+    shutdown или сигналом SIGINT/SIGTERM.
+    """
+    from src.hw import check_lic
+    os.chdir(rig_dir)
+    lic = check_lic()
+    if not lic:
+        print('Версия не зарегистрирована', file=sys.stderr)
+        return 1
+
+    app = QCoreApplication(sys.argv[:1])
+    config = read_conf('app.cfg')
+    core = RigCore(control_port=int(config.get('control_port', 0)) or 5100)
+    core.start()
+    info = {'name': core.name, 'pid': os.getpid(), 'port': core.control.port,
+            'ring': core.datasaver.ring.name, 'started': time.strftime('%d.%m.%Y %H:%M:%S')}
+    Path(DAEMON_FILE).write_text(json.dumps(info, ensure_ascii=False), encoding='utf-8')
+
+    # сигналы обрабатываются интерпретатором — таймер даёт ему управление
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: QTimer.singleShot(0, app.quit))
+    heartbeat = QTimer()
+    heartbeat.timeout.connect(lambda: None)
+    heartbeat.start(250)
+
+    code = app.exec()
+    core.close()
+    Path(DAEMON_FILE).unlink(missing_ok=True)
+    return code
@@ -0,0 +1,75 @@
+class SequenceMonitor:
+    """
+    Контроль непрерывности потока отсчётов по номеру `seq` и плановому времени
+    `sched` (мс от начала опроса). Каждый отсчёт проверяется на:
+        gap       — пропущены номера (опрос не состоялся или не успел в свой слот);
+        duplicate — номер не больше уже принятого;
+        late      — отсчёт пришёл позже плана более чем на late_ms; подряд идущие
+                    опоздания сливаются в одно событие (с, по, количество, максимум).
+    check() возвращает список завершённых событий (пустой для нормального отсчёта),
+    flush() — незакрытую серию опозданий.
+    """
+    def __init__(self, late_ms=100.0):
+        self.late_ms = float(late_ms)
+        self.reset()
+
+    def reset(self):
+        self.last_seq = None
+        self.first_seq = None
+        self.received = 0
+        self.gaps = 0
+        self.missing = 0
+        self.duplicates = 0
+        self.late = 0
+        self.max_late_ms = 0.0
+        self._late_run = None   # [t, seq_from, seq_to, count, max_late]
+
+    def check(self, seq, sched, arrival_ms):
+        """seq, sched — из отсчёта; arrival_ms — когда отсчёт получен, в той же шкале, что sched."""
+        if seq is None:
+            return []
+        t = float(arrival_ms) / 1000.0
+        events = []
+        if self.last_seq is not None and seq <= self.last_seq:
+            self.duplicates += 1
+            return [(t, 'duplicate', seq, seq, 1, None)]
+
+        self.received += 1
+        if self.first_seq is None:
+            self.first_seq = seq
+        elif seq > self.last_seq + 1:
+            missed = seq - self.last_seq - 1
+            self.gaps += 1
+            self.missing += missed
+            events.extend(self.flush())   # серия опозданий прерывается разрывом
+            events.append((t, 'gap', self.last_seq + 1, seq - 1, missed, None))
+        self.last_seq = seq
+
+        late = None if sched is None else float(arrival_ms) - float(sched)
+        if late is not None and late > self.max_late_ms:
+            self.max_late_ms = late
+        run = self._late_run
+        if late is not None and late > self.late_ms:
+            self.late += 1
+            if run is not None and seq == run[2] + 1:
+                run[2] = seq
+                run[3] += 1
+                run[4] = max(run[4], late)
+            else:
+                events.extend(self.flush())
+                self._late_run = [t, seq, seq, 1, late]
+        elif run is not None:
+            events.extend(self.flush())
+        return events
+
+    def flush(self):
+        run, self._late_run = self._late_run, None
+        if run is None:
+            return []
+        t, seq_from, seq_to, count, late = run
+        return [(t, 'late', seq_from, seq_to, count, round(late, 2))]
+
+    def counters(self):
+        return {'received': self.received, 'first_seq': self.first_seq, 'last_seq': self.last_seq,
+                'gaps': self.gaps, 'missing': self.missing, 'duplicates': self.duplicates,
+                'late': self.late, 'max_late_ms': round(self.max_late_ms, 2)}
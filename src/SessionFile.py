@@ -0,0 +1,163 @@
+import io
+import numpy as np
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from src.Channels import ChannelRegistry
+
+SUMMARY_BINS = 64
+SUMMARY_FANOUT = 16   # блоков уровня в одной сводке следующего, более грубого уровня
+INDEX_AXES = ('time', 'N')   # столбцы, монотонные в пределах сессии
+RAW_SUFFIX = ' (без фильтра)'   # заголовок нефильтрованной копии канала
+# Служебные колонки файла захваченного события (см. Capture.EventCapture)
+EXTRA_AXES = {'seq': 'Номер отсчёта', 'stat': 'Состояние'}
+
+
+def header_map():
+    """Русские заголовки файла -> внутренние имена колонок (с нефильтрованными копиями `<канал>_raw`)."""
+    axis = ChannelRegistry.from_config().axis()
+    axis.update({name + RAW_SUFFIX: key + '_raw' for name, key in axis.items()})
+    axis.update({name: key for key, name in EXTRA_AXES.items()})
+    return axis
+
+
+def read_header(path):
+    """Возвращает внутренние имена колонок и смещение первой строки данных (строки '#' в начале — описание)."""
+    offset = 0
+    with open(path, 'rb') as f:
+        line = f.readline()
+        while line.startswith(b'#'):
+            offset += len(line)
+            line = f.readline()
+    names = line.decode('utf-8').rstrip('\r\n').split('\t')
+    axis = header_map()
+    return [axis.get(name, name) for name in names], offset + len(line)
+
+
+def parse_rows(raw: bytes, columns) -> dict:
+    """Разбирает кусок TSV (без заголовка) в словарь numpy-массивов."""
+    if not raw.strip():
+        return {c: np.array([], dtype=np.float64) for c in columns}
+    import pandas as pd
+    df = pd.read_csv(io.BytesIO(raw), sep='\t', decimal=',', header=None, names=columns)
+    return {c: df[c].to_numpy(dtype=np.float64) for c in columns}
+
+
+def summarize_block(arrays: dict, bins=SUMMARY_BINS) -> dict:
+    """min/max каждого столбца по `bins` равным интервалам блока (NaN игнорируются)."""
+    n = len(arrays['time'])
+    bins = max(min(bins, n), 1)
+    starts = np.linspace(0, n, bins + 1).astype(int)[:-1]
+    summary = {}
+    for key, arr in arrays.items():
+        arr = np.asarray(arr, dtype=np.float64)
+        summary[key] = (np.fmin.reduceat(arr, starts).astype(np.float32),
+                        np.fmax.reduceat(arr, starts).astype(np.float32))
+    return summary
+
+
+def make_block(path, offset, size, arrays: dict, generation: int = 0) -> dict:
+    """
+    Описание блока строк файла сессии: где лежит на диске, диапазоны индексных
+    осей и сводка min/max для отрисовки на крупном масштабе. generation отличает
+    блоки разных сессий, записанные в тот же файл по тем же смещениям.
+    """
+    rows = len(arrays['time'])
+    block = {'path': Path(path), 'offset': int(offset), 'size': int(size), 'rows': rows,
+             'columns': list(arrays.keys()), 'range': {}, 'summary': None, 'generation': int(generation)}
+    if rows == 0:
+        return block
+    for key in INDEX_AXES:
+        if key in arrays:
+            arr = np.asarray(arrays[key], dtype=np.float64)
+            block['range'][key] = (float(np.nanmin(arr)), float(np.nanmax(arr)))
+    block['summary'] = summarize_block(arrays)
+    return block
+
+
+def read_block(block: dict) -> dict:
+    """Читает строки блока с диска."""
+    with open(block['path'], 'rb') as f:
+        f.seek(block['offset'])
+        raw = f.read(block['size'])
+    return parse_rows(raw, block['columns'])
+
+
+def merge_blocks(blocks, bins=SUMMARY_BINS) -> dict:
+    """
+    Сводка более грубого уровня по нескольким соседним блокам: диапазоны индексных
+    осей объединяются, min/max столбцов сводятся к `bins` интервалам. С диска не
+    читается, поэтому без path/offset.
+    """
+    keys = blocks[0]['summary'].keys()
+    n = sum(len(b['summary'][next(iter(keys))][0]) for b in blocks)
+    starts = np.linspace(0, n, min(bins, n) + 1).astype(int)[:-1]
+    summary = {}
+    for key in keys:
+        low = np.concatenate([b['summary'][key][0] for b in blocks])
+        high = np.concatenate([b['summary'][key][1] for b in blocks])
+        summary[key] = (np.fmin.reduceat(low, starts), np.fmax.reduceat(high, starts))
+    ranges = {key: (min(b['range'][key][0] for b in blocks), max(b['range'][key][1] for b in blocks))
+              for key in blocks[0]['range']}
+    return {'rows': sum(b['rows'] for b in blocks), 'range': ranges, 'summary': summary}
+
+
+class BlockIndex:
+    """
+    Индекс непустых блоков сессии с пирамидой сводок: на уровне 0 — сами блоки, на
+    уровне k — сводка каждых SUMMARY_FANOUT записей уровня k-1. Списки только
+    дописываются (поток записи), читатель берёт snapshot() — длины уровней на момент
+    запроса, так что запрос истории стоит O(ширины окна), а не O(длины сессии).
+    """
+    def __init__(self, levels=None, fanout=SUMMARY_FANOUT):
+        self.fanout = max(int(fanout), 2)
+        self.levels = levels if levels is not None else [[]]
+
+    @property
+    def blocks(self):
+        return self.levels[0]
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def append(self, block):
+        if not block['rows']:
+            return
+        self.levels[0].append(block)
+        level = 0
+        while len(self.levels[level]) % self.fanout == 0:
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            self.levels[level + 1].append(merge_blocks(self.levels[level][-self.fanout:]))
+            level += 1
+
+    def snapshot(self):
+        """Уровни и их длины на текущий момент (дописанное позже читатель не видит)."""
+        return [(entries, len(entries)) for entries in self.levels]
+
+    @staticmethod
+    def cover(snapshot, level, fanout=SUMMARY_FANOUT):
+        """
+        Непрерывное покрытие всей сессии записями уровня `level` и, для ещё не
+        сведённого конца, более мелких уровней: список (записи, начало, конец).
+        """
+        level = min(level, len(snapshot) - 1)
+        segments, covered = [], 0
+        for lvl in range(level, -1, -1):
+            entries, n = snapshot[lvl]
+            first = covered // fanout ** lvl
+            if first < n:
+                segments.append((entries, first, n))
+            covered = n * fanout ** lvl
+        return segments
+
+    @staticmethod
+    def visible(segments, key, x0=None, x1=None):
+        """Записи покрытия, пересекающие [x0, x1] по индексной оси key (по возрастанию)."""
+        out = []
+        for entries, lo, hi in segments:
+            if x0 is not None:
+                lo = bisect_left(entries, x0, lo, hi, key=lambda b: b['range'][key][1])
+            if x1 is not None:
+                hi = bisect_right(entries, x1, lo, hi, key=lambda b: b['range'][key][0])
+            out.extend(entries[lo:hi])
+        return out
@@ -1,6 +1,13 @@
-from PySide6.QtWidgets import QDialog, QVBoxLayout,QHBoxLayout, QLabel, QPushButton, QCheckBox, QLineEdit, QGridLayout, QToolButton, QWidget
-from PySide6.QtCore import Qt, QTimer 
+from PySide6.QtWidgets import QDialog, QVBoxLayout,QHBoxLayout, QLabel, QPushButton, QCheckBox, QLineEdit, QGridLayout, QToolButton, QWidget, QTableWidget, QTableWidgetItem, QHeaderView, QComboBox, QFileDialog
+from PySide6.QtCore import Qt, QTimer, Signal
 from PySide6.QtGui import QCursor
+from src.Metrics import METRICS
+from src.Capture import read_index
+from src.Viewer import launch_replay
+from src.Catalog import Catalog, parse_conditions
+from pathlib import Path
+import threading
+import time
 
 
 def get_parameters(plc):
@@ -36,7 +43,13 @@ class PID_button(QWidget):
         self.setLayout(main_layout)
         self._settings_window = None
         self.setMaximumWidth(50)
-        self.fill_PID()
+
+        # Кэш параметров: заполняется асинхронно, перечитывается только после записи в ПЛК
+        self.P = self.I = self.D = self.SUP = self.T2F = ''
+        self.params_time = None
+        self.main_window.worker.parameters_ready.connect(self.fill_PID)
+        self.main_window.worker.command_failed.connect(self.on_command_failed)
+        self.request_PID()
 
     def _open_settings(self):
         if self._settings_window is None:
@@ -46,13 +59,28 @@ class PID_button(QWidget):
         self._settings_window.activateWindow()
         self.send_parameters = self._settings_window.send_parameters
 
-    def fill_PID(self):
-        P, I, D, SUP, T2F = get_parameters(self.plc)
+    def request_PID(self):
+        """
+        Запросить параметры у ПЛК, не блокируя GUI. Клиент ПЛК читает только поток опроса:
+        до его запуска (лицензия ещё проверяется) команда ждёт в очереди.
+        """
+        self.main_window.worker.enqueue_cmd('get_PID')
+
+    def fill_PID(self, data: dict):
+        P, I, D, SUP, T2F = (data.get('P_', ''), data.get('I_', ''), str(data.get('D_', '')),
+                             data.get('SUP', ''), data.get('T2F', ''))
         self.P = P
         self.I = I
         self.D = D
         self.SUP = SUP
         self.T2F = T2F
+        self.params_time = time.time()
+        if self._settings_window is not None:
+            self._settings_window.fill_parameters()
+
+    def on_command_failed(self, name, message):
+        if name == 'send_PID' and self._settings_window is not None:
+            self._settings_window.status_lbl.setText(f'Параметры не записаны. {message}')
 
 
 class SettingsWindow(QDialog):
@@ -69,6 +97,7 @@ class SettingsWindow(QDialog):
         param_layout.setVerticalSpacing(20)
         warning_lbl = QLabel("Изменение параметров нагружения может привести к повреждению оборудования.")
         warning_lbl.setStyleSheet("color: red; font-weight: bold;")
+        self.status_lbl = QLabel()
         self.accept = QCheckBox("Я понимаю риски и принимаю ответственность за изменения параметров.")
         
         for i, widget in enumerate(['', 'P', 'I', 'D', 'SUP', 'T2F']):
@@ -93,6 +122,7 @@ class SettingsWindow(QDialog):
             param_layout.addWidget(widget, 2, i+1)
 
         main_layout.addLayout(param_layout)
+        main_layout.addWidget(self.status_lbl)
         main_layout.addSpacing(100)
         main_layout.addWidget(warning_lbl)
         main_layout.addSpacing(20)
@@ -101,6 +131,27 @@ class SettingsWindow(QDialog):
 
         btn_close = QPushButton("Закрыть")
         self.btn_send = QPushButton("Отправить")
+        btn_diag = QPushButton("Диагностика")
+        btn_diag.clicked.connect(self.open_diagnostics)
+        self._diagnostics = None
+        btns_layout.addWidget(btn_diag)
+        btn_rainflow = QPushButton("Rainflow")
+        btn_rainflow.clicked.connect(self.open_rainflow)
+        self._rainflow = None
+        btns_layout.addWidget(btn_rainflow)
+        btn_events = QPushButton("События")
+        btn_events.clicked.connect(self.open_events)
+        self._events = None
+        btns_layout.addWidget(btn_events)
+        btn_catalog = QPushButton("Каталог")
+        btn_catalog.clicked.connect(self.open_catalog)
+        self._catalog = None
+        btns_layout.addWidget(btn_catalog)
+        btn_report = QPushButton("Отчёт...")
+        btn_report.setToolTip("Отчёт по сохранённому файлу сессии (HTML рядом с файлом)")
+        btn_report.clicked.connect(self.open_report)
+        btns_layout.addWidget(btn_report)
+        btns_layout.addStretch()
         btns_layout.addWidget(self.btn_send)
         btns_layout.addWidget(btn_close)
         btn_close.clicked.connect(self.close)
@@ -113,7 +164,10 @@ class SettingsWindow(QDialog):
 
     def send_callback(self):
         if self.main_window.checked:
-            self.main_window.worker.enqueue_cmd('send_PID')
+            values = [float(w.text()) for w in [self.P_in, self.I_in, self.D_in, self.SUP_in, self.T2F_in]]
+            self.parent.params_time = None
+            self.status_lbl.setText('Запись параметров...')
+            self.main_window.worker.enqueue_cmd('send_PID', *values)
         else:
             self.send_parameters()
 
@@ -131,6 +185,7 @@ class SettingsWindow(QDialog):
         self.parent.D = D
         self.parent.SUP = SUP
         self.parent.T2F = T2F
+        self.parent.params_time = time.time()
 
         self.fill_parameters()
 
@@ -141,7 +196,43 @@ class SettingsWindow(QDialog):
         self.D_in.setText(str(self.parent.D))
         self.SUP_in.setText(str(self.parent.SUP))
         self.T2F_in.setText(str(self.parent.T2F))
+        if self.parent.params_time is None:
+            self.status_lbl.setText('Ожидание ответа ПЛК...')
+        else:
+            self.status_lbl.setText('Прочитано из ПЛК: ' +
+                                    time.strftime('%H:%M:%S', time.localtime(self.parent.params_time)))
+
+
+    def open_diagnostics(self):
+        if self._diagnostics is None:
+            self._diagnostics = DiagnosticsWindow(self)
+        self._diagnostics.show()
+        self._diagnostics.raise_()
+
+    def open_rainflow(self):
+        if self._rainflow is None:
+            self._rainflow = RainflowWindow(self.main_window.datasaver, self)
+        self._rainflow.show()
+        self._rainflow.raise_()
+
+    def open_events(self):
+        if self._events is None:
+            self._events = EventsWindow(self.main_window.config.get('result_path', 'results'), self)
+        self._events.show()
+        self._events.raise_()
 
+    def open_catalog(self):
+        if self._catalog is None:
+            self._catalog = CatalogWindow(Catalog.from_config(self.main_window.config), self)
+        self._catalog.show()
+        self._catalog.raise_()
+
+    def open_report(self):
+        path, _ = QFileDialog.getOpenFileName(self, 'Отчёт по файлу сессии',
+                                              self.main_window.config.get('result_path', 'results'),
+                                              'Файл сессии (*.csv)')
+        if path:
+            self.main_window.datasaver.make_report(path, open_report=True)
 
     def accept_changed(self, state):
         for widget in [self.P_in, self.I_in, self.D_in, self.SUP_in, self.T2F_in]:
@@ -153,4 +244,336 @@ class SettingsWindow(QDialog):
         if self.accept.isChecked():
             self.btn_send.setEnabled(True)
         else:
-            self.btn_send.setEnabled(False)
\ No newline at end of file
+            self.btn_send.setEnabled(False)
+
+
+class DiagnosticsWindow(QDialog):
+    """Таблица метрик горячего пути, обновляется раз в секунду, пока окно открыто."""
+    NAMES = {
+        'modbus_read': 'Чтение Modbus',
+        'decode': 'Декодирование',
+        'cmd_queue': 'Очередь команд',
+        'cmd_wait': 'Ожидание команды',
+        'cmd_exec': 'Выполнение команды',
+        'signal_lag': 'Доставка отсчёта в GUI',
+        'on_data_ready': 'Обработка отсчёта в GUI',
+        'filters': 'Фильтры',
+        'saver_append': 'Добавление в DataSaver',
+        'saver_flush': 'Сброс батча',
+        'chunk_write': 'Запись чанка',
+        'chunk_bytes': 'Записано в чанки',
+        'poll_errors': 'Ошибки опроса',
+        'seq_gaps': 'Разрывы последовательности',
+        'seq_missing': 'Пропущено отсчётов',
+        'seq_duplicates': 'Повторы отсчётов',
+        'seq_late': 'Опоздавшие отсчёты',
+        'plc_outages': 'Обрывы связи с ПЛК',
+        'cmd_held': 'Команды, удержанные без связи',
+        'cmd_rejected': 'Команды, отклонённые без связи',
+        'stream_clients': 'Клиенты трансляции',
+        'stream_encode': 'Кодирование кадров трансляции',
+        'stream_dropped': 'Выброшено кадров трансляции',
+        'capture_triggers': 'Срабатывания захвата',
+        'capture_write': 'Запись захваченного события',
+        'watchdog': 'Проверка правил защиты',
+        'watchdog_reaction': 'Реакция защиты',
+        'watchdog_trips': 'Срабатывания защиты',
+        'cmd_discarded': 'Команды, отменённые защитой',
+        'profile': 'Шаг программы нагружения',
+        'profile_writes': 'Уставки, записанные программой',
+        'profile_requests': 'Запросы записи уставок',
+        'profile_overshoot': 'Перескок границы шага (цикл/с)',
+        'catalog_errors': 'Ошибки записи в каталог сессий',
+        'report': 'Построение отчёта',
+        'report_errors': 'Ошибки построения отчёта',
+        'save_errors': 'Ошибки сшивки файла',
+    }
+    COLUMNS = ['Метрика', 'Ед.', 'Событий', 'Последнее', 'Среднее', 'p95', 'Макс. (окно)', 'Макс.']
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Диагностика")
+        self.setModal(False)
+        self.resize(700, 420)
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        btns_layout = QHBoxLayout()
+        self.btn_reset = QPushButton("Сбросить")
+        self.btn_reset.clicked.connect(self.reset)
+        btn_close = QPushButton("Закрыть")
+        btn_close.clicked.connect(self.close)
+        btns_layout.addWidget(self.btn_reset)
+        btns_layout.addStretch()
+        btns_layout.addWidget(btn_close)
+        layout.addLayout(btns_layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def reset(self):
+        METRICS.reset()
+        self.refresh()
+
+    def refresh(self):
+        snapshot = METRICS.snapshot()
+        self.table.setRowCount(len(snapshot))
+        for row, (name, s) in enumerate(snapshot.items()):
+            title = self.NAMES.get(name, name)
+            if s['kind'] == 'bytes':
+                title += f" (всего {s['total'] / 1024:.1f} КБ)"
+            elif s['kind'] == 'count':
+                title += f" (всего {s['total']:.0f})"
+            values = [title, METRICS.UNITS[s['kind']], s['count'], s['last'], s['mean'], s['p95'],
+                      s['recent_max'], s['max']]
+            for col, value in enumerate(values):
+                if isinstance(value, float):
+                    value = f'{value:.3f}'
+                self.table.setItem(row, col, QTableWidgetItem('' if value is None else str(value)))
+
+
+class RainflowWindow(QDialog):
+    """Матрица rainflow с последнего сохранения: строки — размах, столбцы — среднее, в ячейках — циклы."""
+    def __init__(self, datasaver, parent=None):
+        super().__init__(parent)
+        self.datasaver = datasaver
+        self.setWindowTitle("Rainflow")
+        self.setModal(False)
+        self.resize(800, 500)
+        layout = QVBoxLayout(self)
+        top = QHBoxLayout()
+        self.channel = QComboBox()
+        self.channel.addItems(list(datasaver.worker.rainflow.counters))
+        self.channel.currentTextChanged.connect(self.refresh)
+        self.total = QLabel()
+        top.addWidget(QLabel("Канал"))
+        top.addWidget(self.channel)
+        top.addStretch()
+        top.addWidget(self.total)
+        layout.addLayout(top)
+        self.table = QTableWidget(0, 0)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(2000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        counter = self.datasaver.worker.rainflow.counters.get(self.channel.currentText())
+        if counter is None:
+            return
+        matrix = counter.matrix()
+        ranges = sorted({r for r, _ in matrix}, reverse=True)
+        means = sorted({m for _, m in matrix})
+        self.table.setRowCount(len(ranges))
+        self.table.setColumnCount(len(means))
+        self.table.setVerticalHeaderLabels([f'{r:g}' for r in ranges])
+        self.table.setHorizontalHeaderLabels([f'{m:g}' for m in means])
+        rows = {r: i for i, r in enumerate(ranges)}
+        cols = {m: i for i, m in enumerate(means)}
+        self.table.clearContents()
+        for (r, m), n in matrix.items():
+            self.table.setItem(rows[r], cols[m], QTableWidgetItem(f'{n:g}'))
+        self.total.setText(f"Циклов: {sum(matrix.values()):g} (размах по строкам, среднее по столбцам)")
+
+
+class EventsWindow(QDialog):
+    """Индекс захваченных событий (results/events.tsv), новые сверху; двойной щелчок — воспроизвести."""
+    COLUMNS = ['Дата', 'Время', 'Событие', 'Значение', 'Номер отсчёта', 'До', 'После']
+    LIMIT = 500
+
+    def __init__(self, base_dir, parent=None):
+        super().__init__(parent)
+        self.base_dir = Path(base_dir)
+        self.setWindowTitle("События")
+        self.setModal(False)
+        self.resize(800, 420)
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.cellDoubleClicked.connect(lambda row, _: self.replay(row))
+        layout.addWidget(self.table)
+        btns = QHBoxLayout()
+        btn_replay = QPushButton("Воспроизвести")
+        btn_replay.clicked.connect(lambda: self.replay(self.table.currentRow()))
+        btn_close = QPushButton("Закрыть")
+        btn_close.clicked.connect(self.close)
+        btns.addWidget(btn_replay)
+        btns.addStretch()
+        btns.addWidget(btn_close)
+        layout.addLayout(btns)
+        self.rows = []
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(5000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        self.rows = read_index(self.base_dir, self.LIMIT)
+        self.table.setRowCount(len(self.rows))
+        for row, item in enumerate(self.rows):
+            for col, key in enumerate(self.COLUMNS):
+                self.table.setItem(row, col, QTableWidgetItem(item.get(key, '')))
+
+    def replay(self, row):
+        if 0 <= row < len(self.rows):
+            launch_replay(self.base_dir / self.rows[row]['Файл'])
+
+
+class CatalogWindow(QDialog):
+    """
+    Каталог сессий: отбор по дате, тексту (путь, причина, стенд), параметрам испытания
+    и максимумам каналов; двойной щелчок — воспроизвести. «Обновить каталог» досканирует
+    папку результатов в фоне (новые и изменившиеся файлы).
+    """
+    COLUMNS = ['Сохранено', 'Файл', 'Причина', 'Длительность, с', 'Циклов', 'P_tar', 'f_tar',
+               'P max', 'M max', 'T max', 'L max']
+    LIMIT = 1000
+    progress = Signal(int, int)
+    rebuilt = Signal(object)
+
+    def __init__(self, catalog: Catalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.setWindowTitle("Каталог сессий")
+        self.setModal(False)
+        self.resize(1000, 500)
+        layout = QVBoxLayout(self)
+
+        filters = QGridLayout()
+        self.since = QLineEdit()
+        self.since.setPlaceholderText('ГГГГ-ММ-ДД')
+        self.until = QLineEdit()
+        self.until.setPlaceholderText('ГГГГ-ММ-ДД')
+        self.text = QLineEdit()
+        self.text.setPlaceholderText('путь, причина, стенд')
+        self.params = QLineEdit()
+        self.params.setPlaceholderText('P_tar=15 f_tar=4..6')
+        self.channels = QLineEdit()
+        self.channels.setPlaceholderText('T=..80 M=10..')
+        for col, (label, widget) in enumerate([('С', self.since), ('По', self.until), ('Текст', self.text)]):
+            filters.addWidget(QLabel(label), 0, 2 * col)
+            filters.addWidget(widget, 0, 2 * col + 1)
+        filters.addWidget(QLabel('Параметры'), 1, 0)
+        filters.addWidget(self.params, 1, 1, 1, 3)
+        filters.addWidget(QLabel('Максимум канала'), 1, 4)
+        filters.addWidget(self.channels, 1, 5)
+        layout.addLayout(filters)
+        for widget in (self.since, self.until, self.text, self.params, self.channels):
+            widget.returnPressed.connect(self.refresh)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.cellDoubleClicked.connect(lambda row, _: self.replay(row))
+        layout.addWidget(self.table)
+        self.status_lbl = QLabel()
+        layout.addWidget(self.status_lbl)
+
+        btns = QHBoxLayout()
+        btn_find = QPushButton("Найти")
+        btn_find.clicked.connect(self.refresh)
+        self.btn_rebuild = QPushButton("Обновить каталог")
+        self.btn_rebuild.clicked.connect(self.rebuild)
+        btn_replay = QPushButton("Воспроизвести")
+        btn_replay.clicked.connect(lambda: self.replay(self.table.currentRow()))
+        btn_close = QPushButton("Закрыть")
+        btn_close.clicked.connect(self.close)
+        for btn in (btn_find, self.btn_rebuild, btn_replay):
+            btns.addWidget(btn)
+        btns.addStretch()
+        btns.addWidget(btn_close)
+        layout.addLayout(btns)
+        self.rows = []
+        self.progress.connect(lambda done, total: self.status_lbl.setText(f'Сканирование: {done} из {total}'))
+        self.rebuilt.connect(self.on_rebuilt)
+
+    def showEvent(self, event):
+        self.refresh()
+        super().showEvent(event)
+
+    def refresh(self):
+        try:
+            start = time.perf_counter()
+            self.rows = self.catalog.find(self.since.text().strip() or None, self.until.text().strip() or None,
+                                          self.text.text().strip() or None, parse_conditions(self.params.text()),
+                                          parse_conditions(self.channels.text()), self.LIMIT)
+            elapsed = (time.perf_counter() - start) * 1000.0
+        except Exception as e:
+            self.status_lbl.setText(f'Ошибка запроса: {e}')
+            return
+        self.status_lbl.setText(f'Найдено: {len(self.rows)}' + (' (показаны первые)' if len(self.rows) >= self.LIMIT
+                                                                 else '') + f', {elapsed:.0f} мс')
+        self.table.setRowCount(len(self.rows))
+        for row, item in enumerate(self.rows):
+            channels = item['channels']
+            values = [item['saved'], item['path'].name, item['reason'], item['duration'], item['cycles'],
+                      item['params'].get('P_tar'), item['params'].get('f_tar')]
+            values += [channels.get(c, {}).get('max') for c in ('P', 'M', 'T', 'L')]
+            for col, value in enumerate(values):
+                if isinstance(value, float):
+                    value = f'{value:.6g}'.replace('.', ',')
+                self.table.setItem(row, col, QTableWidgetItem('' if value is None else str(value)))
+
+    def rebuild(self):
+        self.btn_rebuild.setEnabled(False)
+        self.status_lbl.setText('Сканирование папки результатов...')
+
+        def run():
+            try:
+                self.rebuilt.emit(self.catalog.rebuild(progress=self.progress.emit))
+            except Exception as e:
+                self.rebuilt.emit({'error': str(e)})
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_rebuilt(self, summary):
+        self.btn_rebuild.setEnabled(True)
+        if 'error' in summary:
+            self.status_lbl.setText(f"Ошибка сканирования: {summary['error']}")
+            return
+        self.refresh()
+        self.status_lbl.setText(f"Файлов: {summary['files']}, просканировано: {summary['scanned']}, "
+                                f"без изменений: {summary['skipped']}, удалено: {summary['removed']}, "
+                                f"ошибок: {len(summary['errors'])}")
+
+    def replay(self, row):
+        if 0 <= row < len(self.rows):
+            launch_replay(self.rows[row]['path'])
@@ -0,0 +1,121 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+HEADER_SLOTS = 8
+# Слоты заголовка (int64); NAMES — длина списка имён каналов в байтах (UTF-8, через запятую)
+SEQ, CAPACITY, CHANNELS, OPEN_GRAPH, OPEN_SPECTRUM, CLOSED, NAMES = range(7)
+
+
+def _names_area(size):
+    """Место под имена каналов: данные начинаются с границы 8 байт."""
+    return (int(size) + 7) // 8 * 8
+
+
+def _attach(name, untrack=True):
+    shm = shared_memory.SharedMemory(name=name, create=False)
+    if not untrack:
+        return shm
+    try:
+        # Python < 3.13 регистрирует чужой сегмент в resource_tracker и удаляет его при выходе
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+class SharedRing:
+    """
+    Кольцевой буфер отсчётов в разделяемой памяти для процесса-просмотрщика.
+    Один писатель, любое число читателей; синхронизация только счётчиком seq:
+    писатель сначала пишет строку, затем увеличивает seq. Читатель после копирования
+    перечитывает seq и отбрасывает строки, которые успели перезаписать.
+    """
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        size = int(self.header[NAMES])
+        names = bytes(shm.buf[HEADER_SLOTS * 8:HEADER_SLOTS * 8 + size])
+        self.channels = names.decode('utf-8').split(',')
+        if len(self.channels) != int(self.header[CHANNELS]):
+            raise ValueError(f'Кольцо {shm.name}: {len(self.channels)} имён каналов '
+                             f'при {int(self.header[CHANNELS])} в заголовке')
+        self.capacity = int(self.header[CAPACITY])
+        self.data = np.ndarray((self.capacity, len(self.channels)), dtype=np.float64,
+                               buffer=shm.buf, offset=HEADER_SLOTS * 8 + _names_area(size))
+
+    @classmethod
+    def create(cls, channels, capacity=65536, name=None):
+        channels = list(channels)
+        if any(',' in c for c in channels):
+            raise ValueError(f'Имя канала с запятой не передаётся через кольцо: {channels}')
+        names = ','.join(channels).encode('utf-8')
+        size = HEADER_SLOTS * 8 + _names_area(len(names)) + int(capacity) * len(channels) * 8
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[CAPACITY] = int(capacity)
+        header[CHANNELS] = len(channels)
+        header[NAMES] = len(names)
+        shm.buf[HEADER_SLOTS * 8:HEADER_SLOTS * 8 + len(names)] = names
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, untrack=True):
+        """
+        Подключиться к кольцу другого процесса. untrack=False — если процесс-владелец
+        порождён этим же процессом (spawn) и делит с ним resource_tracker.
+        """
+        return cls(_attach(name, untrack))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def seq(self):
+        return int(self.header[SEQ])
+
+    def write(self, row: dict):
+        seq = int(self.header[SEQ])
+        self.data[seq % self.capacity] = [row.get(c, np.nan) for c in self.channels]
+        self.header[SEQ] = seq + 1
+
+    def read_since(self, since: int):
+        """Строки, записанные после `since` (не более ёмкости буфера), и новая отметка."""
+        end = int(self.header[SEQ])
+        start = max(since, end - self.capacity)
+        if end <= start:
+            return {c: np.array([], dtype=np.float64) for c in self.channels}, end
+        idx = np.arange(start, end) % self.capacity
+        block = self.data[idx]
+        # строки, перезаписанные писателем во время копирования, отбрасываем; строку seq
+        # писатель пишет до увеличения счётчика, поэтому её ячейка (seq - capacity) тоже под записью
+        overwritten = int(self.header[SEQ]) + 1 - self.capacity - start
+        if overwritten > 0:
+            block = block[overwritten:]
+        return {c: block[:, i].copy() for i, c in enumerate(self.channels)}, end
+
+    def request(self, slot):
+        self.header[slot] += 1
+
+    def requests(self, slot):
+        return int(self.header[slot])
+
+    def mark_closed(self):
+        self.header[CLOSED] = 1
+
+    @property
+    def closed(self):
+        return bool(self.header[CLOSED])
+
+    def close(self):
+        self.header = None
+        self.data = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,224 @@
+import threading
+import numpy as np
+import pyqtgraph as pg
+from collections import deque
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QLabel, QSpinBox
+from PySide6.QtCore import QObject, QThread, QTimer, QRectF
+from src.Channels import ChannelRegistry
+from src.GraphBar import Graph
+
+
+class WelchEstimator:
+    """
+    Потоковая оценка спектральной плотности методом Уэлча:
+    окна Ханна с перекрытием, усреднение по последним `depth` сегментам,
+    история спектров — кольцевое изображение фиксированного размера.
+    """
+    def __init__(self, nperseg=256, overlap=0.5, depth=8, history=200):
+        self.nperseg = max(int(nperseg), 8)
+        self.step = max(int(self.nperseg * (1.0 - float(overlap))), 1)
+        self.depth = max(int(depth), 1)
+        self.window = np.hanning(self.nperseg)
+        self.win_norm = float(np.sum(self.window ** 2))
+        self.nfreq = self.nperseg // 2 + 1
+        self.buffer = np.empty(0, dtype=np.float64)
+        self.segments = deque(maxlen=self.depth)
+        self.psd_sum = np.zeros(self.nfreq)
+        self.ring = np.full((int(history), self.nfreq), np.nan, dtype=np.float32)
+        self.ring_idx = 0
+        self.fs = None
+
+    def feed(self, values, fs, max_segments=16):
+        """
+        Добавить блок отсчётов; обрабатывает не более max_segments сегментов за вызов.
+        Сегмент не проходит через пропуск (NaN): на пропуске накопленный буфер сбрасывается.
+        """
+        if fs and np.isfinite(fs):
+            self.fs = fs if self.fs is None else 0.9 * self.fs + 0.1 * fs
+        values = np.asarray(values, dtype=np.float64)
+        bad = np.flatnonzero(~np.isfinite(values))
+        # Куски между пропусками; каждый кроме первого начинается с пропуска
+        runs = np.split(values, bad) if bad.size else [values]
+
+        done = 0
+        for i, run in enumerate(runs):
+            if i:
+                self.buffer = np.empty(0, dtype=np.float64)
+                run = run[1:]
+            self.buffer = np.concatenate([self.buffer, run])
+            done += self._consume(max_segments - done)
+        return done
+
+    def _consume(self, max_segments):
+        # Ограничение нагрузки: лишний бэклог отбрасываем, оставляя свежие данные
+        limit = self.nperseg + self.step * max(max_segments, 0)
+        if self.buffer.size > limit:
+            self.buffer = self.buffer[-limit:]
+
+        done = 0
+        while self.buffer.size >= self.nperseg and done < max_segments and self.fs:
+            segment = self.buffer[:self.nperseg]
+            self._add_segment(segment)
+            self.buffer = self.buffer[self.step:]
+            done += 1
+        return done
+
+    def _add_segment(self, segment):
+        spec = np.fft.rfft((segment - segment.mean()) * self.window)
+        psd = (np.abs(spec) ** 2) / (self.fs * self.win_norm)
+        psd[1:-1] *= 2.0
+        if len(self.segments) == self.segments.maxlen:
+            self.psd_sum -= self.segments[0]
+        self.segments.append(psd)
+        self.psd_sum += psd
+
+        self.ring[self.ring_idx] = 10.0 * np.log10(psd + 1e-12)
+        self.ring_idx = (self.ring_idx + 1) % self.ring.shape[0]
+
+    def result(self):
+        """Частоты, усреднённая PSD и спектрограмма (старые сегменты слева)."""
+        if not self.segments or not self.fs:
+            return None
+        freqs = np.fft.rfftfreq(self.nperseg, 1.0 / self.fs)
+        psd = self.psd_sum / len(self.segments)
+        image = np.roll(self.ring, -self.ring_idx, axis=0)
+        return freqs, psd, image
+
+
+class SpectrumWorker(QObject):
+    """Работает в отдельном QThread: забирает новые отсчёты из DataSaver блоками и считает спектр."""
+    def __init__(self, datasaver, channel, nperseg, overlap, depth, history,
+                 interval_ms=200, max_segments=16):
+        super().__init__()
+        self.datasaver = datasaver
+        self.interval_ms = int(interval_ms)
+        self.max_segments = int(max_segments)
+        self._lock = threading.Lock()
+        self._running = True
+        self._result = None
+        self.configure(channel, nperseg, overlap, depth, history)
+
+    def configure(self, channel, nperseg, overlap, depth, history):
+        with self._lock:
+            self.channel = channel
+            self.estimator = WelchEstimator(nperseg, overlap, depth, history)
+            self._since = self.datasaver.count
+            self._result = None
+
+    def run(self):
+        """Запускается в отдельном QThread"""
+        while self._running:
+            self.step()
+            QThread.msleep(self.interval_ms)
+
+    def step(self):
+        with self._lock:
+            tail, self._since = self.datasaver.get_tail(['time', self.channel], self._since)
+            t = tail['time']
+            if t.size < 2:
+                return
+            dt = np.diff(t)
+            dt = dt[dt > 0]
+            fs = 1.0 / float(np.median(dt)) if dt.size else None
+            if self.estimator.feed(tail[self.channel], fs, self.max_segments):
+                self._result = self.estimator.result()
+
+    def result(self):
+        with self._lock:
+            return self._result
+
+    def stop(self):
+        self._running = False
+
+
+class SpectrumWindow(QWidget):
+    """Окно спектра и спектрограммы выбранного канала по потоку данных."""
+    def __init__(self, datasaver, config):
+        super().__init__()
+        self.datasaver = datasaver
+        self.config = config
+        self.axis = ChannelRegistry.from_config(config).axis()
+        self.setWindowTitle('Спектр')
+
+        self.spectrum = Graph(config)
+        self.spectrum.graphWidget.setLogMode(y=True)
+        self.spectrum.graphWidget.setLabel('bottom', 'Частота, Гц')
+        self.spectrum.graphWidget.setLabel('left', 'СПМ')
+
+        self.spectrogram = pg.PlotWidget()
+        self.spectrogram.setBackground('w')
+        self.spectrogram.setLabel('bottom', 'Сегмент')
+        self.spectrogram.setLabel('left', 'Частота, Гц')
+        self.image = pg.ImageItem()
+        self.image.setColorMap(pg.colormap.get('viridis'))
+        self.spectrogram.addItem(self.image)
+
+        self.channel = QComboBox()
+        for key, value in self.axis.items():
+            if value not in ('time', 'N'):
+                self.channel.addItem(key, value)
+        self.channel.setCurrentIndex(max(self.channel.findData(config.get('spectrum_channel', 'P')), 0))
+        self.nperseg = QSpinBox()
+        self.nperseg.setRange(16, 8192)
+        self.nperseg.setValue(int(config.get('spectrum_nperseg', 256)))
+        self.overlap = QSpinBox()
+        self.overlap.setRange(0, 90)
+        self.overlap.setSuffix(' %')
+        self.overlap.setValue(int(float(config.get('spectrum_overlap', 0.5)) * 100))
+        self.depth = QSpinBox()
+        self.depth.setRange(1, 256)
+        self.depth.setValue(int(config.get('spectrum_depth', 8)))
+        self.history = int(config.get('spectrum_history', 200))
+
+        controls = QHBoxLayout()
+        for label, widget in [('Канал:', self.channel), ('Окно:', self.nperseg),
+                              ('Перекрытие:', self.overlap), ('Усреднение:', self.depth)]:
+            controls.addWidget(QLabel(label))
+            controls.addWidget(widget)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.spectrum, 3)
+        layout.addWidget(self.spectrogram, 2)
+        layout.addLayout(controls)
+        self.setLayout(layout)
+
+        self.thread = QThread()
+        self.worker = SpectrumWorker(datasaver, *self._params(), interval_ms=200)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run)
+        self.thread.start()
+
+        self.channel.currentIndexChanged.connect(self.reconfigure)
+        self.nperseg.editingFinished.connect(self.reconfigure)
+        self.overlap.editingFinished.connect(self.reconfigure)
+        self.depth.editingFinished.connect(self.reconfigure)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_graph)
+        self.timer.start(500)
+        self.resize(600, 600)
+
+    def _params(self):
+        return (self.channel.currentData(), self.nperseg.value(), self.overlap.value() / 100.0,
+                self.depth.value(), self.history)
+
+    def reconfigure(self, *_):
+        self.worker.configure(*self._params())
+
+    def update_graph(self):
+        result = self.worker.result()
+        if result is None:
+            return
+        freqs, psd, image = result
+        self.spectrum.curve.setData(freqs[1:], psd[1:])
+        finite = image[np.isfinite(image)]
+        if finite.size:
+            self.image.setImage(np.nan_to_num(image, nan=float(finite.min())), autoLevels=True)
+            self.image.setRect(QRectF(0, 0, image.shape[0], float(freqs[-1])))
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        self.worker.stop()
+        self.thread.quit()
+        self.thread.wait()
+        event.accept()
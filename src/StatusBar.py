@@ -1,7 +1,8 @@
 from PySide6.QtWidgets import QWidget, QFrame, QLabel, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton
 from PySide6.QtGui import QIcon
 from src.utils import write_conf
-from PySide6.QtCore import Signal
+from PySide6.QtCore import Signal, QTimer
+from src.Trend import format_cycles, format_duration
 
 
 def round_str(val, dec=None):
@@ -112,13 +113,17 @@ class MaxMinParameter(ResettableParameter):
         self.max_val = float('-inf')
         self.min_val = float('inf')
 
-    def update_value(self, new_value):
+    def track(self, new_value):
+        """Учесть отсчёт в min/max без перерисовки (панель обновляется по таймеру)."""
         new_value = round(new_value, 3)
         if new_value > self.max_val:
             self.max_val = new_value
         if new_value < self.min_val:
             self.min_val = new_value
+        return new_value
 
+    def update_value(self, new_value):
+        new_value = self.track(new_value)
         self.value.setText(str(new_value - self.offsets[self.name])[:5])
         self.max_value.setText(str(self.max_val - self.offsets[self.name])[:5])
         self.min_value.setText(str(self.min_val - self.offsets[self.name])[:5])
@@ -131,40 +136,108 @@ class MaxMinParameter(ResettableParameter):
         self.min_value.clear()
 
 
+class Forecast(QWidget):
+    """Остаток до предела зазора L_lim по тренду L(N): циклы и время с границами."""
+    def __init__(self):
+        super().__init__()
+        frame = QFrame()
+        frame.setFrameShape(QFrame.Box)
+        frame.setLineWidth(2)
+        frame.setStyleSheet("background-color: white;")
+        self.cycles = QLabel('До L_lim: —')
+        self.time = QLabel('')
+        inner = QVBoxLayout(frame)
+        inner.addWidget(self.cycles)
+        inner.addWidget(self.time)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(frame)
+        self.setLayout(layout)
+        self.setMaximumHeight(80)
+
+    def update_value(self, forecast, limit):
+        if forecast is None or forecast['slope'] is None:
+            self.cycles.setText(f'До L_lim {limit:g} мм: мало данных')
+            self.time.setText('' if forecast is None else f"L ≈ {forecast['L']:.3f} мм, роста нет")
+            return
+        self.cycles.setText(f"До L_lim {limit:g} мм: {format_cycles(forecast['cycles'])} цикл. "
+                            f"[{format_cycles(forecast['cycles_low'])}; {format_cycles(forecast['cycles_high'])}]")
+        if forecast['seconds'] is None:
+            self.time.setText(f"L ≈ {forecast['L']:.3f} мм, стенд стоит")
+        else:
+            self.time.setText(f"≈ {format_duration(forecast['seconds'])} "
+                              f"[{format_duration(forecast['seconds_low'])}; {format_duration(forecast['seconds_high'])}]")
+
+
 class StatusBar(QWidget):
+    """
+    Панель текущих значений: поле на каждый канал реестра с display != none, в порядке
+    panel_channels. Отсчёт только запоминается (min/max учитываются сразу), поля
+    перерисовываются по таймеру раз в panel_interval мс — работа GUI на отсчёт не
+    растёт с числом каналов.
+    """
     offsets_changed = Signal()
+    # Смена нуля этих каналов сразу пересылает уставки ПЛК (M_max, L_lim)
+    SETPOINT_CHANNELS = ('M', 'L')
+
     def __init__(self, parent):
         super().__init__()
         self.main_window = parent
         self.offsets = parent.offsets
-        self.cycles = IncreasedParameter('N', 'циклов', dec=0)
-        self.force = ResettableParameter('P', 'кН', self.offsets, dec=2)
-        self.momentum = MaxMinParameter('M', 'Н∙м', self.offsets, dec=2)
-        self.length = ResettableParameter('L', 'мм', self.offsets, dec=3)
-        self.temp = Parameter('T', '°С', dec=1)
-        self.freq = Parameter('f', 'Гц', dec=1)
+        self.params = {}
         layout = QHBoxLayout()
-
-        layout.addWidget(self.cycles)
-        layout.addWidget(self.force)
-        layout.addWidget(self.momentum)
-        layout.addWidget(self.length)
-        layout.addWidget(self.temp)
-        layout.addWidget(self.freq)
+        for ch in parent.datasaver.channels.panel:
+            if ch.display == 'max':
+                widget = IncreasedParameter(ch.name, ch.units, dec=ch.display_decimals)
+            elif ch.display in ('offset', 'minmax'):
+                self.offsets.setdefault(ch.name, 0.0)
+                cls = MaxMinParameter if ch.display == 'minmax' else ResettableParameter
+                widget = cls(ch.name, ch.units, self.offsets, dec=ch.display_decimals)
+                if ch.name in self.SETPOINT_CHANNELS:
+                    widget.offset_changed.connect(lambda *_: self.offsets_changed.emit())
+            else:
+                widget = Parameter(ch.name, ch.units, dec=ch.display_decimals)
+            self.params[ch.name] = widget
+            layout.addWidget(widget)
+        self.trackers = [(name, w) for name, w in self.params.items() if isinstance(w, MaxMinParameter)]
+        self.latest = {}
+        self.forecast = Forecast()
+        layout.addWidget(self.forecast)
         self.setMaximumHeight(100)
         self.setLayout(layout)
-        self.momentum.offset_changed.connect(lambda *_: self.offsets_changed.emit())
-        self.length.offset_changed.connect(lambda *_: self.offsets_changed.emit())
+        self.panel_timer = QTimer(self)
+        self.panel_timer.timeout.connect(self.refresh)
+        self.panel_timer.start(int(parent.config.get('panel_interval', 100)))
+        self.forecast_timer = QTimer(self)
+        self.forecast_timer.timeout.connect(self.update_forecast)
+        self.forecast_timer.start(1000)
 
     def update_values(self, data):
-        self.cycles.update_value(data['N'])
-        self.force.update_value(data['P'])
-        self.momentum.update_value(data['M'])
-        self.length.update_value(data['L'])
-        self.freq.update_value(data['f'])
-        self.temp.update_value(data['T'])
+        self.latest = data
+        for name, widget in self.trackers:
+            value = data.get(name)
+            if value is not None:
+                widget.track(value)
+
+    def refresh(self):
+        data = self.latest
+        for name, widget in self.params.items():
+            value = data.get(name)
+            if value is not None:
+                widget.update_value(value)
+
+    def update_forecast(self):
+        try:
+            limit = float(self.main_window.settings_bar.length_lim().replace(',', '.'))
+        except (AttributeError, ValueError):
+            return
+        self.forecast.update_value(self.main_window.datasaver.trend_forecast(limit), limit)
 
     def reset(self):
-        self.momentum.reset_values()
-        self.cycles.reset()
+        self.latest = {}
+        for widget in self.params.values():
+            if isinstance(widget, MaxMinParameter):
+                widget.reset_values()
+            elif isinstance(widget, IncreasedParameter):
+                widget.reset()
 
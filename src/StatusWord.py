@@ -0,0 +1,114 @@
+WIDTH = 8   # битов в слове состояния Stat
+# Имена битов по умолчанию (stat_bits в app.cfg): нагрузка и пределы, отработанные ПЛК
+DEFAULT_BITS = 'loaded:0,T_limit:2,M_limit:5,N_limit:6'
+
+
+class StatusBits:
+    """
+    Имена битов слова состояния. stat_bits имя:бит,имя:бит,... дополняет и
+    переназначает DEFAULT_BITS; безымянные биты — bitK. Имена из DEFAULT_BITS
+    используются в коде (защита, подсветка пределов) и остаются псевдонимами своих
+    битов: overheat:2 переименовывает бит T_limit для журнала и панели, а T_limit:4
+    переносит его на другой бит.
+    """
+    def __init__(self, names: dict, aliases: dict = None):
+        self.names = {int(bit): name for bit, name in names.items()}
+        self.bits = {name: bit for bit, name in self.names.items()}
+        self.aliases = {name: int(bit) for name, bit in (aliases or {}).items()}
+
+    @staticmethod
+    def _parse(spec):
+        for item in str(spec).split(','):
+            if item.strip():
+                name, bit = item.strip().split(':')
+                yield name.strip(), int(bit)
+
+    @classmethod
+    def from_config(cls, config):
+        aliases = dict(cls._parse(DEFAULT_BITS))
+        names = {bit: name for name, bit in aliases.items()}
+        for name, bit in cls._parse(config.get('stat_bits', '')):
+            names = {b: n for b, n in names.items() if n != name}
+            names[bit] = name
+            if name in aliases:
+                aliases[name] = bit
+        return cls(names, aliases)
+
+    def name(self, bit):
+        return self.names.get(bit, f'bit{bit}')
+
+    def bit(self, key):
+        """Номер бита по имени или номеру (число, 'K', 'bitK')."""
+        if isinstance(key, int):
+            return key
+        if key in self.bits:
+            return self.bits[key]
+        if key in self.aliases:
+            return self.aliases[key]
+        key = key[3:] if key.startswith('bit') else key
+        if key.isdigit():
+            return int(key)
+        raise KeyError(f'неизвестный бит состояния: {key}')
+
+    def mask(self, keys):
+        value = 0
+        for key in keys:
+            value |= 1 << self.bit(key)
+        return value
+
+    def decode(self, value):
+        """{имя: bool} для всех битов слова."""
+        if value is None:
+            return {}
+        return {self.name(bit): bool(value >> bit & 1) for bit in range(WIDTH)}
+
+
+class StatusEvents:
+    """
+    Переходы битов слова состояния. update() на каждом отсчёте — одно сравнение
+    целых, пока слово не меняется; при изменении — переходы (бит, было, стало,
+    время, номер отсчёта) по каждому изменившемуся биту. Первое слово после
+    reset() даёт полный снимок: все биты с «было» = None.
+    """
+    def __init__(self):
+        self.value = None
+
+    def reset(self):
+        self.value = None
+
+    def update(self, value, t, seq):
+        prev = self.value
+        if value == prev or value is None:
+            return ()
+        self.value = value
+        if prev is None:
+            return [(bit, None, bool(value >> bit & 1), t, seq) for bit in range(WIDTH)]
+        changed = prev ^ value
+        transitions = []
+        while changed:
+            low = changed & -changed
+            transitions.append((low.bit_length() - 1, bool(prev & low), bool(value & low), t, seq))
+            changed ^= low
+        return transitions
+
+
+class StatusFeed:
+    """
+    Подписки на биты состояния в потоке GUI: subscribe(биты, callback) — callback
+    получает только переходы своих битов (в том числе начальный снимок).
+    dispatch() подключается к Worker.stat_changed.
+    """
+    def __init__(self, bits: StatusBits):
+        self.bits = bits
+        self.value = None
+        self._subscribers = []
+
+    def subscribe(self, keys, callback):
+        self._subscribers.append((self.bits.mask(keys), callback))
+
+    def dispatch(self, value, transitions):
+        self.value = value
+        for mask, callback in self._subscribers:
+            mine = [tr for tr in transitions if mask >> tr[0] & 1]
+            if mine:
+                callback(mine)
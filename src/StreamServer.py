@@ -0,0 +1,227 @@
+import json
+import time
+import socket
+import selectors
+import threading
+from collections import deque
+from src.Metrics import METRICS
+
+ENCODING = 'utf-8'
+CHANNELS = ('N', 'P', 'M', 'T', 'f', 'L')
+
+
+class _Subscriber:
+    """Клиент потока: подписка (каналы, прореживание) и ограниченная очередь кадров."""
+    def __init__(self, sock, addr, queue_frames):
+        self.sock = sock
+        self.addr = addr
+        self.inbox = b''
+        self.channels = None   # None — ещё не подписался
+        self.decimate = 1
+        self.frames = deque(maxlen=queue_frames)   # переполнение вытесняет самые старые кадры
+        self.out = b''   # кадр, отправленный не полностью
+        self.dropped = 0
+
+    @property
+    def key(self):
+        return (self.channels, self.decimate)
+
+    def subscribe(self, request, known=CHANNELS):
+        channels = request.get('channels') or list(known)
+        unknown = [c for c in channels if c not in known]
+        if unknown:
+            raise ValueError(f'неизвестные каналы: {", ".join(unknown)}')
+        self.channels = tuple(channels)
+        self.decimate = max(int(request.get('decimate', 1)), 1)
+
+    def queue(self, frame):
+        if len(self.frames) == self.frames.maxlen:
+            self.dropped += 1
+            METRICS.count('stream_dropped')
+        self.frames.append(frame)
+
+
+class StreamServer:
+    """
+    Трансляция обработанных отсчётов и битов состояния по TCP (строки JSON).
+
+    Клиент отправляет подписку {"channels": ["P", "M"], "decimate": 10} (можно
+    повторить для смены) и получает кадры раз в interval_ms:
+        {"seq": [...], "time": [...], "P": [...], "M": [...], "stat": [...]}
+    Без channels в подписке — все каналы стенда (параметр channels, по умолчанию CHANNELS).
+    stat — биты Stat в одном числе (бит i — Stat[i]); decimate=k — каждый k-й отсчёт
+    по общему номеру, так что выборка не зависит от границ кадров. Кадр кодируется
+    один раз на вид подписки, поэтому выброшенные кадры клиент замечает по разрыву seq.
+
+    push() вызывается в потоке записи и только добавляет строку в deque; всё остальное
+    (сборка блока, кодирование — один раз на вид подписки, рассылка) идёт в своём
+    потоке. Медленному клиенту не хватает места в очереди из queue_frames кадров —
+    старые кадры выбрасываются, сбор и другие клиенты этого не замечают.
+    """
+    def __init__(self, port, host='127.0.0.1', interval_ms=100, queue_frames=20, max_pending=100000,
+                 channels=CHANNELS):
+        self.channels = tuple(channels)
+        self.interval = float(interval_ms) / 1000.0
+        self.queue_frames = int(queue_frames)
+        self.pending = deque(maxlen=int(max_pending))
+        self.index = 0   # общий номер отсчёта для прореживания
+        self.subscribers = {}
+        self.selector = selectors.DefaultSelector()
+        self.listener = socket.create_server((host, int(port)))
+        self.listener.setblocking(False)
+        self.port = self.listener.getsockname()[1]
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self._running = True
+        self.thread = threading.Thread(target=self._loop, name='stream', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def push(self, seq, row, stat):
+        """Отсчёт из потока записи: row — словарь time/N/P/..., stat — биты состояния числом."""
+        if self.subscribers:
+            self.pending.append((seq, row, stat))
+
+    def close(self):
+        self._running = False
+        self.thread.join(2 * self.interval + 1.0)
+        for sub in list(self.subscribers.values()):
+            self._drop(sub)
+        self.selector.unregister(self.listener)
+        self.listener.close()
+        self.selector.close()
+
+    def _loop(self):
+        next_block = time.perf_counter() + self.interval
+        while self._running:
+            timeout = max(next_block - time.perf_counter(), 0.0)
+            for key, mask in self.selector.select(timeout):
+                if key.fileobj is self.listener:
+                    self._accept()
+                    continue
+                sub = key.data
+                if mask & selectors.EVENT_READ:
+                    self._read(sub)
+                if mask & selectors.EVENT_WRITE and sub.sock.fileno() != -1:
+                    self._write(sub)
+            if time.perf_counter() >= next_block:
+                next_block += self.interval
+                if next_block < time.perf_counter():
+                    next_block = time.perf_counter() + self.interval
+                self._broadcast()
+
+    def _accept(self):
+        try:
+            sock, addr = self.listener.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sub = _Subscriber(sock, addr, self.queue_frames)
+        self.subscribers[sock.fileno()] = sub
+        self.selector.register(sock, selectors.EVENT_READ, sub)
+        METRICS.gauge('stream_clients', len(self.subscribers))
+
+    def _drop(self, sub):
+        self.subscribers.pop(sub.sock.fileno(), None)
+        try:
+            self.selector.unregister(sub.sock)
+        except (KeyError, ValueError):
+            pass
+        sub.sock.close()
+        METRICS.gauge('stream_clients', len(self.subscribers))
+
+    def _read(self, sub):
+        try:
+            data = sub.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(sub)
+            return
+        sub.inbox += data
+        while b'\n' in sub.inbox:
+            line, sub.inbox = sub.inbox.split(b'\n', 1)
+            if not line.strip():
+                continue
+            try:
+                sub.subscribe(json.loads(line.decode(ENCODING)), self.channels)
+                sub.queue(self._encode({'subscribed': list(sub.channels), 'decimate': sub.decimate}))
+            except (ValueError, TypeError, AttributeError) as e:
+                sub.queue(self._encode({'error': str(e)}))
+        if len(sub.inbox) > 65536:
+            self._drop(sub)
+            return
+        self._want_write(sub)
+
+    def _want_write(self, sub):
+        events = selectors.EVENT_READ
+        if sub.out or sub.frames:
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(sub.sock, events, sub)
+
+    def _write(self, sub):
+        while True:
+            if not sub.out:
+                if not sub.frames:
+                    break
+                sub.out = sub.frames.popleft()
+            try:
+                sent = sub.sock.send(sub.out)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                self._drop(sub)
+                return
+            sub.out = sub.out[sent:]
+            if sub.out:
+                break
+        self._want_write(sub)
+
+    @staticmethod
+    def _encode(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode(ENCODING) + b'\n'
+
+    def _broadcast(self):
+        n = len(self.pending)
+        if not n:
+            return
+        start = time.perf_counter()
+        block = [self.pending.popleft() for _ in range(n)]
+        first = self.index
+        self.index += n
+
+        frames = {}
+        for sub in list(self.subscribers.values()):
+            if sub.channels is None:
+                continue
+            key = sub.key
+            if key not in frames:
+                frames[key] = self._frame(block, first, *key)
+            if frames[key] is not None:
+                sub.queue(frames[key])
+                self._want_write(sub)
+        METRICS.since('stream_encode', start)
+
+    def _frame(self, block, first, channels, decimate):
+        offset = (-first) % decimate
+        rows = block[offset::decimate]
+        if not rows:
+            return None
+        frame = {'seq': [r[0] for r in rows], 'time': [round(r[1]['time'], 3) for r in rows]}
+        for ch in channels:
+            frame[ch] = [None if v != v else v for v in (r[1].get(ch) for r in rows)]
+        frame['stat'] = [r[2] for r in rows]
+        return self._encode(frame)
+
+
+def subscribe(host='127.0.0.1', port=5200, channels=None, decimate=1, timeout=5.0):
+    """Простой клиент: подписаться и получать кадры (словари) по мере прихода."""
+    with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+        request = {'channels': list(channels or ()), 'decimate': int(decimate)}   # пусто — все каналы стенда
+        sock.sendall(json.dumps(request).encode(ENCODING) + b'\n')
+        for line in sock.makefile('rb'):
+            yield json.loads(line.decode(ENCODING))
@@ -0,0 +1,215 @@
+import sys
+import json
+import multiprocessing
+from pathlib import Path
+from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, QPushButton
+from PySide6.QtCore import QTimer
+from src.utils import read_conf
+from src.Rig import run_rig, CHANNELS, DAEMON_FILE
+from src.Control import send_command
+
+
+def read_rigs(path):
+    """Список стендов: строки `имя папка` (папка относительно файла списка)."""
+    path = Path(path)
+    return {name: (path.parent / rig_dir).resolve() for name, rig_dir in read_conf(path).items()}
+
+
+class Supervisor:
+    """
+    Запускает по процессу на стенд (spawn: свой интерпретатор и GIL, без GUI-модулей)
+    и собирает их состояние из общей очереди.
+    """
+    shares_tracker = True   # процессы стендов — наши дети, resource_tracker у нас общий
+
+    def __init__(self, rigs: dict):
+        self.rigs = dict(rigs)
+        self.ctx = multiprocessing.get_context('spawn')
+        self.status_queue = self.ctx.Queue(maxsize=max(16 * len(self.rigs), 16))
+        self.processes = {}
+        self.stop_events = {}
+        self.status = {name: None for name in self.rigs}
+
+    def start(self):
+        for name, rig_dir in self.rigs.items():
+            self.start_rig(name, rig_dir)
+
+    def start_rig(self, name, rig_dir):
+        stop_event = self.ctx.Event()
+        process = self.ctx.Process(target=run_rig, name=f'rig-{name}',
+                                   args=(name, str(rig_dir), self.status_queue, stop_event))
+        process.start()
+        self.processes[name] = process
+        self.stop_events[name] = stop_event
+
+    def alive(self, name):
+        process = self.processes.get(name)
+        return process is not None and process.is_alive()
+
+    def poll(self):
+        """Забрать все накопившиеся состояния; для каждого стенда остаётся последнее."""
+        while True:
+            try:
+                status = self.status_queue.get_nowait()
+            except Exception:
+                break
+            self.status[status['name']] = status
+        return self.status
+
+    def stop(self, timeout=15.0):
+        for event in self.stop_events.values():
+            event.set()
+        for name, process in self.processes.items():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.poll()
+
+
+class DaemonLink:
+    """
+    Подключение панели к уже запущенным фоновым процессам сбора (main.py --headless):
+    состояние запрашивается по управляющему сокету, адрес берётся из daemon.json
+    в папке стенда. Интерфейс как у Supervisor; stop() только отключает панель —
+    запись продолжается.
+    """
+    shares_tracker = False
+
+    def __init__(self, rig_dirs):
+        self.daemons = {}
+        for rig_dir in rig_dirs:
+            rig_dir = Path(rig_dir).resolve()
+            info = json.loads((rig_dir / DAEMON_FILE).read_text(encoding='utf-8'))
+            self.daemons[info['name']] = (rig_dir, info)
+        self.rigs = {name: rig_dir for name, (rig_dir, _) in self.daemons.items()}
+        self.status = {name: None for name in self.rigs}
+        self._alive = {name: True for name in self.rigs}
+
+    def start(self):
+        pass
+
+    def alive(self, name):
+        return self._alive.get(name, False)
+
+    def poll(self):
+        for name, (_, info) in self.daemons.items():
+            try:
+                self.status[name] = send_command('status', port=info['port'], timeout=0.5)
+                self._alive[name] = True
+            except (OSError, RuntimeError, ValueError):
+                self._alive[name] = False
+        return self.status
+
+    def stop(self, timeout=None):
+        pass
+
+
+class Dashboard(QWidget):
+    """Сводная панель стендов: связь, последние значения, темп, пропуски; графики — по кнопке."""
+    COLUMNS = ['Стенд', 'Связь', 'N', 'P', 'M', 'T', 'f', 'L', 'Отсч./с', 'Пропущено', 'Последняя ошибка', '']
+
+    def __init__(self, supervisor: Supervisor):
+        super().__init__()
+        self.supervisor = supervisor
+        self.setWindowTitle('Стенды')
+        self.sources = {}
+        self.windows = []
+
+        self.table = QTableWidget(len(supervisor.rigs), len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.rows = {}
+        for row, name in enumerate(supervisor.rigs):
+            self.rows[name] = row
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            btn = QPushButton('Графики')
+            btn.clicked.connect(lambda _=False, n=name: self.open_graph(n))
+            self.table.setCellWidget(row, len(self.COLUMNS) - 1, btn)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+        self.resize(900, 60 + 32 * len(supervisor.rigs))
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(500)
+
+    def _set(self, row, col, text):
+        item = self.table.item(row, col)
+        if item is None:
+            self.table.setItem(row, col, QTableWidgetItem(text))
+        elif item.text() != text:
+            item.setText(text)
+
+    def refresh(self):
+        for name, status in self.supervisor.poll().items():
+            row = self.rows[name]
+            if not self.supervisor.alive(name):
+                self._set(row, 1, 'процесс остановлен')
+                continue
+            if status is None:
+                self._set(row, 1, 'запуск...')
+                continue
+            self._set(row, 1, 'есть' if status['online'] else 'нет')
+            for col, key in enumerate(CHANNELS, start=2):
+                value = status['values'].get(key)
+                self._set(row, col, '' if value is None else f'{value:.3f}'.rstrip('0').rstrip('.'))
+            self._set(row, 8, f"{status['rate']:.0f}")
+            self._set(row, 9, str(status['sequence']['missing']))
+            error = status['error']
+            self._set(row, 10, f'{error[0]} {error[1]}' if error else '')
+
+    def open_graph(self, name):
+        """Окно графика стенда: данные читаются из его кольца в разделяемой памяти."""
+        from src.GraphBar import GraphWindow
+        from src.Viewer import RingSource
+        from src.SharedRing import SharedRing
+        status = self.supervisor.status.get(name)
+        if not status or not status.get('ring') or not self.supervisor.alive(name):
+            return
+        if name not in self.sources:
+            config = read_conf(self.supervisor.rigs[name] / 'app.cfg')
+            # процессы стендов делят resource_tracker с панелью — регистрацию не снимаем
+            ring = SharedRing.attach(status['ring'], untrack=not self.supervisor.shares_tracker)
+            self.sources[name] = (RingSource(ring, config), config)
+        source, config = self.sources[name]
+        win = GraphWindow(source, config)
+        win.setWindowTitle(f'{name} - график')
+        self.windows.append(win)
+        win.show()
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        for win in self.windows:
+            win.close()
+        for source, _ in self.sources.values():
+            source.timer.stop()
+        self.supervisor.stop()
+        event.accept()
+
+
+def run_supervisor(rigs_path='rigs.cfg'):
+    from src.hw import check_lic
+    app = QApplication(sys.argv[:1])
+    supervisor = Supervisor(read_rigs(rigs_path))
+    lic = check_lic()
+    dashboard = Dashboard(supervisor)
+    if lic:
+        supervisor.start()
+        dashboard.setWindowTitle(f'Стенды - {lic}')
+    else:
+        dashboard.setWindowTitle('Стенды - Версия не зарегистрирована')
+    dashboard.show()
+    return app.exec()
+
+
+def run_attach(*rig_dirs):
+    """Панель для фоновых процессов сбора, запущенных через main.py --headless."""
+    app = QApplication(sys.argv[:1])
+    dashboard = Dashboard(DaemonLink(rig_dirs or ['.']))
+    dashboard.setWindowTitle('Стенды (фоновый сбор)')
+    dashboard.show()
+    return app.exec()
@@ -1,7 +1,9 @@
-from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QMessageBox
+from PySide6.QtWidgets import (QWidget, QLabel, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QMessageBox,
+                               QFileDialog, QProgressBar)
 from PySide6.QtGui import QDoubleValidator
 from PySide6.QtGui import QIcon
 from src.utils import read_conf, get_file_path
+from src.Profile import Program
 import os
 
 
@@ -60,6 +62,9 @@ class TestBar(QWidget):
         self.m_max = Parameter('Верхний предел по моменту', 'Нм', self.test_params['M_max'], 50, -50)
         self.temp_lim = Parameter('Температура', '°С', self.test_params['T_max'], 1000)
         self.cycle_lim = Parameter('Значение наработки', 'цикл', self.test_params['N_max_lim'], 1e8)
+        self.fields = {'P_tar': self.force, 'f_tar': self.freq, 'P_rate_tar': self.force_rate,
+                       'L_lim': self.length_lim, 'T_max': self.temp_lim, 'N_max_lim': self.cycle_lim,
+                       'M_max': self.m_max}
         # Buttons
         self.loading_btn = QPushButton('Нагружение')
         self.loading_btn.clicked.connect(self.apply_load)
@@ -73,10 +78,29 @@ class TestBar(QWidget):
         self.save_button = QPushButton()
         self.save_button.setIcon(QIcon.fromTheme("document-save"))
         self.save_button.clicked.connect(self.save_file)
+        self.capture_button = QPushButton()
+        self.capture_button.setIcon(QIcon.fromTheme("camera-photo"))
+        self.capture_button.setToolTip('Захват события: запись вокруг текущего момента на полной частоте')
+        self.capture_button.clicked.connect(lambda: self.main_window.datasaver.capture())
+        # Программа нагружения: исполняет поток опроса, здесь — запуск и прогресс
+        self.profile_btn = QPushButton('Программа...')
+        self.profile_btn.setToolTip('Загрузить и запустить программу нагружения (JSON/YAML)')
+        self.profile_btn.clicked.connect(self.toggle_profile)
+        self.profile_label = QLabel()
+        self.profile_label.setWordWrap(True)
+        self.profile_label.setVisible(False)
+        self.profile_progress = QProgressBar()
+        self.profile_progress.setRange(0, 1000)
+        self.profile_progress.setTextVisible(False)
+        self.profile_progress.setMaximumHeight(8)
+        self.profile_progress.setVisible(False)
+        self.profile_running = False
 
         self.save_button.setMaximumWidth(50)
+        self.capture_button.setMaximumWidth(50)
         self.rotation_btn.setMaximumWidth(300)
         self.loading_btn.setMaximumWidth(300)
+        self.profile_btn.setMaximumWidth(300)
 
         data_layout = QHBoxLayout()
         container = QWidget()
@@ -87,6 +111,7 @@ class TestBar(QWidget):
         data_layout.addWidget(self.stop_btn, 2)
         data_layout.addWidget(self.clean_data, 2)
         data_layout.addWidget(self.save_button, 1)
+        data_layout.addWidget(self.capture_button, 1)
 
         layout = QVBoxLayout()
         layout.addWidget(self.force)
@@ -98,6 +123,9 @@ class TestBar(QWidget):
         layout.addWidget(self.cycle_lim)
         layout.addWidget(self.loading_btn)
         layout.addWidget(self.rotation_btn)
+        layout.addWidget(self.profile_btn)
+        layout.addWidget(self.profile_progress)
+        layout.addWidget(self.profile_label)
         layout.addWidget(container)
         layout.setSpacing(2)
         layout.setContentsMargins(0, 0, 0, 0)
@@ -119,20 +147,76 @@ class TestBar(QWidget):
             self.clean_data.setEnabled(False)
             self.stop_btn.setEnabled(False)
             self.save_button.setEnabled(False)
+            self.capture_button.setEnabled(False)
+            self.profile_btn.setEnabled(False)
 
-    def update(self, state):
-        if state[2]:
-            self.temp_lim.set_invalid()
-        else:
-            self.temp_lim.set_valid()
-        if state[5]:
-            self.m_max.set_invalid()
-        else:
-            self.m_max.set_valid()
-        if state[6]:
-            self.cycle_lim.set_invalid()
+    def lic_ok(self):
+        self.loading_btn.setEnabled(True)
+        self.profile_btn.setEnabled(True)
+        self.clean_data.setEnabled(True)
+        self.stop_btn.setEnabled(True)
+        self.save_button.setEnabled(True)
+        self.capture_button.setEnabled(True)
+
+    def on_limits(self, transitions):
+        """Изменились биты пределов ПЛК (T_limit, M_limit, N_limit): подсветить поле параметра."""
+        bits = self.main_window.stat_bits
+        fields = {bits.bit('T_limit'): self.temp_lim, bits.bit('M_limit'): self.m_max,
+                  bits.bit('N_limit'): self.cycle_lim}
+        for bit, _, value, _, _ in transitions:
+            if value:
+                fields[bit].set_invalid()
+            else:
+                fields[bit].set_valid()
+
+    def toggle_profile(self):
+        worker = self.main_window.worker
+        if self.profile_running:
+            worker.enqueue_cmd('profile_stop')
+            return
+        path, _ = QFileDialog.getOpenFileName(self, 'Программа нагружения', '',
+                                              'Программы (*.json *.yaml *.yml);;Все файлы (*.*)')
+        if not path:
+            return
+        try:
+            program = Program.load(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            QMessageBox.warning(self, 'Программа нагружения', f'Программа не загружена: {e}')
+            return
+        worker.enqueue_cmd('profile_start', program)
+        self.profile_running = True
+        self.profile_btn.setText('Остановить программу')
+        self.profile_label.setText(f'{program.name}: {len(program)} шагов, ожидание отсчёта')
+        self.profile_label.setVisible(True)
+        self.profile_progress.setValue(0)
+        self.profile_progress.setVisible(True)
+
+    def on_profile(self, status):
+        """Состояние программы из потока опроса: шаг, прогресс, следующий шаг; уставки — в поля."""
+        changed = False
+        for key, value in status['setpoints'].items():
+            text = f'{value:g}'.replace('.', ',')
+            if key in self.fields and self.fields[key]() != text:
+                self.fields[key].value.setText(text)
+                changed = True
+        if changed:
+            self.write_test_parametrs(self())
+
+        head = f"{status['name']}: шаг {status['index'] + 1}/{status['steps']}"
+        if status['state'] == 'running':
+            lines = [head, status['step']]
+            if status['length'] is not None:
+                lines.append(f"осталось {status['length'] - status['done']:.0f} {status['unit']}")
+            if status['next']:
+                lines.append(f"далее: {status['next']}")
+            self.profile_progress.setValue(int(status['progress'] * 1000))
         else:
-            self.cycle_lim.set_valid()
+            result = 'завершена' if status['state'] == 'done' else f"прервана ({status.get('reason', '')})"
+            lines = [f"{status['name']}: {result}, {status['cycles']} цикл за {status['elapsed']:.0f} с"]
+            self.profile_running = False
+            self.profile_btn.setText('Программа...')
+            self.profile_progress.setVisible(False)
+        self.profile_label.setText('\n'.join(lines))
 
     def apply_load(self):
         self.send_parameters()
@@ -178,8 +262,8 @@ class TestBar(QWidget):
         self.main_window.timer.start()
 
     def reset(self):
-        if self.main_window.datasaver.data:
-            self.main_window.datasaver.save_data('temp.csv')
+        if self.main_window.datasaver.count:
+            self.main_window.datasaver.save_data('temp.csv', 'сброс')
 
         self.main_window.datasaver.drop_data()
         self.stop()
@@ -216,4 +300,4 @@ class TestBar(QWidget):
     def save_file(self):
         path = get_file_path()
         if path:
-            self.main_window.datasaver.save_data(path)
\ No newline at end of file
+            self.main_window.datasaver.save_data(path, 'сохранение вручную')
\ No newline at end of file
@@ -0,0 +1,189 @@
+import math
+import threading
+
+SCALE_X = 1e4     # масштаб циклов в суммах, чтобы квадраты не теряли точность
+MIN_POINTS = 8    # меньше агрегатов — оценки нет
+
+
+class _Scale:
+    """
+    Взвешенная регрессия L(N) с экспоненциальным забыванием по циклам (горизонт horizon).
+    Суммы хранятся в координатах x = (N - N_текущее) / SCALE_X: при каждом новом агрегате
+    они сдвигаются к новому началу и затухают, поэтому свободный член — оценка L сейчас,
+    а память и время на обновление постоянны.
+    """
+    def __init__(self, horizon):
+        self.horizon = float(horizon)
+        self.s0 = self.sx = self.sxx = self.sy = self.sxy = self.syy = self.s2 = 0.0
+
+    def add(self, dx, y, w):
+        """Сдвинуть начало на dx (в единицах x), затухнуть и добавить точку (0, y) с весом w."""
+        decay = math.exp(-dx * SCALE_X / self.horizon)
+        s0, sx, sy = self.s0, self.sx, self.sy
+        # сдвиг начала координат: x' = x - dx
+        self.sxx = (self.sxx - 2.0 * dx * sx + dx * dx * s0) * decay
+        self.sxy = (self.sxy - dx * sy) * decay
+        self.sx = (sx - dx * s0) * decay
+        self.s0 = s0 * decay + w
+        self.sy = sy * decay + w * y
+        self.syy = self.syy * decay + w * y * y
+        self.s2 = self.s2 * decay * decay + w * w
+
+    def fit(self):
+        """(L сейчас, наклон на цикл, СКО наклона, эффективное число точек) или None."""
+        if self.s0 <= 0.0 or self.s2 <= 0.0:
+            return None
+        n_eff = self.s0 * self.s0 / self.s2
+        if n_eff < MIN_POINTS:
+            return None
+        xm, ym = self.sx / self.s0, self.sy / self.s0
+        cxx = self.sxx - self.s0 * xm * xm
+        if cxx <= 1e-12 * max(self.sxx, 1e-300):
+            return None
+        cxy = self.sxy - self.s0 * xm * ym
+        cyy = self.syy - self.s0 * ym * ym
+        slope = cxy / cxx
+        rss = max(cyy - slope * cxy, 0.0)
+        var = rss / self.s0 * n_eff / (n_eff - 2.0)   # дисперсия остатков на точку
+        se = math.sqrt(var * self.s0 / (n_eff * cxx))
+        return ym - slope * xm, slope / SCALE_X, se / SCALE_X, n_eff
+
+
+class LTrend:
+    """
+    Тренд зазора L по наработке N и прогноз до предела L_lim.
+
+    Отсчёты копятся в агрегаты по bucket циклов (сумма, число, время) — O(1) на отсчёт.
+    Каждый агрегат обновляет регрессии с забыванием на нескольких горизонтах (scales,
+    циклы); вес агрегата по Хуберу (k·σ, σ — скользящее среднее модуля остатка),
+    так что выбросы не уводят наклон. Для прогноза берётся горизонт с наименьшей
+    относительной погрешностью наклона; границы — наклон ± 2 СКО. Уменьшение N
+    (сброс наработки, новый образец) начинает оценку заново.
+    """
+    HUBER_K = 2.0
+
+    def __init__(self, bucket=100, scales=(1e4, 1e5, 1e6)):
+        self.bucket = max(float(bucket), 1.0)
+        self.horizons = tuple(float(s) for s in scales)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.scales = [_Scale(h) for h in self.horizons]
+            self.last_n = None      # N последнего агрегата
+            self.last_t = None
+            self.rate = None        # циклов в секунду, скользящее среднее
+            self.sigma = None       # скользящее среднее модуля остатка, для весов Хубера
+            self.aggregates = 0
+        self._acc_n = self._acc_l = self._acc_t = 0.0
+        self._acc_count = 0
+        self._bucket_start = None
+        self._prev_n = None
+
+    def update(self, n, l, t):
+        """Отсчёт: наработка n (циклы), зазор l, время t (с)."""
+        if n != n or l != l:
+            return
+        if self._prev_n is not None and n < self._prev_n:
+            self.reset()
+        self._prev_n = n
+        if self._bucket_start is None:
+            self._bucket_start = n
+        self._acc_n += n
+        self._acc_l += l
+        self._acc_t += t
+        self._acc_count += 1
+        if n - self._bucket_start >= self.bucket:
+            k = self._acc_count
+            self._add(self._acc_n / k, self._acc_l / k, self._acc_t / k)
+            self._acc_n = self._acc_l = self._acc_t = 0.0
+            self._acc_count = 0
+            self._bucket_start = n
+
+    def _add(self, n, l, t):
+        with self._lock:
+            if self.last_n is not None:
+                dn = n - self.last_n
+                dt = t - self.last_t
+                if dt > 0:
+                    rate = dn / dt
+                    self.rate = rate if self.rate is None else 0.9 * self.rate + 0.1 * rate
+            else:
+                dn = 0.0
+            w = 1.0
+            fit = self.scales[0].fit()
+            if fit is not None:
+                predicted = fit[0] + fit[1] * dn
+                r = abs(l - predicted)
+                if self.sigma:
+                    limit = self.HUBER_K * 1.25 * self.sigma   # 1.25·среднее |r| ≈ σ нормального шума
+                    if r > limit:
+                        w = limit / r
+                self.sigma = r if self.sigma is None else 0.98 * self.sigma + 0.02 * r
+            dx = dn / SCALE_X
+            for scale in self.scales:
+                scale.add(dx, l, w)
+            self.last_n, self.last_t = n, t
+            self.aggregates += 1
+
+    def forecast(self, limit):
+        """
+        Прогноз до L = limit: словарь с текущей оценкой L, наклоном (мм/цикл), остатком
+        циклов и времени (с) — оценка и границы (нижняя, верхняя; None — не ограничено),
+        горизонтом оценки. None — данных мало.
+        """
+        with self._lock:
+            fits = [(s.horizon, s.fit()) for s in self.scales]
+            rate = self.rate
+            n_now = self.last_n
+        best = None
+        for horizon, fit in fits:
+            if fit is None or fit[1] <= 0:
+                continue
+            rel = fit[2] / fit[1]
+            if best is None or rel < best[0]:
+                best = (rel, horizon, fit)
+        if best is None:
+            level = next((fit[0] for _, fit in fits if fit is not None), None)
+            return None if level is None else {'L': level, 'slope': None, 'N': n_now, 'cycles': None,
+                                                 'cycles_low': None, 'cycles_high': None, 'seconds': None,
+                                                 'seconds_low': None, 'seconds_high': None, 'horizon': None}
+        _, horizon, (level, slope, se, _) = best
+        remaining = float(limit) - level
+        fast, slow = slope + 2.0 * se, slope - 2.0 * se
+
+        def cycles(s):
+            if remaining <= 0:
+                return 0.0
+            return remaining / s if s > 0 else None
+
+        out = {'L': level, 'slope': slope, 'N': n_now, 'horizon': horizon,
+               'cycles': cycles(slope), 'cycles_low': cycles(fast), 'cycles_high': cycles(slow)}
+        for key in ('', '_low', '_high'):
+            c = out['cycles' + key]
+            out['seconds' + key] = c / rate if c is not None and rate and rate > 0 else None
+        return out
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '∞'
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f'{days} сут {hours} ч'
+    if hours:
+        return f'{hours} ч {minutes} мин'
+    return f'{minutes} мин'
+
+
+def format_cycles(cycles):
+    if cycles is None:
+        return '∞'
+    if cycles >= 1e6:
+        return f'{cycles / 1e6:.2f} млн'
+    if cycles >= 1e3:
+        return f'{cycles / 1e3:.1f} тыс'
+    return f'{cycles:.0f}'
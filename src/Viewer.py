@@ -0,0 +1,138 @@
+import os
+import sys
+import subprocess
+import itertools
+import numpy as np
+from pathlib import Path
+from collections import deque
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, QTimer
+from src.utils import read_conf
+from src.SharedRing import SharedRing, OPEN_GRAPH, OPEN_SPECTRUM
+from src.Density import DensityBank
+from src.DataSaver import add_ext
+
+
+def _launch_app(args):
+    """Запустить приложение (собранное или main.py) с аргументами args в текущей папке."""
+    if getattr(sys, 'frozen', False) or '__compiled__' in globals():
+        cmd = [sys.executable] + args
+    else:
+        cmd = [sys.executable, str(Path(sys.argv[0]).resolve())] + args
+    return subprocess.Popen(cmd, cwd=os.getcwd())
+
+
+def launch_viewer(ring: SharedRing):
+    """
+    Запустить процесс-просмотрщик графиков (отдельный интерпретатор, свой GIL).
+    Текущие счётчики запросов передаются, чтобы новый процесс не открывал старые окна.
+    """
+    return _launch_app(['--viewer', ring.name, str(ring.requests(OPEN_GRAPH)), str(ring.requests(OPEN_SPECTRUM))])
+
+
+def launch_replay(path, speed=1.0):
+    """Открыть записанный файл (сессию, событие) в отдельном окне воспроизведения."""
+    return _launch_app(['--replay', str(path), '--speed', str(speed)])
+
+
+class RingSource(QObject):
+    """
+    Источник данных для GraphWindow в процессе-просмотрщике: тот же интерфейс,
+    что у DataSaver (get_matrices, get_density, get_tail), но данные читаются
+    из разделяемой памяти блоками по таймеру.
+    """
+    def __init__(self, ring: SharedRing, config, interval_ms=100):
+        super().__init__()
+        self.ring = ring
+        self.config = config
+        self.history = None
+        self.max_points_ram = int(config.get('datasaver_max_points', config['values_to_view']))
+        self.data = {c: deque(maxlen=self.max_points_ram) for c in ring.channels}
+        self.data_down = {c: deque(maxlen=self.max_points_ram) for c in ring.channels}
+        self.density = DensityBank(DensityBank.parse_pairs(config.get('density_pairs', 'P:M')))
+        self.count = 0
+        self._since = max(ring.seq - self.max_points_ram, 0)
+        self._since_down = 0
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(interval_ms)
+
+    def poll(self):
+        block, self._since = self.ring.read_since(self._since)
+        n = len(block['time'])
+        if not n:
+            return
+        for c, arr in block.items():
+            self.data[c].extend(arr.tolist())
+        rows = [dict(zip(block.keys(), vals)) for vals in zip(*block.values())]
+        for row in rows:
+            self.density.append(row)
+        self.count += n
+        self._since_down += n
+        if self._since_down >= self.max_points_ram:
+            self._since_down = 0
+            self.data_down = add_ext(self.data_down, self.data)
+
+    def get_matrices(self, ds=False):
+        source = self.data_down if ds else self.data
+        return {k: np.fromiter(v, dtype=np.float32) if len(v) else np.array([], dtype=np.float32)
+                for k, v in source.items()}
+
+    def get_density(self, x_key, y_key):
+        if not self.density.has_pair(x_key, y_key):
+            self.density.add_pair(x_key, y_key, seed=lambda end: self.get_window([x_key, y_key], end))
+        return self.density.snapshot(x_key, y_key)
+
+    def get_window(self, keys, end):
+        """Окно RAM колонок keys до точки номер end (как ColumnWindow.tail)."""
+        n = len(self.data['time']) - max(self.count - end, 0)
+        return {k: np.fromiter(itertools.islice(self.data[k], max(n, 0)), dtype=np.float64) for k in keys}
+
+    def get_tail(self, keys, since):
+        total = self.count
+        n = min(total - since, len(self.data['time']))
+        if n <= 0:
+            return {k: np.array([], dtype=np.float64) for k in keys}, total
+        return {k: np.fromiter(itertools.islice(self.data[k], len(self.data[k]) - n, None),
+                               dtype=np.float64) for k in keys}, total
+
+    def request_history(self, *args, **kwargs):
+        return None
+
+
+class Viewer(QObject):
+    """Открывает окна графиков по запросам основного процесса (счётчики в заголовке кольца)."""
+    def __init__(self, ring_name, seen_graph=0, seen_spectrum=0):
+        super().__init__()
+        self.config = read_conf('app.cfg')
+        self.ring = SharedRing.attach(ring_name)
+        self.source = RingSource(self.ring, self.config)
+        self.windows = []
+        self._seen = {OPEN_GRAPH: int(seen_graph), OPEN_SPECTRUM: int(seen_spectrum)}
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check_requests)
+        self.timer.start(200)
+
+    def check_requests(self):
+        from src.GraphBar import GraphWindow
+        from src.Spectrum import SpectrumWindow
+        for slot, cls in [(OPEN_GRAPH, GraphWindow), (OPEN_SPECTRUM, SpectrumWindow)]:
+            pending = self.ring.requests(slot)
+            while self._seen[slot] < pending:
+                self._seen[slot] += 1
+                win = cls(self.source, self.config)
+                self.windows.append(win)
+                win.show()
+        if self.ring.closed:
+            # основной процесс завершился — окна остаются с последними данными
+            self.source.timer.stop()
+            self.timer.stop()
+
+
+def run_viewer(ring_name, seen_graph=0, seen_spectrum=0):
+    app = QApplication(sys.argv[:1])
+    viewer = Viewer(ring_name, seen_graph, seen_spectrum)
+    viewer.check_requests()
+    return app.exec()
@@ -0,0 +1,260 @@
+import os
+import re
+from src.utils import read_conf
+from src.Channels import ChannelRegistry
+from src.StatusWord import StatusBits
+
+# Действие правила -> команды Worker'а, выполняемые сразу после отсчёта, вне очереди
+ACTIONS = {'log': (), 'unload': ('stop_rotate', 'unload'), 'stop': ('stop_all',)}
+# Команды из очереди, которые отменили бы срабатывание: выбрасываются, если поставлены до него
+MOTION_COMMANDS = {'load', 'rotate'}
+# Правила по умолчанию: биты пределов ПЛК и сброс нагрузки; номера битов — из stat_bits (StatusBits)
+DEFAULT_RULES = {'T_limit': 'stat[T_limit]:stop', 'M_limit': 'stat[M_limit]:stop',
+                 'N_limit': 'stat[N_limit]:stop', 'load_lost': 'load:unload'}
+
+_THRESHOLD = re.compile(r'^(d?)([A-Za-z_]\w*)([<>])(.+)$')
+_BIT = re.compile(r'^stat(?:(\d+)|\[(\w+)\])$')
+
+
+class Rule:
+    """
+    Правило защиты: условие на отсчёт и действие (см. ACTIONS). Срабатывает, когда
+    условие выполнено hold отсчётов подряд, и повторно — только после того, как
+    условие пропало (взводится заново).
+    """
+    def __init__(self, name, action='stop', hold=1):
+        if action not in ACTIONS:
+            raise ValueError(f'защита {name}: неизвестное действие {action}')
+        self.name = name
+        self.action = action
+        self.hold = max(int(hold), 1)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.tripped = False
+
+    def violated(self, data, ctx):
+        """Значение, нарушающее условие, или None."""
+        raise NotImplementedError
+
+    def describe(self):
+        raise NotImplementedError
+
+    def check(self, data, ctx):
+        value = self.violated(data, ctx)
+        if value is None:
+            self.count = 0
+            self.tripped = False
+            return None
+        self.count += 1
+        if self.count < self.hold or self.tripped:
+            return None
+        self.tripped = True
+        return value
+
+
+class BitRule(Rule):
+    """Бит Stat[bit] установлен (предел, отработанный ПЛК)."""
+    def __init__(self, name, bit, action='stop', hold=1):
+        self.bit = int(bit)
+        super().__init__(name, action, hold)
+
+    def violated(self, data, ctx):
+        stat = data.get('Stat')
+        return 1 if stat is not None and stat >> self.bit & 1 else None
+
+    def describe(self):
+        return f'Stat[{self.bit}]'
+
+
+class LoadLostRule(Rule):
+    """
+    ПЛК снял нагрузку (бит loaded, по умолчанию Stat[0], упал), хотя разгрузку никто
+    не командовал: после команды unload/stop_all спад ожидаем и не считается.
+    """
+    def __init__(self, name, action='unload', hold=1, bit=0):
+        self.bit = int(bit)
+        super().__init__(name, action, hold)
+        self.prev = None
+
+    def reset(self):
+        super().reset()
+        self.prev = None
+
+    def violated(self, data, ctx):
+        stat = data.get('Stat')
+        loaded = bool(stat >> self.bit & 1) if stat is not None else None
+        prev, self.prev = self.prev, loaded
+        if prev and loaded is False and ctx.expect_load is not False:
+            return 0
+        return None
+
+    def describe(self):
+        return 'сброс нагрузки'
+
+
+class ThresholdRule(Rule):
+    """
+    Программный порог: канал (в единицах экрана, за вычетом смещения) выше/ниже limit.
+    limit — число или имя параметра испытания (T_max, L_lim, ...); параметр, равный 0
+    или не заданный, выключает правило.
+    """
+    def __init__(self, name, channel, op, limit, action='stop', hold=1):
+        self.channel = channel
+        self.op = op
+        self.limit = limit
+        super().__init__(name, action, hold)
+
+    def value(self, data, ctx):
+        v = data.get(self.channel)
+        if v is None or v != v:
+            return None
+        return v - ctx.offsets.get(self.channel, 0.0)
+
+    def violated(self, data, ctx):
+        limit = ctx.resolve(self.limit)
+        if limit is None:
+            return None
+        v = self.value(data, ctx)
+        if v is None:
+            return None
+        return v if (v > limit if self.op == '>' else v < limit) else None
+
+    def describe(self):
+        return f'{self.channel}{self.op}{self.limit}'
+
+
+class RateRule(ThresholdRule):
+    """Скорость изменения канала |dX/dt| (ед./с) по соседним отсчётам выше limit."""
+    def reset(self):
+        super().reset()
+        self.prev = None
+
+    def violated(self, data, ctx):
+        v = self.value(data, ctx)
+        prev, self.prev = self.prev, (None if v is None else (v, ctx.now))
+        limit = ctx.resolve(self.limit)
+        if v is None or prev is None or limit is None or ctx.now <= prev[1]:
+            return None
+        rate = abs(v - prev[0]) / (ctx.now - prev[1])
+        return rate if rate > limit else None
+
+    def describe(self):
+        return f'|d{self.channel}/dt|>{self.limit}'
+
+
+def parse_rule(name, spec, channels=None, bits: StatusBits = None):
+    """
+    Правило из строки конфигурации watch_<имя> УСЛОВИЕ[:ДЕЙСТВИЕ[:HOLD]]:
+        statK        — установлен бит Stat[K];
+        stat[ИМЯ]    — установлен бит по имени из stat_bits (T_limit, ...);
+        load         — сброс нагрузки (бит loaded) без команды разгрузки;
+        X>V, X<V     — порог по каналу X (V — число или параметр испытания);
+        dX>V         — |dX/dt| больше V в секунду.
+    ДЕЙСТВИЕ — log, unload, stop (по умолчанию stop); HOLD — отсчётов подряд (1).
+    channels — имена каналов стенда: канал условия проверяется по ним, и имя,
+    начинающееся с d (dist>5), читается как канал, если такой есть. bits — имена
+    битов состояния (по умолчанию DEFAULT_BITS).
+    """
+    bits = bits or StatusBits.from_config({})
+    cond, *rest = str(spec).split(':')
+    action = rest[0] if rest and rest[0] else 'stop'
+    hold = int(rest[1]) if len(rest) > 1 else 1
+    m = _BIT.match(cond)
+    if m:
+        try:
+            bit = bits.bit(m.group(1) or m.group(2))
+        except KeyError as e:
+            raise ValueError(f'защита {name}: {e.args[0]}') from None
+        return BitRule(name, bit, action, hold)
+    if cond == 'load':
+        return LoadLostRule(name, action if rest else 'unload', hold, bits.bit('loaded'))
+    m = _THRESHOLD.match(cond)
+    if not m:
+        raise ValueError(f'защита {name}: не разобрано условие {cond}')
+    rate, channel, op, limit = m.groups()
+    if channels is not None:
+        if rate and channel not in channels and rate + channel in channels:
+            rate, channel = '', rate + channel
+        if channel not in channels:
+            raise ValueError(f'защита {name}: неизвестный канал {channel} (каналы: {", ".join(channels)})')
+    try:
+        limit = float(limit.replace(',', '.'))
+    except ValueError:
+        pass   # имя параметра испытания
+    if rate:
+        if op != '>':
+            raise ValueError(f'защита {name}: для скорости допустимо только >')
+        return RateRule(name, channel, op, limit, action, hold)
+    return ThresholdRule(name, channel, op, limit, action, hold)
+
+
+class Watchdog:
+    """
+    Правила защиты, проверяемые потоком опроса на каждом отсчёте, до фильтров и до
+    передачи в GUI: реакция не дольше периода опроса, сколько бы ни был занят GUI.
+    check() возвращает сработавшие правила с нарушившим значением; выполнение
+    действий — дело Worker'а.
+
+    expect_load — что последней командовали (True — load, False — unload/stop_all,
+    None — ещё ничего); offsets — смещения каналов (общий словарь окна);
+    params — параметры испытания для порогов по имени (обновляются с send_params).
+    """
+    def __init__(self, rules, offsets=None, params=None):
+        self.rules = list(rules)
+        self.offsets = offsets if offsets is not None else {}
+        self.params = {}
+        self.set_params(params or {})
+        self.expect_load = None
+        self.now = 0.0
+
+    @classmethod
+    def from_config(cls, config, offsets=None):
+        """watch_<имя> <правило> (см. parse_rule); 0/none выключает правило, в т.ч. по умолчанию."""
+        specs = dict(DEFAULT_RULES)
+        for key, value in config.items():
+            if key.startswith('watch_'):
+                specs[key[len('watch_'):]] = value
+        channels = ChannelRegistry.from_config(config).names
+        bits = StatusBits.from_config(config)
+        rules = []
+        for name, spec in specs.items():
+            if spec in ('0', 'none'):
+                continue
+            try:
+                rules.append(parse_rule(name, spec, channels, bits))
+            except ValueError as e:
+                raise ValueError(f'app.cfg watch_{name} {spec}: {e}') from None
+        params = read_conf('test_parameters.param') if os.path.isfile('test_parameters.param') else {}
+        return cls(rules, offsets, params)
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def set_params(self, params):
+        for key, value in params.items():
+            try:
+                self.params[key] = float(str(value).replace(',', '.'))
+            except ValueError:
+                self.params.pop(key, None)
+
+    def resolve(self, limit):
+        if isinstance(limit, float):
+            return limit
+        value = self.params.get(limit)
+        return value if value else None
+
+    def reset(self):
+        for rule in self.rules:
+            rule.reset()
+
+    def check(self, data, now):
+        """Проверить отсчёт (время now, с); список (правило, значение) сработавших."""
+        self.now = now
+        trips = []
+        for rule in self.rules:
+            value = rule.check(data, self)
+            if value is not None:
+                trips.append((rule, value))
+        return trips
@@ -0,0 +1,400 @@
+from PySide6.QtCore import QObject, Signal
+from queue import Queue, Empty
+from src.ModbusClient import PLCOffline
+from src.Metrics import METRICS
+from src.Watchdog import Watchdog, ACTIONS, MOTION_COMMANDS
+from src.StatusWord import StatusEvents
+from src.Profile import ProfileRunner
+from src.utils import FrequencyRegression
+import time
+
+
+class Worker(QObject):
+    data_ready = Signal(dict, float)
+    error = Signal(str)
+    parameters_ready = Signal(dict)
+    link_changed = Signal(dict)
+    tripped = Signal(dict)
+    stat_changed = Signal(int, object)
+    profile_changed = Signal(dict)
+    command_failed = Signal(str, str)   # имя команды, сообщение: отклонена без связи или завершилась ошибкой
+
+    # Без связи с ПЛК: команды перевода в безопасное состояние удерживаются и
+    # отправляются после восстановления связи, остальные команды ПЛК отклоняются.
+    # Запись, не подтверждённая ПЛК, — тоже обрыв: такая команда удерживается так же.
+    # Локальные меняют только состояние Worker'а и выполняются всегда.
+    LOCAL_COMMANDS = {'reset_time', 'reset_filters', 'profile_stop'}
+    HELD_COMMANDS = {'stop_all', 'stop_rotate', 'unload'}
+    # Чтение параметров, не выполненное из-за связи (в т.ч. перечитывание после send_PID),
+    # повторяется один раз после её восстановления
+    RETRY_COMMANDS = {'get_PID'}
+    ERROR_REPEAT_S = 10.0
+    PROFILE_REPORT_S = 0.5   # прогресс программы в GUI — не чаще, переходы шагов — сразу
+
+    def __init__(self, plc, interval_ms, main_window):
+        super().__init__()
+        self.main_window = main_window
+        self.plc = plc
+        self.interval = interval_ms / 1000.0
+        self._running = True
+        self.init_time = time.perf_counter()
+        self._cmd_q: Queue[tuple[str, tuple, float]] = Queue()
+        self.seq = 0   # номер слота опроса, растёт монотонно и не сбрасывается
+        self._busy = False
+        self._held = []
+        self._retry = set()
+        self._held_trips = []   # срабатывания, чьи команды ПЛК ещё не подтвердил (удержаны)
+        self._online = True
+        self._outage = None
+        self._last_error = ('', 0.0)
+        # Фильтры каналов (FilterBank DataSaver'а) применяются здесь, до отправки отсчёта в GUI;
+        # частота f вычисляется здесь же, до фильтров: и регрессия, и её фильтр сбрасываются
+        # только в этом потоке (команда reset_filters)
+        self.frequency = FrequencyRegression(100)
+        self.filters = getattr(getattr(main_window, 'datasaver', None), 'filters', None)
+        # Защита проверяет каждый отсчёт здесь же и действует сама, не дожидаясь GUI
+        self.datasaver = getattr(main_window, 'datasaver', None)
+        config = getattr(main_window, 'config', None)
+        self.watchdog = Watchdog.from_config(config, getattr(main_window, 'offsets', None)) if config else None
+        # Слово состояния уходит потребителям только при изменении (stat_changed), с переходами по битам
+        self.stat_events = StatusEvents()
+        # Программа нагружения исполняется здесь: переходы по N и времени отсчёта, не по таймерам GUI
+        self.offsets = getattr(main_window, 'offsets', None)
+        if self.offsets is None:
+            self.offsets = {}
+        self.setpoints = {}   # последние записанные в ПЛК уставки, единицы полей TestBar
+        self.profile = None
+        self._profile_reported = 0.0
+
+    def enqueue_cmd(self, name: str, *args):
+        self._cmd_q.put((name, args, time.perf_counter()))
+
+    def reset_time(self):
+        self.init_time = time.perf_counter()
+
+    def _process_one_command(self):
+        try:
+            name, args, queued = self._cmd_q.get_nowait()
+        except Empty:
+            return False
+
+        if not self.plc.online and name not in self.LOCAL_COMMANDS:
+            if name in self.HELD_COMMANDS:
+                self._held.append((name, args, queued))
+                METRICS.count('cmd_held')
+            elif name in self.RETRY_COMMANDS:
+                self._retry.add(name)
+            else:
+                METRICS.count('cmd_rejected')
+                message = f'Команда {name} отклонена: нет связи с ПЛК'
+                self.error.emit(message)
+                self.command_failed.emit(name, message)
+            return True
+        self._execute(name, args, queued)
+        return True
+
+    def _execute(self, name, args, queued):
+        """
+        Выполняет команду; True — выполнена (запись подтверждена ПЛК). Неподтверждённая
+        команда безопасности (ConnectionError) удерживается до восстановления связи.
+        """
+        start = time.perf_counter()
+        METRICS.timing('cmd_wait', (start - queued) * 1000.0)
+        self._busy = True
+        done = False
+        try:
+            if name == 'send_params':
+                params, offsets = args
+                self.plc.send_params(params, offsets)
+                self._remember_setpoints(params)
+            elif name == 'profile_start':
+                self._abort_profile('заменена новой')
+                self.profile = ProfileRunner(args[0], self.setpoints)
+                self._profile_reported = 0.0
+            elif name == 'profile_stop':
+                self._abort_profile('остановлена оператором')
+            elif name == 'load':
+                self._expect_load(True)
+                self.plc.load()
+            elif name == 'unload':
+                self._expect_load(False)
+                self._abort_profile('разгрузка')
+                self.plc.unload()
+            elif name == 'rotate':
+                self.plc.rotate()
+            elif name == 'stop_rotate':
+                self.plc.stop_rotate()
+            elif name == 'reset':
+                self.plc.reset()
+            elif name == 'stop_all':
+                self._expect_load(False)
+                self._abort_profile('останов')
+                self.plc.stop()
+            elif name == 'reset_time':
+                self.reset_time()
+            elif name == 'reset_filters':
+                self.frequency.reset()
+                if self.filters:
+                    self.filters.reset()
+            elif name == 'send_PID':
+                self.plc.send_PID(*args)
+                self.plc.write_PID()
+                # после записи кэш устарел — перечитываем
+                self.parameters_ready.emit(self.plc.get_parameters())
+            elif name == 'get_PID':
+                self.parameters_ready.emit(self.plc.get_parameters())
+            else:
+                self.error.emit(f'Неизвестная команда: {name}')
+            done = True
+        except Exception as e:
+            if isinstance(e, ConnectionError) and name in self.HELD_COMMANDS:
+                self._held.append((name, args, queued))
+                METRICS.count('cmd_held')
+                message = f'Команда {name} не подтверждена ПЛК, будет повторена после восстановления связи: {e}'
+            else:
+                message = f'Команда {name} завершилась ошибкой: {e}'
+            self.error.emit(message)
+            self.command_failed.emit(name, message)
+            if name in ('get_PID', 'send_PID'):
+                self._retry.add('get_PID')
+        finally:
+            self._busy = False
+            METRICS.since('cmd_exec', start)
+        return done
+
+    def _remember_setpoints(self, params):
+        for key, value in params.items():
+            try:
+                self.setpoints[key] = float(str(value).replace(',', '.'))
+            except ValueError:
+                self.setpoints.pop(key, None)
+        if self.watchdog is not None:
+            self.watchdog.set_params(params)
+
+    def _abort_profile(self, reason):
+        profile = self.profile
+        if profile is None or not profile.running:
+            return
+        profile.stop()
+        self.profile = None
+        self._log_profile(f'программа {profile.program.name}: прервана ({reason})', None, time.perf_counter())
+        self.profile_changed.emit(dict(profile.status(), reason=reason))
+
+    def _log_profile(self, text, seq, received):
+        self._log_events([(received - self.init_time, text, seq, None, None, None)])
+
+    def _run_profile(self, data, received):
+        """
+        Шаг программы нагружения на отсчёте: переход по наработке N и времени получения.
+        Изменившиеся уставки пишутся сразу, вне очереди команд, и только они.
+        """
+        n = data.get('N')
+        if n is None:
+            return
+        start = time.perf_counter()
+        profile = self.profile
+        changes, entered = profile.update(n, received)
+        if changes:
+            try:
+                METRICS.count('profile_requests', self.plc.write_setpoints(changes, self.offsets))
+                self._remember_setpoints(changes)
+                METRICS.count('profile_writes', len(changes))
+            except Exception as e:
+                profile.forget(changes)
+                self._report_error(f'Программа: уставки не записаны: {e}')
+        METRICS.since('profile', start)
+        seq = data.get('seq')
+        for index in entered:
+            step = profile.program.steps[index]
+            if index:
+                METRICS.gauge('profile_overshoot', profile.overshoot)
+            self._log_profile(f'программа {profile.program.name}: шаг {index + 1}/{len(profile.program)} '
+                              f'{step.describe()}', seq, received)
+        if not profile.running:
+            self._log_profile(f'программа {profile.program.name}: завершена', seq, received)
+        if entered or not profile.running or received - self._profile_reported >= self.PROFILE_REPORT_S:
+            self._profile_reported = received
+            self.profile_changed.emit(profile.status())
+        if not profile.running:
+            self.profile = None
+
+    def _expect_load(self, loaded):
+        if self.watchdog is not None:
+            self.watchdog.expect_load = loaded
+
+    def _guard(self, data, received):
+        """
+        Проверка отсчёта правилами защиты. Сработавшие действия выполняются сразу,
+        вне очереди; поставленные до срабатывания load/rotate выбрасываются, чтобы
+        не отменить его. Время реакции — от получения отсчёта до подтверждения записи
+        ПЛК; не подтверждённые команды удерживаются, и срабатывание сообщается
+        только после их выполнения при восстановлении связи.
+        """
+        start = time.perf_counter()
+        trips = self.watchdog.check(data, received)
+        METRICS.since('watchdog', start)
+        if not trips:
+            return
+        commands = []
+        for rule, _ in trips:
+            for name in ACTIONS[rule.action]:
+                if name not in commands:
+                    commands.append(name)
+        done = True
+        if commands:
+            with self._cmd_q.mutex:
+                pending = self._cmd_q.queue
+                kept = [c for c in pending if c[0] not in MOTION_COMMANDS]
+                if len(kept) != len(pending):
+                    METRICS.count('cmd_discarded', len(pending) - len(kept))
+                    pending.clear()
+                    pending.extend(kept)
+            for name in commands:
+                if not self.plc.online:
+                    self._held.append((name, (), received))   # связь уже потеряна предыдущей командой
+                    METRICS.count('cmd_held')
+                    done = False
+                elif not self._execute(name, (), received):
+                    done = False
+        if not done:
+            self._held_trips.append((trips, data.get('seq'), received))
+            rel_time = received - self.init_time
+            self._log_events([(rel_time, f'защита {rule.name}: {rule.describe()} ({value:g}) -> {rule.action}: '
+                                         f'нет подтверждения ПЛК, команда удержана',
+                               data.get('seq'), None, None, None) for rule, value in trips])
+            return
+        self._report_trips(trips, data.get('seq'), received)
+
+    def _report_trips(self, trips, seq, received):
+        """Срабатывание выполнено: время реакции, события сессии и сигнал tripped."""
+        reaction = (time.perf_counter() - received) * 1000.0
+        METRICS.timing('watchdog_reaction', reaction)
+        rel_time = round((received - self.init_time) * 1000.0, 2)
+        events = []
+        for rule, value in trips:
+            METRICS.count('watchdog_trips')
+            text = f'защита {rule.name}: {rule.describe()} ({value:g}) -> {rule.action}'
+            events.append((rel_time / 1000.0, text, seq, None, None, round(reaction, 2)))
+            self.tripped.emit({'name': rule.name, 'action': rule.action, 'value': value, 'text': text,
+                               'seq': seq, 'time': rel_time, 'reaction_ms': reaction})
+        self._log_events(events)
+
+    def _log_events(self, events):
+        if self.datasaver is not None:
+            self.datasaver.log_events(events)
+
+    def _report_error(self, msg):
+        """Одинаковые ошибки подряд передаются в GUI не чаще раза в ERROR_REPEAT_S."""
+        now = time.monotonic()
+        last_msg, last_time = self._last_error
+        if msg != last_msg or now - last_time >= self.ERROR_REPEAT_S:
+            self._last_error = (msg, now)
+            self.error.emit(msg)
+
+    def _check_link(self):
+        """Отслеживает переходы online/offline клиента: сообщает GUI и выполняет удержанные команды."""
+        online = self.plc.online
+        if online == self._online:
+            return
+        self._online = online
+        rel_time = round((time.perf_counter() - self.init_time) * 1000.0, 2)
+        if not online:
+            METRICS.count('plc_outages')
+            self._outage = (self.seq, rel_time)
+            self.link_changed.emit({'online': False, 'seq': self.seq, 'time': rel_time,
+                                    'message': self.plc.last_error})
+            return
+        seq_from, time_from = self._outage or (self.seq, rel_time)
+        self._outage = None
+        self._last_error = ('', 0.0)
+        self.link_changed.emit({'online': True, 'seq_from': seq_from, 'seq_to': self.seq - 1,
+                                'time_from': time_from, 'time': rel_time})
+        # Удержанная команда снимается, только когда ПЛК подтвердил запись; при новой ошибке
+        # _execute возвращает её в удержанные, остальные ждут следующего восстановления по порядку
+        held, self._held = self._held, []
+        for i, (name, args, queued) in enumerate(held):
+            if not self._execute(name, args, queued):
+                self._held.extend(held[i + 1:])
+                break
+        if self._held or not self.plc.online:
+            return
+        held_trips, self._held_trips = self._held_trips, []
+        for trips, seq, received in held_trips:
+            self._report_trips(trips, seq, received)
+        retry, self._retry = self._retry, set()
+        for name in retry:
+            self._execute(name, (), time.perf_counter())
+
+    def run(self):
+        """
+        Основной цикл: сначала выполняем накопившиеся команды, затем опрашиваем ПЛК.
+        Опрос идёт по сетке слотов с шагом interval; каждый слот получает номер seq,
+        отсчёт несёт seq и плановое время sched (мс, в шкале rel_time). Неудачный
+        опрос или пропущенный из-за задержки слот видны потребителю как разрыв seq.
+        """
+        next_slot = time.perf_counter()
+        while self._running:
+            self.seq += 1
+            sched = round((next_slot - self.init_time) * 1000.0, 2)
+            try:
+                processed = 0
+                METRICS.gauge('cmd_queue', self._cmd_q.qsize())
+                while self._process_one_command():
+                    processed += 1
+                    if processed >= 100:
+                        break
+
+                if processed > 0 or not self._cmd_q.empty():
+                    time.sleep(0.005)
+
+                data = self.plc()
+                received = time.perf_counter()
+                rel_time = round((received - self.init_time) * 1000.0,2)
+                if data:
+                    data['seq'] = self.seq
+                    data['sched'] = sched
+                    # при воспроизведении отсчёт несёт исходное время записи
+                    f_val = self.frequency.update(data.get('N'), data.get('rel_time', rel_time) / 1000.0)
+                    if f_val is not None:
+                        data['f'] = float(f_val)
+                    if self.watchdog:
+                        self._guard(data, received)
+                    if self.profile is not None:
+                        self._run_profile(data, received)
+                    transitions = self.stat_events.update(data.get('Stat'), rel_time / 1000.0, self.seq)
+                    if transitions:
+                        self.stat_changed.emit(data['Stat'], transitions)
+                    if self.filters:
+                        start = time.perf_counter()
+                        raw = self.filters.apply(data)
+                        if self.filters.store_raw:
+                            data['raw'] = raw
+                        METRICS.since('filters', start)
+                self.data_ready.emit(data if data else {}, rel_time)
+
+            except PLCOffline:
+                pass   # ждём следующей попытки подключения, GUI уже знает об обрыве
+            except Exception as e:
+                METRICS.count('poll_errors')
+                if self.plc.online:
+                    self._report_error(str(e))
+
+            self._check_link()
+            next_slot = self._wait_next_slot(next_slot)
+
+    def _wait_next_slot(self, slot):
+        """Ждёт следующий слот; если опрос опоздал больше чем на слот — пропускает их (seq растёт)."""
+        if self.interval <= 0:
+            return time.perf_counter()   # источник сам задаёт темп (воспроизведение)
+        slot += self.interval
+        now = time.perf_counter()
+        if now < slot:
+            time.sleep(slot - now)
+        elif now - slot >= self.interval:
+            missed = int((now - slot) / self.interval)
+            self.seq += missed
+            slot += missed * self.interval
+        return slot
+
+    def stop(self):
+        self._running = False
@@ -1,5 +1,8 @@
 from __future__ import annotations
-import os, platform, subprocess, uuid, hashlib
+import os, platform, subprocess, uuid, hashlib, json, time
+
+CACHE_PATH = 'hw.cache'
+CACHE_MAX_AGE = 7 * 24 * 3600
 
 def _run(cmd: list[str]) -> str:
     try:
@@ -14,7 +17,15 @@ def _cpu_brand() -> str:
         return p
     sys = platform.system().lower()
     if sys == "linux":
-        return _run(["bash", "-lc", "cat /proc/cpuinfo | grep 'model name' | head -1 | cut -d: -f2"]).strip()
+        # то же, что `grep 'model name' /proc/cpuinfo | head -1 | cut -d: -f2`, но без запуска bash
+        try:
+            with open("/proc/cpuinfo", "r", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    if "model name" in line:
+                        return line.rstrip("\n").split(":")[1].strip()
+        except Exception:
+            pass
+        return ""
     if sys == "darwin":
         return _run(["sysctl", "-n", "machdep.cpu.brand_string"])
     if sys == "windows":
@@ -65,13 +76,42 @@ def _mac_addr() -> str:
     except Exception:
         return ""
 
-def get_hardware_fingerprint() -> str:
-    """Стабильный отпечаток железа (без персональных данных)."""
+def _machine_id() -> str:
+    """
+    Дешёвый идентификатор машины без запуска процессов — для проверки кэша:
+    DMI product UUID (Linux), MachineGuid (Windows), иначе имя узла и MAC.
+    """
+    sys = platform.system().lower()
+    if sys == "linux":
+        for p in ["/sys/class/dmi/id/product_uuid", "/etc/machine-id"]:
+            try:
+                with open(p, "r", encoding="utf-8", errors="ignore") as f:
+                    s = f.read().strip()
+                if s:
+                    return s
+            except Exception:
+                pass
+    elif sys == "windows":
+        try:
+            import winreg
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Cryptography") as key:
+                return str(winreg.QueryValueEx(key, "MachineGuid")[0])
+        except Exception:
+            pass
+    return f"{platform.node()}|{_mac_addr()}"
+
+
+def _hardware_inputs() -> dict:
+    """Исходные данные отпечатка; на Windows/macOS — через wmic/sysctl/ioreg, это медленная часть."""
+    return {"cpu": _cpu_brand(), "board": _board_uuid()}
+
+
+def _fingerprint(inputs: dict) -> str:
     pieces = [
         platform.system(),
         platform.machine(),
-        _cpu_brand(),
-        _board_uuid(),
+        inputs.get("cpu", ""),
+        inputs.get("board", ""),
         # _disk_serial(),
         # _mac_addr(),
     ]
@@ -79,12 +119,43 @@ def get_hardware_fingerprint() -> str:
     return hashlib.sha256(norm.encode("utf-8")).hexdigest()
 
 
-def check_lic():
+def get_hardware_fingerprint() -> str:
+    """Стабильный отпечаток железа (без персональных данных)."""
+    return _fingerprint(_hardware_inputs())
+
+
+def cached_fingerprint(path=CACHE_PATH, max_age=CACHE_MAX_AGE) -> str:
+    """
+    Отпечаток по локальному кэшу исходных данных (имя процессора, UUID платы):
+    кэшируются только медленно читаемые значения, сам отпечаток всегда считается
+    заново. Кэш принимается, если не устарел и записан на этой же машине
+    (совпадает _machine_id); иначе данные читаются заново и кэш перезаписывается.
+    """
+    machine = _machine_id()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        inputs = {k: str(v) for k, v in cache["inputs"].items()}
+        if 0 <= time.time() - float(cache["created"]) <= max_age and cache["machine"] == machine:
+            return _fingerprint(inputs)
+    except Exception:
+        pass
+
+    inputs = _hardware_inputs()
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine, "created": round(time.time()), "inputs": inputs}, f)
+    except Exception:
+        pass
+    return _fingerprint(inputs)
+
+
+def check_lic(use_cache=True):
     lic = {'d8ef21763f1ffbbf6f211dc01e5ffd3fcf503543494493305eecdecd27541ab1': 'MA',
            'b70acc012f8c9457c5037e909ab8ccc8283c7d3caa54ed4afac015b6d997c4e0': 'TsAGI',
            '837158e975a72030d16911f20d6118a23cd001b8ce771263768b2dfd5a811682': 'TsAGI',
            '758a3643417619d0d282128309e596015471c6eaf7f8c175cc10675faf1ff555': 'TsAGI',}
-    key = get_hardware_fingerprint()
+    key = cached_fingerprint() if use_cache else get_hardware_fingerprint()
     if key in  lic.keys():
         return lic[key]
     else:
@@ -1,5 +1,4 @@
 import json
-from PySide6.QtWidgets import QFileDialog
 import time
 from pathlib import Path
 import numpy as np
@@ -18,6 +17,17 @@ def read_conf(path, dtype=str):
     return config
 
 
+def read_TCP_conf(path):
+    """modbus_adr.cfg: строки `имя адрес регистров тип` -> {имя: (тип, адрес, регистров)}."""
+    config = {}
+    with open(path, 'r') as _cfg:
+        lines = _cfg.read().split('\n')
+    for line in lines:
+        name, adr, reg, dtype = line.split(' ')
+        config[name] = (dtype, int(adr), int(reg))
+    return config
+
+
 def write_conf(path, config:dict):
     with open(path, 'w') as _cfg:
         for key in config.keys():
@@ -31,6 +41,7 @@ def read_json(path):
 
 
 def get_file_path():
+    from PySide6.QtWidgets import QFileDialog   # utils используется и в процессах без GUI
     file_path, _ = QFileDialog.getSaveFileName(
         None,
         "Создать новый файл",
@@ -51,25 +62,26 @@ def get_filepath(workdir, action=''):
     return file_path
 
 
-class RollingMean:
-    """O(1) скользящее среднее по фиксированному окну."""
-    def __init__(self, window: int):
-        self.window = max(int(window), 0)
-        self.buf = deque(maxlen=self.window if self.window > 0 else 1)
-        self.sum = 0.0
+class FrequencyRegression:
+    """Частота нагружения как наклон линейной регрессии N(t) на последних `window` точках."""
+    def __init__(self, window: int = 100):
+        self.t = deque(maxlen=int(window))
+        self.n = deque(maxlen=int(window))
+        self.last = None
 
     def reset(self):
-        self.buf.clear()
-        self.sum = 0.0
+        self.t.clear()
+        self.n.clear()
+        self.last = None
 
-    def update(self, x: float) -> float:
-        if self.window <= 0:
-            return x
-        if len(self.buf) == self.buf.maxlen:
-            self.sum -= self.buf[0]
-        self.buf.append(x)
-        self.sum += x
-        return self.sum / len(self.buf)
+    def update(self, N, t_s):
+        if N is None:
+            return None
+        self.t.append(t_s)
+        self.n.append(N)
+        if len(self.t) >= 2:
+            self.last = np.polyfit(self.t, self.n, 1)[0]
+        return self.last
 
 
 def _align_xy(x, y):
@@ -94,4 +106,24 @@ def _align_xy(x, y):
     else:
         x = x[:0]
         y = y[:0]
-    return x, y
\ No newline at end of file
+    return x, y
+
+def minmax_decimate(x, y, n_bins):
+    """Прореживание min/max: на каждый интервал оставляет точки минимума и максимума Y.
+       Сохраняет пики, которые теряет простое взятие каждой k-й точки."""
+    x, y = _align_xy(x, y)
+    n_bins = max(int(n_bins), 1)
+    if x.size <= 2 * n_bins:
+        return x, y
+
+    step = x.size // n_bins
+    n = step * n_bins
+    yb = y[:n].reshape(n_bins, step)
+    i_min = yb.argmin(axis=1)
+    i_max = yb.argmax(axis=1)
+    base = np.arange(n_bins) * step
+    idx = np.stack([np.minimum(i_min, i_max), np.maximum(i_min, i_max)], axis=1) + base[:, None]
+    idx = idx.ravel()
+    if n < x.size:
+        idx = np.append(idx, x.size - 1)
+    return x[idx], y[idx]